@@ -0,0 +1,108 @@
+"""
+Cold-start benchmark: how long the app and CLI entry points take to import,
+measured with `python -X importtime` in a fresh interpreter.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --module fitness_tracker.cli --budget-ms 200 --top 15
+
+Each module is imported `--repeat` times; the median of the cumulative time
+`-X importtime` reports for it is compared with its budget (BUDGETS, or
+`--budget-ms` for all of them) and the run exits non-zero if any is over
+budget, or if a module that should only be loaded on demand (DEFERRED:
+NumPy for analytics and charts, requests for Strava, keyring for the token)
+was imported at startup. `--top` lists the slowest direct imports, which is
+where to look when the budget is blown.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Milliseconds of cumulative import time per entry point. flet alone takes
+# most of the app's budget; anything over these means something heavy was
+# added to the startup path.
+BUDGETS = {
+    "fitness_tracker.app": 400,
+    "fitness_tracker.cli": 250,
+}
+
+DEFERRED = ("numpy", "requests", "keyring")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime(module: str) -> List[Dict]:
+    """One entry per import, as {"name", "self_us", "cumulative_us", "depth"}, in the order they finished."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        entries.append({
+            "name": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            # Nested imports are indented by two spaces per level
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return entries
+
+
+def subtree(entries: List[Dict], module: str) -> List[Dict]:
+    """`module` and everything imported while importing it (not what `site` loaded before)."""
+    end = next(i for i, e in enumerate(entries) if e["name"] == module)
+    start = end
+    # Children finish, and so are listed, before their parent
+    while start > 0 and entries[start - 1]["depth"] > entries[end]["depth"]:
+        start -= 1
+    return entries[start:end + 1]
+
+
+def measure(module: str, repeat: int) -> Dict:
+    runs = [subtree(importtime(module), module) for _ in range(repeat)]
+    totals = [entries[-1]["cumulative_us"] / 1000 for entries in runs]
+    last = runs[-1]
+    top = sorted((e for e in last if e["depth"] == 1), key=lambda e: e["cumulative_us"], reverse=True)
+    return {
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "deferred": sorted({e["name"] for e in last} & set(DEFERRED)),
+        "top": top,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", help="module to import (default: the app and the CLI)")
+    parser.add_argument("--budget-ms", type=float, help="budget for every module instead of BUDGETS")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.module or list(BUDGETS):
+        budget = args.budget_ms if args.budget_ms is not None else BUDGETS.get(module)
+        stats = measure(module, args.repeat)
+        over = budget is not None and stats["median_ms"] > budget
+        budget_text = f"budget {budget:.0f} ms" if budget is not None else "no budget"
+        print(f"{module:<24} median {stats['median_ms']:8.1f} ms  min {stats['min_ms']:8.1f} ms  "
+              f"{budget_text}{'  OVER BUDGET' if over else ''}")
+        for entry in stats["top"][:args.top]:
+            print(f"    {entry['name']:<36} {entry['cumulative_us'] / 1000:8.1f} ms")
+        if stats["deferred"]:
+            print(f"    imported at startup: {', '.join(stats['deferred'])}")
+        failed = failed or over or bool(stats["deferred"])
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
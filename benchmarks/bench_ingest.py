@@ -0,0 +1,131 @@
+"""
+Load test for the ingestion server (fitness_tracker/server.py).
+
+    python -m benchmarks.bench_ingest --devices 50 --batches 20 --batch-size 100
+    python -m benchmarks.bench_ingest --url http://127.0.0.1:8765
+
+Without `--url` a server is started in a subprocess (one core, its own
+GIL) on a temporary data file. Each simulated device streams
+`--batches` batches of SensorSimulator samples over one keep-alive
+connection and then finishes its workout; all devices run concurrently.
+Payloads are generated and encoded before the clock starts, so the numbers
+are the server's. Prints samples/s, request latency percentiles and how
+many storage writes the group committer needed for the finished workouts.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+from fitness_tracker.simulator import SensorSimulator
+
+
+def payloads(device: int, batches: int, batch_size: int) -> list:
+    api = SensorSimulator(rate_hz=10, seed=device, realtime=False, channels=("heart_rate", "steps", "cadence", "gps"))
+    return [
+        json.dumps({"samples": [api.next_sample() for _ in range(batch_size)]}).encode("utf-8")
+        for _ in range(batches)
+    ]
+
+
+def run_device(host: str, port: int, device: int, bodies: list, latencies: list, errors: list, start: threading.Barrier):
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    start.wait()
+    try:
+        for path, body in [(f"/devices/dev{device}/samples", b) for b in bodies] + [(f"/devices/dev{device}/finish", b"{}")]:
+            sent = time.perf_counter()
+            conn.request("POST", path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - sent)
+            if response.status >= 300:
+                errors.append(response.status)
+    except (OSError, http.client.HTTPException) as ex:
+        errors.append(repr(ex))
+    finally:
+        conn.close()
+
+
+def start_server(storage: str, tmpdir: str):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    path = os.path.join(tmpdir, "fitness_data.db" if storage == "sqlite" else "fitness_data.json")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "fitness_tracker.server", path, "--storage", storage, "--port", str(port)],
+        stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # "Listening on ..."
+    return process, f"http://127.0.0.1:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="server to test (default: start one)")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"), default="journal",
+                        help="backend of the server started without --url")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--batches", type=int, default=20, help="sample batches per device")
+    parser.add_argument("--batch-size", type=int, default=100, help="samples per batch")
+    args = parser.parse_args(argv)
+
+    bodies = [payloads(device, args.batches, args.batch_size) for device in range(args.devices)]
+    tmpdir = tempfile.mkdtemp()
+    process = None
+    try:
+        url = args.url
+        if url is None:
+            process, url = start_server(args.storage, tmpdir)
+        parts = urlsplit(url)
+        with urlopen(url + "/stats") as response:
+            before = json.load(response)
+
+        latencies, errors = [], []
+        start = threading.Barrier(args.devices + 1)
+        threads = [
+            threading.Thread(target=run_device, args=(parts.hostname, parts.port, device, bodies[device],
+                                                      latencies, errors, start))
+            for device in range(args.devices)
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        with urlopen(url + "/stats") as response:
+            after = json.load(response)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(tmpdir)
+
+    samples = args.devices * args.batches * args.batch_size
+    latencies.sort()
+    quantile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    workouts = after["workouts_committed"] - before["workouts_committed"]
+    batches = after["commit_batches"] - before["commit_batches"]
+    print(f"{args.devices} devices x {args.batches} batches x {args.batch_size} samples in {elapsed:.2f} s")
+    print(f"{samples / elapsed:,.0f} samples/s, {len(latencies) / elapsed:,.0f} requests/s")
+    print(f"latency ms: p50 {quantile(0.5):.2f}  p95 {quantile(0.95):.2f}  p99 {quantile(0.99):.2f}  "
+          f"mean {statistics.fmean(latencies) * 1000:.2f}")
+    print(f"{workouts} workouts written in {batches} group commits")
+    if errors:
+        print(f"{len(errors)} failed requests, e.g. {errors[:3]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
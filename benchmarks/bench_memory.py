@@ -0,0 +1,96 @@
+"""
+Memory benchmark: bytes per decoded WorkoutSession, before and after the
+slotted models and string interning.
+
+    python -m benchmarks.bench_memory --workouts 20000
+    python -m benchmarks.bench_memory --workouts 20000 --samples 60
+
+Every session is encoded as its own JSON document, as in the journal or
+an SQLite row, so the decoder can't share keys between sessions. The
+"before" model is a plain dataclass decoded without interning, the way
+the models were before (sample column names are interned by MetricColumns
+in both); "after" is `WorkoutSession.from_dict`. Memory is
+what tracemalloc still sees allocated once the documents are decoded and
+dropped, i.e. what the manager keeps for a loaded profile. With
+`--samples 0` (the default) sessions have no sample columns, like
+sessions whose samples are loaded lazily, so only the per-object
+overhead is measured.
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from fitness_tracker.columns import MetricColumns
+from fitness_tracker.models import WorkoutSession
+from .synthetic import make_session
+
+
+@dataclass
+class UnslottedSession:
+    """WorkoutSession as it was: per-instance __dict__, strings as decoded."""
+    activity_type: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    metrics: Dict[str, List[float]] = field(default_factory=MetricColumns)
+    summary: Dict[str, float] = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            activity_type=data["activity_type"],
+            start_time=datetime.fromisoformat(data["start_time"]),
+            end_time=datetime.fromisoformat(data["end_time"]) if data.get("end_time") else None,
+            metrics=MetricColumns.from_dict(data.get("metrics", {})),
+            summary=data.get("summary", {}),
+            id=data["id"],
+        )
+
+
+def documents(workouts: int, samples: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 7)
+    docs = []
+    for i in range(workouts):
+        session = make_session(start + timedelta(days=i), samples, rng)
+        session.summary.update({"calories": rng.randint(100, 900), "distance_m": rng.random() * 10000})
+        docs.append(json.dumps(session.to_dict()))
+    return docs
+
+
+def measure(cls, docs: List[str]) -> int:
+    """Bytes still allocated after decoding `docs` into `cls` instances."""
+    gc.collect()
+    tracemalloc.start()
+    sessions = [cls.from_dict(json.loads(doc)) for doc in docs]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(sessions) == len(docs)
+    return current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=0, help="samples per session (default: 0, summaries only)")
+    args = parser.parse_args(argv)
+
+    docs = documents(args.workouts, args.samples)
+    before = measure(UnslottedSession, docs) / args.workouts
+    after = measure(WorkoutSession, docs) / args.workouts
+    print(f"{args.workouts} sessions x {args.samples} samples")
+    print(f"{'model':<28}{'bytes/session':>15}")
+    print(f"{'before (dict, not interned)':<28}{before:>15,.0f}")
+    print(f"{'after (slots, interned)':<28}{after:>15,.0f}")
+    print(f"saved {before - after:,.0f} bytes/session ({(before - after) / before:.0%}), "
+          f"{(before - after) * args.workouts / 2**20:,.1f} MiB for {args.workouts} sessions")
+
+
+if __name__ == "__main__":
+    main()
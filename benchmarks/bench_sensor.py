@@ -0,0 +1,81 @@
+"""
+Sensor pipeline throughput: SensorSimulator -> Subscription -> MetricColumns -> storage.
+
+    python -m benchmarks.bench_sensor --rate 1000 --seconds 600
+
+Runs the simulator without sleeping and records the stream the same way the
+front ends do, then saves the session with each storage backend.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from fitness_tracker.columns import MetricColumns
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.simulator import SensorSimulator
+from fitness_tracker.storage import JsonStorage, JournalStorage
+from fitness_tracker.sqlite_storage import SQLiteStorage
+
+
+def record(rate: float, seconds: float, batch_size: int):
+    samples = int(rate * seconds)
+    api = SensorSimulator(rate_hz=rate, seed=1, realtime=False, max_samples=samples)
+    metrics = MetricColumns({"timestamp": [], "heart_rate": [], "steps": []})
+
+    def on_batch(batch):
+        for data in batch:
+            metrics["timestamp"].append(data["elapsed_seconds"])
+            metrics["heart_rate"].append(data["heart_rate"])
+            metrics["steps"].append(data["steps"])
+
+    # Lossless for the benchmark: big enough that the producer never has to drop
+    subscription = api.subscribe(on_batch, batch_size=batch_size, interval=0.05, capacity=samples + 1)
+    start = time.perf_counter()
+    api.start_stream()
+    api.wait()
+    subscription.unsubscribe()
+    elapsed = time.perf_counter() - start
+    return metrics, elapsed, subscription.dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=1000, help="sample rate in Hz")
+    parser.add_argument("--seconds", type=float, default=600, help="simulated session length")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    metrics, elapsed, dropped = record(args.rate, args.seconds, args.batch_size)
+    samples = len(metrics["timestamp"])
+    print(f"recorded {samples} samples in {elapsed:.2f} s ({samples / elapsed:,.0f} samples/s, {dropped} dropped)")
+
+    start_time = datetime.now()
+    session = WorkoutSession(
+        activity_type="Running",
+        start_time=start_time,
+        end_time=start_time + timedelta(seconds=args.seconds),
+        metrics=metrics,
+        summary={"total_steps": metrics["steps"][-1] if samples else 0}
+    )
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        backends = [
+            ("JsonStorage", lambda: JsonStorage(os.path.join(tmpdir, "data.json"))),
+            ("JournalStorage", lambda: JournalStorage(os.path.join(tmpdir, "journal.json"))),
+            ("SQLiteStorage", lambda: SQLiteStorage(os.path.join(tmpdir, "data.db"))),
+        ]
+        for name, factory in backends:
+            manager = FitnessManager(username="BenchUser", storage=factory())
+            start = time.perf_counter()
+            manager.add_workout(session)
+            print(f"{name:<16} add_workout {(time.perf_counter() - start) * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
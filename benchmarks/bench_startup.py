@@ -0,0 +1,64 @@
+"""
+Startup benchmark: how long FitnessManager takes to load a multi-year profile.
+
+    python -m benchmarks.bench_startup --workouts 1095 --samples 3600
+
+Compares eager loading of inline samples against the split-metrics layout
+loaded lazily, where samples are only read when a session's metrics are accessed.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.storage import JsonStorage
+from .synthetic import make_profile
+
+
+def measure(storage_factory):
+    tracemalloc.start()
+    start = time.perf_counter()
+    manager = FitnessManager(username="BenchUser", storage=storage_factory())
+    # The manager only reads the data file when it's first used
+    manager.load_data()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    manager.check_goals()
+    goals_elapsed = time.perf_counter() - start
+    return elapsed, peak, goals_elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=1095, help="number of sessions (default: 3 years, one a day)")
+    parser.add_argument("--samples", type=int, default=3600, help="samples per session (default: 1 hour at 1 Hz)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        profile = make_profile(args.workouts, args.samples)
+        inline_path = os.path.join(tmpdir, "inline.json")
+        split_path = os.path.join(tmpdir, "split.json")
+        JsonStorage(inline_path).save(profile)
+        JsonStorage(split_path, split_metrics=True).save(profile)
+
+        print(f"{args.workouts} workouts x {args.samples} samples")
+        cases = [
+            ("eager, inline samples", lambda: JsonStorage(inline_path)),
+            ("lazy, inline samples", lambda: JsonStorage(inline_path, lazy=True)),
+            ("lazy, split samples", lambda: JsonStorage(split_path, split_metrics=True, lazy=True)),
+        ]
+        for name, factory in cases:
+            elapsed, peak, goals_elapsed = measure(factory)
+            print(f"{name:<24} load {elapsed * 1000:8.1f} ms  peak {peak / 2**20:8.1f} MiB  check_goals {goals_elapsed * 1000:6.1f} ms")
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Benchmark suite for the manager, models and sensor pipeline, with JSON output
+for tracking regressions across commits.
+
+    python -m benchmarks.run --scale small --output bench.json
+    python -m benchmarks.run --scale medium --compare bench.json
+
+Scales (synthetic profiles, see synthetic.py):
+    small   1,000 workouts x 100 samples    (100k samples)
+    medium  10,000 workouts x 100 samples   (1M samples)
+    large   100,000 workouts x 100 samples  (10M samples)
+
+Each benchmark runs `--repeat` times after one warm-up; the JSON holds the
+min/median/mean seconds per run plus the environment (commit, Python,
+platform). With `--compare`, medians are compared with an earlier result
+file and the run fails if any got more than `--threshold` slower.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from fitness_tracker.api import MockSensorAPI
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.models import UserProfile
+from fitness_tracker.storage import JsonStorage
+from .synthetic import make_profile
+
+SCALES = {
+    "small": (1_000, 100),
+    "medium": (10_000, 100),
+    "large": (100_000, 100),
+}
+
+SENSOR_SAMPLES = 100_000
+
+
+def timed(fn, repeat: int, number: int = 1) -> dict:
+    """Seconds per call of `fn` over `repeat` runs of `number` calls each, after one warm-up."""
+    fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+    return {"min": min(runs), "median": statistics.median(runs), "mean": statistics.fmean(runs), "runs": repeat}
+
+
+def bench_models(profile: UserProfile, repeat: int) -> dict:
+    data = profile.to_dict()
+    return {
+        "profile_to_dict": timed(profile.to_dict, repeat),
+        "profile_from_dict": timed(lambda: UserProfile.from_dict(data), repeat),
+    }
+
+
+def bench_manager(profile: UserProfile, tmpdir: str, repeat: int) -> dict:
+    path = os.path.join(tmpdir, "fitness_data.json")
+    JsonStorage(path).save(profile)
+    manager = FitnessManager(username=profile.username, storage=JsonStorage(path))
+    return {
+        "load_data": timed(manager.load_data, repeat),
+        "save_data": timed(manager.save_data, repeat),
+        "get_today_stats": timed(manager.get_today_stats, repeat, number=1000),
+        "check_goals": timed(manager.check_goals, repeat, number=1000),
+    }
+
+
+def bench_sensor(repeat: int, samples: int = SENSOR_SAMPLES) -> dict:
+    """Sample generation plus fan-out to callbacks and a batching subscription, without the 1 s sleep."""
+    results = {}
+    for callbacks in (1, 8):
+        api = MockSensorAPI()
+        received = [0]
+
+        def callback(data):
+            received[0] += 1
+
+        for _ in range(callbacks):
+            # Distinct callables, add_callback ignores duplicates
+            api.add_callback(lambda data: callback(data))
+        stats = timed(lambda: [api._emit(api.next_sample()) for _ in range(samples)], repeat)
+        stats["samples_per_second"] = samples / stats["median"]
+        results[f"sensor_callbacks_{callbacks}"] = stats
+
+    api = MockSensorAPI()
+    batches = []
+    subscription = api.subscribe(batches.append, batch_size=256, capacity=samples + 1)
+    stats = timed(lambda: [api._emit(api.next_sample()) for _ in range(samples)], repeat)
+    subscription.unsubscribe()
+    stats["samples_per_second"] = samples / stats["median"]
+    results["sensor_subscription"] = stats
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def run(scale: str, repeat: int) -> dict:
+    workouts, samples = SCALES[scale]
+    start = time.perf_counter()
+    # About three years of history, several workouts a day at the larger scales
+    profile = make_profile(workouts, samples, per_day=-(-workouts // 1095))
+    generated = time.perf_counter() - start
+
+    results = {}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        results.update(bench_models(profile, repeat))
+        results.update(bench_manager(profile, tmpdir, repeat))
+    finally:
+        shutil.rmtree(tmpdir)
+    results.update(bench_sensor(repeat))
+    return {
+        "scale": scale,
+        "workouts": workouts,
+        "samples": workouts * samples,
+        "generate_seconds": generated,
+        "environment": environment(),
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Names of benchmarks whose median is more than `threshold` (e.g. 0.2 = 20%) slower than in `baseline`."""
+    regressions = []
+    for name, stats in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        ratio = stats["median"] / before["median"]
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:<24} {before['median'] * 1000:10.3f} ms -> {stats['median'] * 1000:10.3f} ms  x{ratio:5.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (default 0.2)")
+    args = parser.parse_args(argv)
+
+    report = run(args.scale, args.repeat)
+    print(f"{report['workouts']} workouts, {report['samples']:,} samples (generated in {report['generate_seconds']:.1f} s)")
+    for name, stats in report["results"].items():
+        line = f"{name:<24} median {stats['median'] * 1000:10.3f} ms  min {stats['min'] * 1000:10.3f} ms"
+        if "samples_per_second" in stats:
+            line += f"  {stats['samples_per_second']:,.0f} samples/s"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != report["scale"]:
+            print(f"warning: baseline is scale {baseline.get('scale')!r}, this run is {report['scale']!r}")
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Synthetic profiles for the benchmarks."""
+import array
+import random
+from datetime import datetime, timedelta
+import numpy as np
+from fitness_tracker.models import UserProfile, Goal, GoalType, GoalPeriod, WorkoutSession
+from fitness_tracker.columns import MetricColumns
+
+
+def make_session(start_time: datetime, samples: int, rng: random.Random) -> WorkoutSession:
+    # Vectorized so that the large profiles (10M samples) are quick to build
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    heart_rate = np.clip(70 + np.cumsum(np_rng.integers(-2, 4, samples)), 60, 180).astype(np.uint16)
+    steps = np.cumsum(np_rng.choice([0, 1, 1, 2], samples)).astype(np.uint32)
+    total = int(steps[-1]) if samples else 0
+    return WorkoutSession(
+        activity_type=rng.choice(["Running", "Walking", "Cycling"]),
+        start_time=start_time,
+        end_time=start_time + timedelta(seconds=samples),
+        metrics=MetricColumns({
+            "timestamp": array.array("d", np.arange(samples, dtype=np.float64).tobytes()),
+            "heart_rate": array.array("H", heart_rate.tobytes()),
+            "steps": array.array("I", steps.tobytes()),
+        }),
+        summary={"total_steps": total, "avg_hr": float(heart_rate.mean()) if samples else 0}
+    )
+
+
+def make_profile(workouts: int, samples_per_workout: int, seed: int = 42, per_day: int = 1) -> UserProfile:
+    """`per_day` workouts a day, the last ones today, going back as many days as that takes."""
+    rng = random.Random(seed)
+    profile = UserProfile(username="BenchUser")
+    profile.goals = [
+        Goal(type=GoalType.STEPS, target_value=10000, period=GoalPeriod.DAILY),
+        Goal(type=GoalType.DURATION_MINUTES, target_value=30, period=GoalPeriod.DAILY),
+    ]
+    start = datetime.now().replace(hour=7, minute=0, second=0, microsecond=0) - timedelta(days=(workouts - 1) // per_day)
+    gap = timedelta(hours=12) / per_day
+    profile.workouts = [
+        make_session(start + timedelta(days=i // per_day) + gap * (i % per_day), samples_per_workout, rng)
+        for i in range(workouts)
+    ]
+    return profile
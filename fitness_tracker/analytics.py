@@ -0,0 +1,200 @@
+from datetime import timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from .columns import timestamps
+from .models import WorkoutSession
+from .live_stats import DEFAULT_MAX_HR, ZONE_BOUNDS, ZONE_LABELS
+
+
+def _column(session: WorkoutSession, name: str) -> np.ndarray:
+    # array.array columns expose the buffer protocol, so this doesn't copy
+    return np.asarray(session.metrics.get(name, ()), dtype=np.float64)
+
+
+def session_arrays(session: WorkoutSession):
+    """(timestamps, heart_rate, steps) for a session, all the same length."""
+    hr = _column(session, "heart_rate")
+    steps = _column(session, "steps")
+    n = len(hr)
+    t = np.asarray(timestamps(session.metrics, n), dtype=np.float64)
+    if len(steps) != n:
+        steps = np.zeros(n)
+    return t, hr, steps
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` samples (shorter at the start), O(n) via a cumulative sum."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values
+    csum = np.cumsum(values)
+    out = np.empty_like(csum)
+    out[:window] = csum[:window] / np.arange(1, min(window, len(values)) + 1)
+    out[window:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def cadence(t: np.ndarray, steps: np.ndarray) -> np.ndarray:
+    """Instantaneous cadence in steps/minute from cumulative step counts."""
+    if len(t) < 2:
+        return np.zeros(len(t))
+    dt = np.diff(t)
+    ds = np.diff(steps)
+    spm = np.divide(ds * 60.0, dt, out=np.zeros_like(ds), where=dt > 0)
+    return np.concatenate(([0.0], spm))
+
+
+def time_in_zones(t: np.ndarray, hr: np.ndarray, max_hr: float = DEFAULT_MAX_HR) -> np.ndarray:
+    """Seconds spent in each of ZONE_LABELS."""
+    dt = _sample_durations(t, np.array([0]))
+    zones = np.digitize(hr, np.array(ZONE_BOUNDS) * max_hr)
+    return np.bincount(zones, weights=dt, minlength=len(ZONE_LABELS))
+
+
+def _sample_durations(t: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Time each sample covers, i.e. the gap to the next sample in the same session (1 s for the last)."""
+    dt = np.ones(len(t))
+    if len(t) > 1:
+        dt[:-1] = np.diff(t)
+    ends = np.append(offsets[1:], len(t)) - 1
+    dt[ends[ends >= 0]] = 1.0
+    return np.clip(dt, 0, None)
+
+
+class WorkoutAnalytics:
+    """
+    Statistics over a whole workout history.
+
+    All sessions' samples are concatenated into flat NumPy arrays once, and
+    per-session results are computed with segmented reductions (`reduceat`,
+    `bincount`) rather than Python loops over samples.
+    """
+
+    def __init__(self, workouts: List[WorkoutSession], max_hr: float = DEFAULT_MAX_HR):
+        self.workouts = list(workouts)
+        self.max_hr = max_hr
+
+        arrays = [session_arrays(w) for w in self.workouts]
+        lengths = np.array([len(a[0]) for a in arrays], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else np.zeros(0, dtype=np.int64)
+        self.lengths = lengths
+        self.t = np.concatenate([a[0] for a in arrays]) if arrays else np.zeros(0)
+        self.hr = np.concatenate([a[1] for a in arrays]) if arrays else np.zeros(0)
+        self.steps = np.concatenate([a[2] for a in arrays]) if arrays else np.zeros(0)
+        self.session_index = np.repeat(np.arange(len(self.workouts)), lengths)
+        self._stats = None
+
+    def _segment(self, ufunc, values, empty=np.nan) -> np.ndarray:
+        """ufunc.reduceat per session, with `empty` for sessions without samples."""
+        out = np.full(len(self.workouts), empty, dtype=np.float64)
+        has_samples = self.lengths > 0
+        if has_samples.any():
+            out[has_samples] = ufunc.reduceat(values, self.offsets[has_samples])
+        return out
+
+    def session_stats(self) -> List[Dict]:
+        """Per-session HR max/min/avg, time in HR zones and average/peak cadence."""
+        if self._stats is not None:
+            return self._stats
+
+        n = len(self.workouts)
+        counts = self.lengths.astype(np.float64)
+        hr_max = self._segment(np.maximum, self.hr)
+        hr_min = self._segment(np.minimum, self.hr)
+        hr_sum = self._segment(np.add, self.hr, empty=0.0)
+        hr_avg = np.divide(hr_sum, counts, out=np.full(n, np.nan), where=counts > 0)
+
+        dt = _sample_durations(self.t, self.offsets)
+        zones = np.digitize(self.hr, np.array(ZONE_BOUNDS) * self.max_hr)
+        zone_seconds = np.bincount(
+            self.session_index * len(ZONE_LABELS) + zones,
+            weights=dt,
+            minlength=n * len(ZONE_LABELS)
+        ).reshape(n, len(ZONE_LABELS))
+
+        # Cadence: step deltas over time deltas, excluding the first sample of each session
+        ds = np.zeros(len(self.steps))
+        gaps = np.zeros(len(self.t))
+        if len(self.t) > 1:
+            ds[1:] = np.diff(self.steps)
+            gaps[1:] = np.diff(self.t)
+        first = self.offsets[self.lengths > 0]
+        ds[first] = 0
+        gaps[first] = 0
+        spm = np.divide(ds * 60.0, gaps, out=np.zeros_like(ds), where=gaps > 0)
+        cadence_max = self._segment(np.maximum, spm, empty=0.0)
+        step_sum = self._segment(np.add, ds, empty=0.0)
+        time_sum = self._segment(np.add, gaps, empty=0.0)
+        cadence_avg = np.divide(step_sum * 60.0, time_sum, out=np.zeros(n), where=time_sum > 0)
+
+        self._stats = [
+            {
+                "id": w.id,
+                "samples": int(self.lengths[i]),
+                "max_hr": None if np.isnan(hr_max[i]) else float(hr_max[i]),
+                "min_hr": None if np.isnan(hr_min[i]) else float(hr_min[i]),
+                "avg_hr": None if np.isnan(hr_avg[i]) else float(hr_avg[i]),
+                "time_in_zones": dict(zip(ZONE_LABELS, zone_seconds[i].tolist())),
+                "avg_cadence": float(cadence_avg[i]),
+                "max_cadence": float(cadence_max[i]),
+            }
+            for i, w in enumerate(self.workouts)
+        ]
+        return self._stats
+
+    def rolling_hr(self, session_idx: int, window: int = 30) -> np.ndarray:
+        start = self.offsets[session_idx]
+        return rolling_mean(self.hr[start:start + self.lengths[session_idx]], window)
+
+    def weekly_trends(self) -> List[Dict]:
+        """Totals per ISO week, oldest first."""
+        if not self.workouts:
+            return []
+        weeks = [w.start_time.isocalendar()[:2] for w in self.workouts]
+        keys = sorted(set(weeks))
+        index = {k: i for i, k in enumerate(keys)}
+        week_idx = np.array([index[k] for k in weeks])
+        steps = np.array([w.summary.get("total_steps", 0) for w in self.workouts], dtype=np.float64)
+        minutes = np.array([_duration(w).total_seconds() / 60 for w in self.workouts])
+        hr_sum = self._segment(np.add, self.hr, empty=0.0)
+
+        m = len(keys)
+        sessions = np.bincount(week_idx, minlength=m)
+        week_steps = np.bincount(week_idx, weights=steps, minlength=m)
+        week_minutes = np.bincount(week_idx, weights=minutes, minlength=m)
+        week_hr = np.bincount(week_idx, weights=hr_sum, minlength=m)
+        week_samples = np.bincount(week_idx, weights=self.lengths, minlength=m)
+        week_avg_hr = np.divide(week_hr, week_samples, out=np.zeros(m), where=week_samples > 0)
+
+        return [
+            {
+                "week": f"{year}-W{week:02d}",
+                "sessions": int(sessions[i]),
+                "total_steps": float(week_steps[i]),
+                "duration_minutes": float(week_minutes[i]),
+                "avg_hr": float(week_avg_hr[i]),
+            }
+            for i, (year, week) in enumerate(keys)
+        ]
+
+    def personal_bests(self) -> Dict[str, Optional[Dict]]:
+        """Best session for each record: {"value": ..., "session": WorkoutSession} or None."""
+        stats = self.session_stats()
+        candidates = {
+            "longest_duration_minutes": [_duration(w).total_seconds() / 60 for w in self.workouts],
+            "most_steps": [w.summary.get("total_steps", 0) for w in self.workouts],
+            "highest_max_hr": [s["max_hr"] or 0 for s in stats],
+            "highest_avg_cadence": [s["avg_cadence"] for s in stats],
+        }
+        bests = {}
+        for name, values in candidates.items():
+            if not values or max(values) <= 0:
+                bests[name] = None
+                continue
+            idx = int(np.argmax(values))
+            bests[name] = {"value": float(values[idx]), "session": self.workouts[idx]}
+        return bests
+
+
+def _duration(session: WorkoutSession) -> timedelta:
+    return session.end_time - session.start_time if session.end_time else timedelta(0)
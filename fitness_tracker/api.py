@@ -1,13 +1,114 @@
 import time
 import random
 import threading
-from typing import Callable, Optional
+from collections import deque
+from typing import Callable, List, Optional
+from . import instrumentation
+
+# What a subscription does with a new sample when its buffer is full
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+# Keep only the most recent sample; consumers that only display the latest value want this
+COALESCE = "coalesce"
+
+class Subscription:
+    """
+    A consumer of a sensor stream.
+
+    Samples are pushed into a bounded ring buffer by the producer thread
+    (never blocking it) and handed to `callback` as a list from this
+    subscription's own delivery thread, either every `interval` seconds or
+    once `batch_size` samples are waiting, whichever comes first. When the
+    buffer is full, `policy` decides which samples are dropped; the number
+    dropped is kept in `dropped`.
+    """
+
+    def __init__(self, callback: Callable[[List[dict]], None], batch_size: int = 64,
+                 interval: float = 0.25, capacity: int = 1024, policy: str = DROP_OLDEST,
+                 on_close: Optional[Callable[["Subscription"], None]] = None):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, COALESCE):
+            raise ValueError(f"Unknown policy: {policy}")
+        self.callback = callback
+        self.batch_size = batch_size
+        self.interval = interval
+        self.policy = policy
+        self.capacity = 1 if policy == COALESCE else capacity
+        self.dropped = 0
+        self.delivered = 0
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._on_close = on_close
+        self._thread = threading.Thread(target=self._deliver, daemon=True)
+        self._thread.start()
+
+    @property
+    def active(self) -> bool:
+        return not self._closed
+
+    def push(self, sample: dict):
+        """Called from the producer thread; O(1) and never waits on the consumer."""
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._buffer) >= self.capacity:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return
+                self._buffer.popleft()
+            self._buffer.append(sample)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def unsubscribe(self, flush: bool = True):
+        """Stop receiving samples. With `flush`, samples already buffered are delivered first."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            if not flush:
+                self._buffer.clear()
+            self._cond.notify()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+        if self._on_close:
+            self._on_close(self)
+
+    def _take_batch(self) -> List[dict]:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    def _deliver(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.interval
+                while not self._closed and len(self._buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+                done = self._closed and not self._buffer
+            if batch:
+                self.delivered += len(batch)
+                with instrumentation.timer("sensor.batch_callback"):
+                    self.callback(batch)
+            if done:
+                return
+
 
 class MockSensorAPI:
+    rate_hz = 1.0
+
     def __init__(self):
         self._running = False
         self._thread: Optional[threading.Thread] = None
         self._callbacks: list[Callable[[dict], None]] = []
+        self._subscriptions: list[Subscription] = []
+        self._lock = threading.Lock()
         
         # Simulation state
         self.current_heart_rate = 70
@@ -16,7 +117,27 @@ class MockSensorAPI:
 
     def add_callback(self, callback: Callable[[dict], None]):
         """Register a callback to receive live data updates."""
-        self._callbacks.append(callback)
+        if callback not in self._callbacks:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[dict], None]):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def subscribe(self, callback: Callable[[List[dict]], None], **options) -> Subscription:
+        """
+        Receive samples in batches on a separate thread, see `Subscription`
+        for the options. Call `unsubscribe()` on the result to stop.
+        """
+        subscription = Subscription(callback, on_close=self._remove_subscription, **options)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _remove_subscription(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
 
     def start_stream(self):
         """Start the mock data stream."""
@@ -24,11 +145,15 @@ class MockSensorAPI:
             return
         
         self._running = True
-        self.start_time = time.time()
-        self.total_steps = 0
+        self.reset()
         self._thread = threading.Thread(target=self._generate_data, daemon=True)
         self._thread.start()
 
+    def reset(self):
+        """Start a new session: elapsed time and step count go back to zero."""
+        self.start_time = time.time()
+        self.total_steps = 0
+
     def stop_stream(self):
         """Stop the mock data stream."""
         self._running = False
@@ -36,26 +161,39 @@ class MockSensorAPI:
             self._thread.join(timeout=1.0)
             self._thread = None
 
+    def _emit(self, data: dict):
+        # Inlined rather than a timer: this runs for every sample
+        start = time.perf_counter() if instrumentation.enabled else None
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.push(data)
+        for callback in list(self._callbacks):
+            callback(data)
+        if start is not None:
+            instrumentation.observe("sensor.emit", time.perf_counter() - start)
+
+    def next_sample(self) -> dict:
+        """Advance the simulation by one tick and return the sample."""
+        # Simulate heart rate fluctuation
+        change = random.randint(-2, 3)
+        self.current_heart_rate = max(60, min(180, self.current_heart_rate + change))
+        
+        # Simulate steps (approx 2 steps per second if running)
+        self.total_steps += random.choice([0, 1, 1, 2])
+        
+        elapsed = time.time() - self.start_time
+        
+        return {
+            "timestamp": time.time(),
+            "elapsed_seconds": elapsed,
+            "heart_rate": self.current_heart_rate,
+            "steps": self.total_steps
+        }
+
     def _generate_data(self):
         """Internal loop to generate mock data."""
         while self._running:
-            # Simulate heart rate fluctuation
-            change = random.randint(-2, 3)
-            self.current_heart_rate = max(60, min(180, self.current_heart_rate + change))
-            
-            # Simulate steps (approx 2 steps per second if running)
-            self.total_steps += random.choice([0, 1, 1, 2])
-            
-            elapsed = time.time() - self.start_time
-            
-            data = {
-                "timestamp": time.time(),
-                "elapsed_seconds": elapsed,
-                "heart_rate": self.current_heart_rate,
-                "steps": self.total_steps
-            }
-            
-            for callback in self._callbacks:
-                callback(data)
+            self._emit(self.next_sample())
             
             time.sleep(1.0) # Update every second
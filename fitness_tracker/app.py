@@ -1,7 +1,9 @@
+import threading
 import flet as ft
-from .manager import FitnessManager
+from .users import open_profile
 from .api import MockSensorAPI
-from .views import Views
+from .views import Views, DASHBOARD
+from . import instrumentation
 
 def main(page: ft.Page):
     page.title = "Fitness Tracker"
@@ -10,7 +12,9 @@ def main(page: ft.Page):
     page.window_height = 800
     page.padding = 0
     
-    manager = FitnessManager()
+    # Serves /metrics on localhost when FITNESS_METRICS_PORT is set
+    instrumentation.serve_from_config()
+    manager = open_profile()
     api = MockSensorAPI()
     views = Views(page, manager, api)
 
@@ -18,14 +22,8 @@ def main(page: ft.Page):
         index = e.control.selected_index
         page.controls.clear()
         
-        if index == 0:
-            page.add(views.get_dashboard())
-        elif index == 1:
-            page.add(views.get_workout_view())
-        elif index == 2:
-            page.add(views.get_history_view())
-        elif index == 3:
-            page.add(views.get_goals_view())
+        # Cached per tab; rebuilt only when the manager's data changed
+        page.add(views.get_view(index))
             
         page.update()
 
@@ -39,8 +37,19 @@ def main(page: ft.Page):
         on_change=change_tab
     )
 
+    def close(e):
+        # Whichever fires first: write the pending rollups and release the storage once
+        if not closing.acquire(blocking=False):
+            return
+        views.upload_queue.stop()
+        manager.close()
+
+    closing = threading.Lock()
+    page.on_close = close
+    page.on_disconnect = close
+
     # Initial view
-    page.add(views.get_dashboard())
+    page.add(views.get_view(DASHBOARD))
 
 if __name__ == "__main__":
     ft.app(target=main)
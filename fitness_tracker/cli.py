@@ -1,24 +1,31 @@
+import asyncio
 import time
-from datetime import datetime
 from rich.console import Console
 from rich.layout import Layout
 from rich.panel import Panel
 from rich.live import Live
 from rich.table import Table
 from rich.prompt import Prompt, IntPrompt, Confirm
-from rich.align import Align
 from rich import box
 
 from .manager import FitnessManager
-from .models import Goal, GoalType, GoalPeriod, WorkoutSession
+from .models import Goal, GoalType, GoalPeriod
 from .api import MockSensorAPI
+from .recorder import AsyncSensorSource, WorkoutRecorder
+from .live_stats import format_pace
+from .users import open_profile
+from . import instrumentation
 
 console = Console()
+HISTORY_PAGE_SIZE = 20
 
 class FitnessCLI:
-    def __init__(self):
-        self.manager = FitnessManager()
-        self.api = MockSensorAPI()
+    def __init__(self, manager: FitnessManager = None, api=None):
+        self.manager = manager or open_profile()
+        # Any MockSensorAPI-compatible source, e.g. simulator.SensorSimulator for load tests
+        self.api = api or MockSensorAPI()
+        # Serves /metrics on localhost when FITNESS_METRICS_PORT is set
+        instrumentation.serve_from_config()
 
     def main_menu(self):
         while True:
@@ -31,9 +38,10 @@ class FitnessCLI:
             console.print("1. Start Workout")
             console.print("2. Set Goal")
             console.print("3. View History")
-            console.print("4. Exit")
+            console.print("4. Performance Metrics")
+            console.print("5. Exit")
             
-            choice = Prompt.ask("Select an option", choices=["1", "2", "3", "4"])
+            choice = Prompt.ask("Select an option", choices=["1", "2", "3", "4", "5"])
             
             if choice == "1":
                 self.start_workout()
@@ -42,13 +50,16 @@ class FitnessCLI:
             elif choice == "3":
                 self.view_history()
             elif choice == "4":
+                self.show_metrics()
+            elif choice == "5":
                 console.print("Goodbye!")
+                self.manager.close()
                 break
 
     def show_dashboard(self):
         goals_status = self.manager.check_goals()
         
-        table = Table(title="Daily Goals Progress", box=box.ROUNDED)
+        table = Table(title="Goals Progress", box=box.ROUNDED)
         table.add_column("Goal", style="cyan")
         table.add_column("Target", style="magenta")
         table.add_column("Current", style="green")
@@ -77,9 +88,6 @@ class FitnessCLI:
         
         activity_type = Prompt.ask("Enter activity type", default="Running")
         
-        self.api.start_stream()
-        start_time = datetime.now()
-        
         # Live display layout
         layout = Layout()
         layout.split_column(
@@ -91,71 +99,86 @@ class FitnessCLI:
         layout["header"].update(Panel(f"Activity: [bold]{activity_type}[/bold]", style="green"))
         layout["footer"].update(Panel("Press Ctrl+C to stop workout", style="red"))
         
-        metrics_data = {"heart_rate": [], "steps": []}
-        current_data = {"heart_rate": 0, "steps": 0, "elapsed": 0}
+        recorder = WorkoutRecorder(activity_type)
 
-        def update_data(data):
-            current_data["heart_rate"] = data["heart_rate"]
-            current_data["steps"] = data["steps"]
-            current_data["elapsed"] = data["elapsed_seconds"]
+        def render():
+            # Update metrics panel
+            current_data = recorder.latest
+            # Kept up to date per sample by the recorder, so this is O(1) however long the workout
+            live = recorder.stats.snapshot()
+            m_table = Table.grid(expand=True)
+            m_table.add_column(justify="center", ratio=1)
+            m_table.add_column(justify="center", ratio=1)
+            m_table.add_column(justify="center", ratio=1)
+            
+            m_table.add_row(
+                Panel(f"[bold]{int(current_data['elapsed_seconds'])}s[/bold]\nDuration", border_style="blue"),
+                Panel(f"[bold]{current_data['heart_rate']}[/bold]\nBPM", border_style="red"),
+                Panel(f"[bold]{current_data['steps']}[/bold]\nSteps", border_style="yellow")
+            )
+            m_table.add_row(
+                Panel(f"[bold]{live['rolling_hr'] or 0:.0f}[/bold] / {live['avg_hr'] or 0:.0f}\n30s / Avg BPM", border_style="red"),
+                Panel(f"[bold]{live['zone'] or '--'}[/bold]\nHR Zone", border_style="magenta"),
+                Panel(f"[bold]{live['cadence']:.0f}[/bold] spm\n{format_pace(live['pace_seconds_per_km'])}", border_style="yellow")
+            )
             
-            metrics_data["heart_rate"].append(data["heart_rate"])
-            metrics_data["steps"].append(data["steps"])
+            layout["metrics"].update(m_table)
 
-        self.api.add_callback(update_data)
+        async def run():
+            # Sensor and display share one event loop; no threads involved
+            async def refresh():
+                while True:
+                    render()
+                    await asyncio.sleep(0.25)
+
+            refresh_task = asyncio.create_task(refresh())
+            try:
+                await recorder.run(AsyncSensorSource(self.api, realtime=getattr(self.api, "realtime", True)))
+            finally:
+                refresh_task.cancel()
 
         try:
-            with Live(layout, refresh_per_second=4) as live:
-                while True:
-                    # Update metrics panel
-                    m_table = Table.grid(expand=True)
-                    m_table.add_column(justify="center", ratio=1)
-                    m_table.add_column(justify="center", ratio=1)
-                    m_table.add_column(justify="center", ratio=1)
-                    
-                    m_table.add_row(
-                        Panel(f"[bold size=30]{int(current_data['elapsed'])}s[/bold]\nDuration", border_style="blue"),
-                        Panel(f"[bold size=30]{current_data['heart_rate']}[/bold]\nBPM", border_style="red"),
-                        Panel(f"[bold size=30]{current_data['steps']}[/bold]\nSteps", border_style="yellow")
-                    )
-                    
-                    layout["metrics"].update(m_table)
-                    time.sleep(0.1)
+            with Live(layout, refresh_per_second=4):
+                asyncio.run(run())
                     
         except KeyboardInterrupt:
             pass
         finally:
-            self.api.stop_stream()
-            end_time = datetime.now()
-            
             # Save session
-            session = WorkoutSession(
-                activity_type=activity_type,
-                start_time=start_time,
-                end_time=end_time,
-                metrics=metrics_data,
-                summary={
-                    "total_steps": current_data["steps"],
-                    "avg_hr": sum(metrics_data["heart_rate"]) / len(metrics_data["heart_rate"]) if metrics_data["heart_rate"] else 0
-                }
-            )
+            session = recorder.finish()
             self.manager.add_workout(session)
             console.print("\n[bold green]Workout Saved![/bold green]")
+            self._print_summary(session.summary)
             time.sleep(2)
 
+    def _print_summary(self, summary):
+        table = Table(title="Workout Summary")
+        table.add_column("Metric")
+        table.add_column("Value")
+        table.add_row("Steps", str(summary["total_steps"]))
+        table.add_row("Avg / Max HR", f"{summary['avg_hr']:.0f} / {summary['max_hr']:.0f}")
+        table.add_row("Avg Cadence", f"{summary['avg_cadence']:.0f} spm")
+        table.add_row("Distance", f"{summary['distance_m'] / 1000:.2f} km")
+        table.add_row("Avg Pace", format_pace(summary["avg_pace_seconds_per_km"]))
+        for label, seconds in summary["time_in_zones"].items():
+            if seconds:
+                table.add_row(label, f"{int(seconds) // 60}:{int(seconds) % 60:02d}")
+        console.print(table)
+
     def set_goal(self):
         console.clear()
         console.print(Panel("[bold]Set a New Goal[/bold]"))
         
-        g_type_str = Prompt.ask("Goal Type", choices=["steps", "duration_minutes"], default="steps")
+        g_type_str = Prompt.ask("Goal Type", choices=[t.value for t in GoalType], default="steps")
         g_type = GoalType(g_type_str)
         
         target = IntPrompt.ask("Target Value")
+        period = Prompt.ask("Period", choices=[p.value for p in GoalPeriod], default="daily")
         
         goal = Goal(
             type=g_type,
             target_value=target,
-            period=GoalPeriod.DAILY # Simplified for now
+            period=GoalPeriod(period)
         )
         
         self.manager.add_goal(goal)
@@ -163,26 +186,100 @@ class FitnessCLI:
         time.sleep(1)
 
     def view_history(self):
-        console.clear()
-        table = Table(title="Workout History")
-        table.add_column("Date")
-        table.add_column("Activity")
-        table.add_column("Duration (min)")
-        table.add_column("Steps")
-        table.add_column("Avg HR")
-        
-        for w in self.manager.profile.workouts:
-            duration = (w.end_time - w.start_time).total_seconds() / 60 if w.end_time else 0
-            steps = w.summary.get("total_steps", 0)
-            avg_hr = w.summary.get("avg_hr", 0)
+        # Imported here so NumPy is only loaded when it's needed
+        from .analytics import WorkoutAnalytics
+        # Cursors of the pages before the current one, for going back
+        previous = []
+        cursor = None
+        while True:
+            console.clear()
+            workouts, next_cursor = self.manager.list_workouts(limit=HISTORY_PAGE_SIZE, cursor=cursor)
+            stats = WorkoutAnalytics(workouts).session_stats()
+
+            table = Table(title=f"Workout History (page {len(previous) + 1})")
+            table.add_column("Date")
+            table.add_column("Activity")
+            table.add_column("Duration (min)")
+            table.add_column("Steps")
+            table.add_column("Avg HR")
+            table.add_column("Max HR")
+            table.add_column("Cadence (spm)")
             
-            table.add_row(
-                w.start_time.strftime("%Y-%m-%d %H:%M"),
-                w.activity_type,
-                f"{duration:.1f}",
-                str(steps),
-                f"{avg_hr:.0f}"
+            for w, s in zip(workouts, stats):
+                duration = (w.end_time - w.start_time).total_seconds() / 60 if w.end_time else 0
+                steps = w.summary.get("total_steps", 0)
+                avg_hr = w.summary.get("avg_hr", 0)
+                
+                table.add_row(
+                    w.start_time.strftime("%Y-%m-%d %H:%M"),
+                    w.activity_type,
+                    f"{duration:.1f}",
+                    str(steps),
+                    f"{avg_hr:.0f}",
+                    f"{s['max_hr']:.0f}" if s["max_hr"] is not None else "-",
+                    f"{s['avg_cadence']:.0f}"
+                )
+                
+            console.print(table)
+
+            choices = ["b", "q"]
+            labels = ["(b)ests", "(q)uit"]
+            if previous:
+                choices.insert(0, "p")
+                labels.insert(0, "(p)revious")
+            if next_cursor:
+                choices.insert(0, "n")
+                labels.insert(0, "(n)ext")
+            choice = Prompt.ask("\n" + ", ".join(labels), choices=choices, default="q")
+            if choice == "n":
+                previous.append(cursor)
+                cursor = next_cursor
+            elif choice == "p":
+                cursor = previous.pop()
+            elif choice == "b":
+                self.show_personal_bests()
+            else:
+                return
+
+    def show_personal_bests(self):
+        # Records need the whole history, so they're only computed when asked for
+        from .analytics import WorkoutAnalytics
+        analytics = WorkoutAnalytics(self.manager.profile.workouts)
+        bests = Table(title="Personal Bests", box=box.ROUNDED)
+        bests.add_column("Record", style="cyan")
+        bests.add_column("Value", style="green")
+        bests.add_column("Date")
+        for name, best in analytics.personal_bests().items():
+            if best is None:
+                continue
+            bests.add_row(
+                name.replace("_", " ").capitalize(),
+                f"{best['value']:.0f}",
+                best["session"].start_time.strftime("%Y-%m-%d")
             )
-            
+        console.print(bests)
+        Prompt.ask("\nPress Enter to return")
+
+    def show_metrics(self):
+        """Timings and counters recorded by instrumentation.py in this process."""
+        console.clear()
+        if not instrumentation.enabled:
+            console.print("[yellow]Instrumentation is off (set FITNESS_INSTRUMENTATION=1 to record from startup).[/yellow]")
+            if Confirm.ask("Turn it on now?"):
+                instrumentation.enable()
+            return
+
+        data = instrumentation.snapshot()
+        table = Table(title="Performance (ms)", box=box.ROUNDED)
+        table.add_column("Timer", style="cyan")
+        table.add_column("Count", justify="right")
+        for column in ("Mean", "p50", "p95", "p99", "Max"):
+            table.add_column(column, justify="right", style="green")
+        for name, stats in data["timers"].items():
+            values = [stats[key] for key in ("mean", "p50", "p95", "p99", "max")]
+            table.add_row(name, str(stats["count"]),
+                          *(f"{value * 1000:.3f}" if value is not None else "-" for value in values))
         console.print(table)
+        for name, value in data["counters"].items():
+            console.print(f"{name}: {value}")
         Prompt.ask("\nPress Enter to return")
@@ -0,0 +1,86 @@
+"""
+JSON encoders/decoders for the storage backends.
+
+`get_codec()` picks the one named by `config.JSON_CODEC`: "auto" (the
+default) uses orjson or msgspec when installed and the standard library
+otherwise; "orjson", "msgspec" and "json" force one, falling back to the
+standard library if it isn't installed. All of them write compact JSON
+(no indentation) and read any JSON, so data files written by older
+versions with `indent=4` load unchanged and files can be moved between
+codecs freely.
+"""
+import json
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class StdlibCodec:
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MsgspecCodec:
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj) -> bytes:
+        return self._encoder.encode(obj)
+
+    def loads(self, data):
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as ex:
+            # Callers handle the stdlib error (orjson's is already a subclass)
+            raise json.JSONDecodeError(str(ex), data if isinstance(data, str) else "", 0) from ex
+
+
+_AVAILABLE = {"json": StdlibCodec}
+if msgspec is not None:
+    _AVAILABLE["msgspec"] = MsgspecCodec
+if orjson is not None:
+    _AVAILABLE["orjson"] = OrjsonCodec
+
+_codecs = {}
+
+
+def get_codec(name: Optional[str] = None):
+    """The codec called `name`, or the one configured in config.JSON_CODEC."""
+    if name is None:
+        from .config import JSON_CODEC
+        name = JSON_CODEC
+    if name == "auto":
+        name = "orjson" if "orjson" in _AVAILABLE else "msgspec" if "msgspec" in _AVAILABLE else "json"
+    elif name not in ("json", "orjson", "msgspec"):
+        raise ValueError(f"Unknown JSON codec: {name}")
+    if name not in _AVAILABLE:
+        name = "json"
+    if name not in _codecs:
+        _codecs[name] = _AVAILABLE[name]()
+    return _codecs[name]
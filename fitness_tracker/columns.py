@@ -0,0 +1,204 @@
+import array
+import binascii
+import sys
+import threading
+from typing import Dict, Iterable, Sequence
+
+# Typecodes for the known metric columns; anything else is stored as float64.
+#   timestamp:  seconds since the session started
+#   heart_rate: BPM (uint16)
+#   steps:      cumulative step count (uint32)
+COLUMN_TYPES = {
+    "timestamp": "d",
+    "heart_rate": "H",
+    "steps": "I",
+}
+DEFAULT_TYPE = "d"
+
+# Held while a LazyMetrics fills itself; loads are rare and short, so one lock is shared by all of them
+_load_lock = threading.Lock()
+
+FORMAT = "columns/v1"
+
+
+def to_array(name: str, values: Iterable) -> array.array:
+    """Pack values into the typed array for column `name`, widening to float64 if they don't fit."""
+    if isinstance(values, array.array):
+        return values
+    values = list(values)
+    try:
+        return array.array(COLUMN_TYPES.get(name, DEFAULT_TYPE), values)
+    except (TypeError, OverflowError):
+        # e.g. fractional heart rates from another source
+        return array.array(DEFAULT_TYPE, values)
+
+
+def fits(name: str, value) -> bool:
+    """Whether `value` can be appended to column `name` as is, e.g. a non-negative int for heart_rate."""
+    typecode = COLUMN_TYPES.get(name, DEFAULT_TYPE)
+    if typecode == "d":
+        return isinstance(value, (int, float))
+    return isinstance(value, int) and 0 <= value < 2 ** (8 * array.array(typecode).itemsize)
+
+
+def timestamps(metrics, n: int) -> Sequence[float]:
+    """Seconds since the start of each of a session's `n` samples, from any mapping of columns."""
+    t = metrics.get("timestamp", ())
+    # Sessions recorded before the timestamp column existed were sampled at 1 Hz
+    return t if len(t) == n else range(n)
+
+
+class MetricColumns(dict):
+    """
+    Compact, column-oriented storage for a session's samples.
+
+    A dict of metric name -> `array.array`, so existing code that does
+    `metrics["heart_rate"].append(x)`, `len(...)`, `sum(...)` or iterates
+    keeps working, while each sample costs 2-8 bytes instead of a boxed
+    Python object. Serializes to raw little-endian blobs (base64 in JSON).
+    """
+
+    def __init__(self, data=None):
+        super().__init__()
+        for name, values in (data or {}).items():
+            self[name] = values
+
+    def __setitem__(self, name, values):
+        # Column names repeat in every session, one interned copy is shared
+        super().__setitem__(sys.intern(name), to_array(name, values))
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default if default is not None else []
+        return self[name]
+
+    def update(self, other=(), **kwargs):
+        for name, values in dict(other, **kwargs).items():
+            self[name] = values
+
+    def append_sample(self, sample: Dict[str, float]):
+        """Append one value to every column present in `sample`."""
+        for name, column in self.items():
+            if name in sample:
+                column.append(sample[name])
+
+    def to_dict(self) -> dict:
+        columns = {}
+        for name, values in self.items():
+            if sys.byteorder == "big":
+                values = array.array(values.typecode, values)
+                values.byteswap()
+            columns[name] = {
+                "type": values.typecode,
+                # binascii directly: base64.b64encode/b64decode add a Python-level wrapper per column
+                "data": binascii.b2a_base64(values.tobytes(), newline=False).decode("ascii")
+            }
+        return {"format": FORMAT, "columns": columns}
+
+    @classmethod
+    def from_dict(cls, data) -> "MetricColumns":
+        """Accepts both the encoded form and the legacy `{name: [values...]}` lists."""
+        if not is_encoded(data):
+            return cls(data or {})
+        metrics = cls()
+        for name, column in data["columns"].items():
+            values = array.array(column["type"])
+            values.frombytes(binascii.a2b_base64(column["data"]))
+            if sys.byteorder == "big":
+                values.byteswap()
+            dict.__setitem__(metrics, sys.intern(name), values)
+        return metrics
+
+
+def is_encoded(data) -> bool:
+    return isinstance(data, dict) and data.get("format") == FORMAT and isinstance(data.get("columns"), dict)
+
+
+class LazyMetrics(MetricColumns):
+    """
+    MetricColumns whose contents are fetched by `loader` on first access.
+
+    Lets storage backends hand out sessions with just `summary`/`start_time`/
+    `end_time` populated; views that never touch the samples never pay for them.
+    """
+
+    def __init__(self, loader, source=None):
+        super().__init__()
+        self._loader = loader
+        # Where `loader` reads from (e.g. a file path), so a backend can tell it needn't write them back
+        self.source = source
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    def _ensure(self):
+        if self._loader is not None:
+            with _load_lock:
+                if self._loader is not None:
+                    for name, values in self._loader().items():
+                        dict.__setitem__(self, name, to_array(name, values))
+                    # Cleared only once filled, so other threads never read it half loaded
+                    self._loader = None
+
+    def __getitem__(self, name):
+        self._ensure()
+        return super().__getitem__(name)
+
+    def __setitem__(self, name, values):
+        self._ensure()
+        super().__setitem__(name, values)
+
+    def __delitem__(self, name):
+        self._ensure()
+        super().__delitem__(name)
+
+    def __contains__(self, name):
+        self._ensure()
+        return super().__contains__(name)
+
+    def __iter__(self):
+        self._ensure()
+        return super().__iter__()
+
+    def __len__(self):
+        self._ensure()
+        return super().__len__()
+
+    def __eq__(self, other):
+        self._ensure()
+        return super().__eq__(other)
+
+    def __repr__(self):
+        if not self.loaded:
+            return "LazyMetrics(<not loaded>)"
+        return super().__repr__()
+
+    def get(self, name, default=None):
+        self._ensure()
+        return super().get(name, default)
+
+    def keys(self):
+        self._ensure()
+        return super().keys()
+
+    def values(self):
+        self._ensure()
+        return super().values()
+
+    def items(self):
+        self._ensure()
+        return super().items()
+
+    def pop(self, *args):
+        self._ensure()
+        return super().pop(*args)
+
+    def copy(self):
+        self._ensure()
+        return MetricColumns(self)
+
+    def peek(self) -> MetricColumns:
+        """The columns, without keeping them here if they aren't loaded yet."""
+        loader = self._loader
+        return MetricColumns(self if loader is None else loader())
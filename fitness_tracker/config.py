@@ -1,8 +1,29 @@
-import keyring
+import os
 
-# Try to get from keyring first, fallback to env var (for backward compatibility/dev)
-STRAVA_ACCESS_TOKEN = keyring.get_password("fitness_tracker", "strava_access_token")
+# JSON encoder/decoder used by the storage backends, see codec.py:
+# "auto" (orjson or msgspec if installed, else the standard library), "orjson", "msgspec" or "json"
+JSON_CODEC = os.getenv("FITNESS_JSON_CODEC", "auto")
 
-if not STRAVA_ACCESS_TOKEN:
-    import os
-    STRAVA_ACCESS_TOKEN = os.getenv("STRAVA_ACCESS_TOKEN")
+# Timers and counters on the hot paths, see instrumentation.py; setting a
+# port also serves them over HTTP on localhost (and turns them on)
+INSTRUMENTATION = os.getenv("FITNESS_INSTRUMENTATION", "0") not in ("", "0")
+METRICS_PORT = int(os.getenv("FITNESS_METRICS_PORT", "0"))
+
+# Profile the app, CLI and import/export tool open; each user's data lives in
+# their own directory under users/ (see users.py). Unset keeps the
+# single-user fitness_data.json
+USERNAME = os.getenv("FITNESS_USER", "")
+
+
+def __getattr__(name):
+    # The keyring lookup is slow (it may start a backend), so it only happens
+    # when the token is first asked for, not whenever config is imported
+    if name == "STRAVA_ACCESS_TOKEN":
+        import keyring
+        # Try to get from keyring first, fallback to env var (for backward compatibility/dev)
+        token = keyring.get_password("fitness_tracker", "strava_access_token")
+        if not token:
+            token = os.getenv("STRAVA_ACCESS_TOKEN")
+        globals()["STRAVA_ACCESS_TOKEN"] = token
+        return token
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
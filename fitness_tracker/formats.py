@@ -0,0 +1,602 @@
+"""
+Streaming GPX, TCX and FIT export/import for workout sessions.
+
+Exporters are generators that produce the file a trackpoint at a time, and
+importers parse incrementally (`iterparse` for the XML formats, one message
+at a time for FIT) and append each sample straight into typed columns, so
+memory stays flat however long the session or however many files are
+imported. Cadence is written as recorded (steps per minute); step counts,
+which none of the formats has a field for, go in a `pft:` extension in
+GPX/TCX and in the record's total_cycles field in FIT.
+"""
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional
+from xml.sax.saxutils import escape
+from .columns import LazyMetrics, MetricColumns, timestamps
+from .live_stats import LiveStats, recompute_summary
+from .models import WorkoutSession
+
+# Per-sample values carried by the exporters, besides the time
+SAMPLE_FIELDS = ("heart_rate", "steps", "cadence", "latitude", "longitude", "power")
+INTEGER_FIELDS = ("heart_rate", "steps")
+
+GPX_NS = "http://www.topografix.com/GPX/1/1"
+TCX_NS = "http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"
+GARMIN_TPX_NS = "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
+GARMIN_AX_NS = "http://www.garmin.com/xmlschemas/ActivityExtension/v2"
+PFT_NS = "https://github.com/gopalakrishnaa/Personal-Fitness-tracker/xmlschemas/v1"
+
+CREATOR = "Personal Fitness Tracker"
+CHUNK_SAMPLES = 256  # trackpoints per string yielded by the XML exporters
+
+
+def iter_samples(session: WorkoutSession) -> Iterator[dict]:
+    """The session's samples one at a time as {"time": datetime, <field>: value, ...}."""
+    metrics = session.metrics
+    fields = [name for name in SAMPLE_FIELDS if name in metrics and len(metrics[name])]
+    count = max([len(metrics[name]) for name in fields] + [len(metrics.get("timestamp", ()))])
+    columns = [(name, metrics[name]) for name in fields]
+    for i, offset in enumerate(timestamps(metrics, count)):
+        sample = {"time": session.start_time + timedelta(seconds=offset)}
+        for name, column in columns:
+            if i < len(column):
+                sample[name] = column[i]
+        yield sample
+
+
+class SessionBuilder:
+    """Accumulates imported samples into a WorkoutSession's typed columns."""
+
+    def __init__(self, activity_type: str = "Running"):
+        self.activity_type = activity_type
+        self.metrics = MetricColumns({"timestamp": []})
+        self.start_time: Optional[datetime] = None
+        self.end_time: Optional[datetime] = None
+        self.count = 0
+
+    def add(self, sample: dict):
+        time = sample["time"]
+        if self.start_time is None:
+            self.start_time = time
+        self.end_time = time
+        self.metrics["timestamp"].append((time - self.start_time).total_seconds())
+        for name in SAMPLE_FIELDS:
+            if name not in sample:
+                continue
+            if name not in self.metrics:
+                # First time this field shows up: pad it to the other columns' length
+                self.metrics[name] = [0] * self.count
+            column = self.metrics[name]
+            # Fill gaps left by samples without this field with the last value
+            while len(column) < self.count:
+                column.append(column[-1])
+            value = sample[name]
+            column.append(int(value) if name in INTEGER_FIELDS else value)
+        self.count += 1
+
+    def build(self, start_time: Optional[datetime] = None) -> WorkoutSession:
+        for column in self.metrics.values():
+            while 0 < len(column) < self.count:
+                column.append(column[-1])
+        return WorkoutSession(
+            activity_type=self.activity_type,
+            start_time=start_time or self.start_time or datetime.now(),
+            end_time=self.end_time,
+            metrics=self.metrics,
+            # The same summary keys a recorded workout gets
+            summary=recompute_summary(self.metrics) or LiveStats().summary()
+        )
+
+
+def _iso(dt: datetime) -> str:
+    # Session times are naive local time; the file formats want UTC
+    return dt.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _parse_time(text: str) -> datetime:
+    dt = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    return dt.astimezone().replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _number(value) -> str:
+    return str(value) if isinstance(value, int) else f"{value:.7g}" if abs(value) < 1000 else f"{value:.1f}"
+
+
+def _chunked(lines: Iterable[str]) -> Iterator[str]:
+    """Join trackpoints into moderately sized strings so writing isn't one call per line."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_SAMPLES:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+# --- GPX ---------------------------------------------------------------------
+
+def gpx_chunks(session: WorkoutSession) -> Iterator[str]:
+    """GPX 1.1 document for a session with GPS samples, as a stream of strings."""
+    if "latitude" not in session.metrics or "longitude" not in session.metrics:
+        raise ValueError("GPX export needs a session recorded with GPS")
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<gpx version="1.1" creator="{CREATOR}" xmlns="{GPX_NS}" '
+        f'xmlns:gpxtpx="{GARMIN_TPX_NS}" xmlns:pft="{PFT_NS}">\n'
+        f'<metadata><time>{_iso(session.start_time)}</time></metadata>\n'
+        f'<trk><name>{escape(session.activity_type)} Session</name><type>{escape(session.activity_type)}</type>\n'
+        '<trkseg>\n'
+    )
+    yield from _chunked(_gpx_trkpt(s) for s in iter_samples(session) if "latitude" in s and "longitude" in s)
+    yield '</trkseg>\n</trk>\n</gpx>\n'
+
+
+def _gpx_trkpt(sample: dict) -> str:
+    tpx = ""
+    if "heart_rate" in sample:
+        tpx += f"<gpxtpx:hr>{sample['heart_rate']}</gpxtpx:hr>"
+    if "cadence" in sample:
+        tpx += f"<gpxtpx:cad>{round(sample['cadence'])}</gpxtpx:cad>"
+    ext = f"<gpxtpx:TrackPointExtension>{tpx}</gpxtpx:TrackPointExtension>" if tpx else ""
+    if "steps" in sample:
+        ext += f"<pft:steps>{sample['steps']}</pft:steps>"
+    if "power" in sample:
+        ext += f"<pft:power>{_number(sample['power'])}</pft:power>"
+    return (
+        f'<trkpt lat="{sample["latitude"]:.7f}" lon="{sample["longitude"]:.7f}">'
+        f'<time>{_iso(sample["time"])}</time>'
+        + (f"<extensions>{ext}</extensions>" if ext else "")
+        + "</trkpt>\n"
+    )
+
+
+def iter_gpx(source, info: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Samples from a GPX file (path or binary file object). `info`, if given,
+    receives "activity_type" and "start_time" as they are parsed.
+    """
+    info = {} if info is None else info
+    for elem in _iter_elements(source, ("trkpt", "type", "metadata")):
+        tag = _local(elem.tag)
+        if tag == "type":
+            info["activity_type"] = (elem.text or "").strip() or info.get("activity_type")
+        elif tag == "metadata":
+            for child in elem:
+                if _local(child.tag) == "time" and child.text:
+                    info["start_time"] = _parse_time(child.text)
+        elif tag == "trkpt":
+            sample = {"latitude": float(elem.get("lat")), "longitude": float(elem.get("lon"))}
+            for child in elem.iter():
+                name = _local(child.tag)
+                text = (child.text or "").strip()
+                if not text:
+                    continue
+                if name == "time":
+                    sample["time"] = _parse_time(text)
+                elif name == "hr":
+                    sample["heart_rate"] = int(float(text))
+                elif name == "cad":
+                    sample["cadence"] = float(text)
+                elif name == "steps":
+                    sample["steps"] = int(float(text))
+                elif name == "power":
+                    sample["power"] = float(text)
+            if "time" in sample:
+                yield sample
+
+
+# --- TCX ---------------------------------------------------------------------
+
+TCX_SPORTS = {"running": "Running", "walking": "Other", "cycling": "Biking"}
+TCX_ACTIVITY_TYPES = {"Running": "Running", "Biking": "Cycling", "Other": "Other"}
+
+
+def tcx_chunks(session: WorkoutSession) -> Iterator[str]:
+    """Garmin TCX v2 document with a single lap, as a stream of strings."""
+    sport = TCX_SPORTS.get(session.activity_type.lower(), "Other")
+    end_time = session.end_time or session.start_time
+    start = _iso(session.start_time)
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<TrainingCenterDatabase xmlns="{TCX_NS}" xmlns:ns3="{GARMIN_AX_NS}" xmlns:pft="{PFT_NS}">\n'
+        f'<Activities><Activity Sport="{sport}"><Id>{start}</Id>\n'
+        f'<Lap StartTime="{start}">'
+        f'<TotalTimeSeconds>{(end_time - session.start_time).total_seconds():.1f}</TotalTimeSeconds>'
+        f'<DistanceMeters>0</DistanceMeters>'
+        f'<Calories>{int(session.summary.get("calories", 0))}</Calories>'
+        '<Intensity>Active</Intensity><TriggerMethod>Manual</TriggerMethod>\n'
+        '<Track>\n'
+    )
+    yield from _chunked(_tcx_trackpoint(s) for s in iter_samples(session))
+    yield (
+        '</Track>\n</Lap>\n'
+        f'<Notes>{escape(session.activity_type)}</Notes>\n'
+        '</Activity></Activities>\n</TrainingCenterDatabase>\n'
+    )
+
+
+def _tcx_trackpoint(sample: dict) -> str:
+    parts = [f"<Trackpoint><Time>{_iso(sample['time'])}</Time>"]
+    if "latitude" in sample and "longitude" in sample:
+        parts.append(
+            f"<Position><LatitudeDegrees>{sample['latitude']:.7f}</LatitudeDegrees>"
+            f"<LongitudeDegrees>{sample['longitude']:.7f}</LongitudeDegrees></Position>"
+        )
+    if "heart_rate" in sample:
+        parts.append(f"<HeartRateBpm><Value>{sample['heart_rate']}</Value></HeartRateBpm>")
+    if "cadence" in sample:
+        parts.append(f"<Cadence>{min(254, round(sample['cadence']))}</Cadence>")
+    ext = ""
+    if "power" in sample:
+        ext += f"<ns3:TPX><ns3:Watts>{round(sample['power'])}</ns3:Watts></ns3:TPX>"
+    if "steps" in sample:
+        ext += f"<pft:Steps>{sample['steps']}</pft:Steps>"
+    if ext:
+        parts.append(f"<Extensions>{ext}</Extensions>")
+    parts.append("</Trackpoint>\n")
+    return "".join(parts)
+
+
+def iter_tcx(source, info: Optional[dict] = None) -> Iterator[dict]:
+    """Samples from a TCX file (path or binary file object); fills `info` like `iter_gpx`."""
+    info = {} if info is None else info
+    for elem in _iter_elements(source, ("Trackpoint", "Activity", "Id", "Notes"), start_tags=("Activity",)):
+        tag = _local(elem.tag)
+        if tag == "Activity":
+            info.setdefault("activity_type", TCX_ACTIVITY_TYPES.get(elem.get("Sport"), "Other"))
+        elif tag == "Id" and elem.text:
+            info["start_time"] = _parse_time(elem.text)
+        elif tag == "Notes" and elem.text:
+            # Written by tcx_chunks to keep activity types TCX has no sport for
+            info["activity_type"] = elem.text.strip()
+        elif tag == "Trackpoint":
+            sample = {}
+            for child in elem.iter():
+                name = _local(child.tag)
+                text = (child.text or "").strip()
+                if not text:
+                    continue
+                if name == "Time":
+                    sample["time"] = _parse_time(text)
+                elif name == "LatitudeDegrees":
+                    sample["latitude"] = float(text)
+                elif name == "LongitudeDegrees":
+                    sample["longitude"] = float(text)
+                elif name == "Value":
+                    sample["heart_rate"] = int(float(text))
+                elif name in ("Cadence", "RunCadence"):
+                    sample["cadence"] = float(text)
+                elif name == "Watts":
+                    sample["power"] = float(text)
+                elif name == "Steps":
+                    sample["steps"] = int(float(text))
+            if "time" in sample:
+                yield sample
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iter_elements(source, tags, start_tags=()) -> Iterator[ET.Element]:
+    """
+    Yield elements whose local name is in `tags` once fully parsed (or, for
+    `start_tags`, as soon as they open, without children), then drop them
+    from the tree so memory doesn't grow with the file. `tags` must not
+    contain each other.
+    """
+    stack = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            if tag in start_tags:
+                yield elem
+            stack.append(elem)
+            continue
+        stack.pop()
+        if tag in tags and tag not in start_tags:
+            yield elem
+            if stack:
+                stack[-1].remove(elem)
+
+
+# --- FIT ---------------------------------------------------------------------
+
+# Seconds between the Unix epoch and the FIT epoch (1989-12-31 00:00 UTC)
+FIT_EPOCH = 631065600
+SEMICIRCLES = 2 ** 31 / 180.0
+
+# Global message numbers and the fields written for each: (number, name, base type, struct format)
+FILE_ID, LAP, SESSION, RECORD, ACTIVITY = 0, 19, 18, 20, 34
+ENUM, UINT8, UINT16, SINT32, UINT32, UINT32Z = 0x00, 0x02, 0x84, 0x85, 0x86, 0x8C
+FIT_FORMATS = {ENUM: "B", UINT8: "B", UINT16: "H", SINT32: "i", UINT32: "I", UINT32Z: "I",
+               0x01: "b", 0x83: "h", 0x0A: "B", 0x8B: "H", 0x88: "f", 0x89: "d", 0x0D: "B"}
+FIT_INVALID = {"B": 0xFF, "b": 0x7F, "H": 0xFFFF, "h": 0x7FFF, "I": 0xFFFFFFFF, "i": 0x7FFFFFFF}
+
+RECORD_FIELDS = {
+    # field: (number, base type)
+    "latitude": (0, SINT32),
+    "longitude": (1, SINT32),
+    "heart_rate": (3, UINT8),
+    "cadence": (4, UINT8),
+    "power": (7, UINT16),
+    "steps": (19, UINT32),  # total_cycles
+}
+FIT_SPORTS = {"running": 1, "cycling": 2, "walking": 11}
+FIT_ACTIVITY_TYPES = {1: "Running", 2: "Cycling", 11: "Walking"}
+
+_CRC_TABLE = []
+for _byte in range(256):
+    _crc = _byte
+    for _ in range(8):
+        _crc = (_crc >> 1) ^ 0xA001 if _crc & 1 else _crc >> 1
+    _CRC_TABLE.append(_crc)
+
+
+def fit_crc(data: bytes, crc: int = 0) -> int:
+    """The CRC-16 used by FIT headers and files."""
+    for byte in data:
+        crc = (crc >> 8) ^ _CRC_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def _fit_time(dt: datetime) -> int:
+    return int(dt.astimezone(timezone.utc).timestamp()) - FIT_EPOCH
+
+
+class _FitMessage:
+    def __init__(self, local_type: int, global_num: int, fields):
+        # fields: [(field number, base type)]
+        self.local_type = local_type
+        self.fields = fields
+        self.struct = struct.Struct("<B" + "".join(FIT_FORMATS[t] for _, t in fields))
+        self.definition = struct.pack("<BBBHB", 0x40 | local_type, 0, 0, global_num, len(fields)) + b"".join(
+            struct.pack("<BBB", num, struct.calcsize(FIT_FORMATS[t]), t) for num, t in fields
+        )
+
+    def pack(self, *values) -> bytes:
+        return self.struct.pack(self.local_type, *values)
+
+
+def fit_chunks(session: WorkoutSession) -> Iterator[bytes]:
+    """
+    FIT activity file (file_id, one record per sample, lap, session,
+    activity), as a stream of byte strings. Records are fixed size, so the
+    data size in the header is known up front and nothing has to be
+    buffered or patched afterwards. FIT timestamps are whole seconds.
+    """
+    metrics = session.metrics
+    channels = [name for name in RECORD_FIELDS if name in metrics and len(metrics[name])]
+    count = max([len(metrics[name]) for name in channels] + [len(metrics.get("timestamp", ()))])
+    end_time = session.end_time or session.start_time
+    start, end = _fit_time(session.start_time), _fit_time(end_time)
+    elapsed_ms = int((end_time - session.start_time).total_seconds() * 1000)
+    sport = FIT_SPORTS.get(session.activity_type.lower(), 0)
+
+    file_id = _FitMessage(0, FILE_ID, [(0, ENUM), (1, UINT16), (2, UINT16), (3, UINT32Z), (4, UINT32)])
+    record = _FitMessage(1, RECORD, [(253, UINT32)] + [RECORD_FIELDS[name] for name in channels])
+    # lap and session share a layout: timestamp, start_time, total_elapsed_time, total_timer_time, sport
+    lap = _FitMessage(2, LAP, [(253, UINT32), (2, UINT32), (7, UINT32), (8, UINT32), (25, ENUM)])
+    summary = _FitMessage(3, SESSION, [(253, UINT32), (2, UINT32), (7, UINT32), (8, UINT32), (5, ENUM)])
+    activity = _FitMessage(4, ACTIVITY, [(253, UINT32), (1, UINT16), (2, ENUM), (3, ENUM), (4, ENUM)])
+
+    head = (
+        file_id.definition + file_id.pack(4, 255, 0, 1, start)  # activity file, "development" manufacturer
+        + record.definition
+    )
+    tail = (
+        lap.definition + lap.pack(end, start, elapsed_ms, elapsed_ms, sport)
+        + summary.definition + summary.pack(end, start, elapsed_ms, elapsed_ms, sport)
+        + activity.definition + activity.pack(end, 1, 0, 26, 1)  # manual, activity event, stop
+    )
+    data_size = len(head) + count * record.struct.size + len(tail)
+
+    header = struct.pack("<BBHI4s", 14, 0x20, 2132, data_size, b".FIT")
+    header += struct.pack("<H", fit_crc(header))
+    crc = fit_crc(header + head)
+    yield header + head
+
+    invalid = [FIT_INVALID[FIT_FORMATS[RECORD_FIELDS[name][1]]] for name in channels]
+    chunk = bytearray()
+    for sample in iter_samples(session):
+        values = [_fit_time(sample["time"])]
+        for name, missing in zip(channels, invalid):
+            value = sample.get(name)
+            if value is None:
+                values.append(missing)
+            elif name in ("latitude", "longitude"):
+                values.append(round(value * SEMICIRCLES))
+            else:
+                values.append(min(missing - 1, max(0, round(value))))
+        chunk += record.pack(*values)
+        if len(chunk) >= 64 * 1024:
+            crc = fit_crc(chunk, crc)
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += tail
+    crc = fit_crc(chunk, crc)
+    yield bytes(chunk) + struct.pack("<H", crc)
+
+
+def iter_fit(source, info: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Samples from the record messages of a FIT file (path or binary file
+    object), read one message at a time. `info` receives "activity_type"
+    from the session message and "start_time" from the first record. Only
+    what this module needs is decoded; other messages and developer fields
+    are skipped.
+    """
+    info = {} if info is None else info
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        header = f.read(12)
+        if len(header) < 12 or header[8:12] != b".FIT":
+            raise ValueError("Not a FIT file")
+        header_size, data_size = header[0], struct.unpack("<I", header[4:8])[0]
+        f.read(header_size - 12)
+
+        definitions = {}
+        last_timestamp = 0
+        remaining = data_size
+        while remaining > 0:
+            record_header = f.read(1)[0]
+            remaining -= 1
+            if record_header & 0x80:
+                # Compressed timestamp header: data message with a 5-bit time offset
+                local_type = (record_header >> 5) & 0x03
+                offset = record_header & 0x1F
+                timestamp = (last_timestamp & ~0x1F) + offset
+                if timestamp < last_timestamp:
+                    timestamp += 0x20
+            elif record_header & 0x40:
+                _, architecture, global_num, num_fields = struct.unpack("<BBHB", f.read(5))
+                if architecture:
+                    global_num = ((global_num & 0xFF) << 8) | (global_num >> 8)
+                field_defs = f.read(3 * num_fields)
+                remaining -= 5 + 3 * num_fields
+                dev_size = 0
+                if record_header & 0x20:
+                    num_dev = f.read(1)[0]
+                    dev_defs = f.read(3 * num_dev)
+                    remaining -= 1 + 3 * num_dev
+                    dev_size = sum(dev_defs[i + 1] for i in range(0, len(dev_defs), 3))
+                fields = [tuple(field_defs[i:i + 3]) for i in range(0, len(field_defs), 3)]
+                definitions[record_header & 0x0F] = (global_num, architecture, fields, dev_size)
+                continue
+            else:
+                local_type = record_header & 0x0F
+                timestamp = None
+
+            global_num, architecture, fields, dev_size = definitions[local_type]
+            size = sum(field[1] for field in fields) + dev_size
+            data = f.read(size)
+            remaining -= size
+            values = _decode_fit_fields(data, fields, architecture)
+            if 253 in values:
+                last_timestamp = values[253]
+            elif timestamp is not None:
+                values[253] = last_timestamp = timestamp
+
+            if global_num == RECORD and 253 in values:
+                time = datetime.fromtimestamp(values[253] + FIT_EPOCH, timezone.utc).astimezone().replace(tzinfo=None)
+                info.setdefault("start_time", time)
+                sample = {"time": time}
+                for name, (num, _) in RECORD_FIELDS.items():
+                    if num in values:
+                        sample[name] = values[num] / SEMICIRCLES if name in ("latitude", "longitude") else values[num]
+                yield sample
+            elif global_num == SESSION and 5 in values:
+                info["activity_type"] = FIT_ACTIVITY_TYPES.get(values[5], "Other")
+    finally:
+        if f is not source:
+            f.close()
+
+
+def _decode_fit_fields(data: bytes, fields, architecture: int) -> Dict[int, int]:
+    """Field number -> value for the single-value numeric fields that aren't marked invalid."""
+    endian = ">" if architecture else "<"
+    values = {}
+    pos = 0
+    for num, size, base_type in fields:
+        fmt = FIT_FORMATS.get(base_type)
+        if fmt and struct.calcsize(fmt) == size:
+            value = struct.unpack_from(endian + fmt, data, pos)[0]
+            invalid = FIT_INVALID.get(fmt)
+            # "z" types mark invalid values with 0 instead
+            if value != invalid and not (base_type in (0x0A, 0x8B, UINT32Z) and value == 0):
+                values[num] = value
+        pos += size
+    return values
+
+
+# --- Files -------------------------------------------------------------------
+
+EXPORTERS = {"gpx": gpx_chunks, "tcx": tcx_chunks, "fit": fit_chunks}
+IMPORTERS = {"gpx": iter_gpx, "tcx": iter_tcx, "fit": iter_fit}
+
+
+def _format(path: str, fmt: Optional[str]) -> str:
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unsupported format: {fmt or path}")
+    return fmt
+
+
+def export_session(session: WorkoutSession, path: str, fmt: Optional[str] = None):
+    """Write `session` to `path`; the format comes from the extension unless `fmt` is given."""
+    fmt = _format(path, fmt)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for chunk in EXPORTERS[fmt](session):
+            f.write(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+def write_session(session: WorkoutSession, fileobj: BinaryIO, fmt: str):
+    """Stream `session` into an open binary file object."""
+    for chunk in EXPORTERS[_format("", fmt)](session):
+        fileobj.write(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+
+
+def import_session(path: str, fmt: Optional[str] = None) -> WorkoutSession:
+    """Read one GPX/TCX/FIT file into a new WorkoutSession."""
+    info = {}
+    builder = SessionBuilder()
+    for sample in IMPORTERS[_format(path, fmt)](path, info):
+        builder.add(sample)
+    builder.activity_type = info.get("activity_type") or builder.activity_type
+    return builder.build(start_time=info.get("start_time"))
+
+
+def import_files(paths: Iterable[str], on_error=None) -> Iterator[WorkoutSession]:
+    """
+    Import files lazily, one session at a time, so a bulk import only ever
+    holds the current file's samples. Files that fail to parse are passed to
+    `on_error(path, exception)` and skipped (or the error is raised if no
+    handler is given).
+    """
+    for path in paths:
+        try:
+            yield import_session(path)
+        except (ValueError, KeyError, IndexError, struct.error, ET.ParseError) as ex:
+            if on_error is None:
+                raise
+            on_error(path, ex)
+
+
+def main(argv=None):
+    # python -m fitness_tracker.formats import FILE...
+    # python -m fitness_tracker.formats export DIRECTORY [gpx|tcx|fit]
+    from .users import open_profile
+
+    argv = sys.argv[1:] if argv is None else argv
+    manager = open_profile()
+    command = argv[0] if argv else ""
+    if command == "import":
+        # One storage write for the whole batch rather than one per file
+        sessions = list(import_files(argv[1:], on_error=lambda p, ex: print(f"Skipped {p}: {ex}")))
+        manager.add_workouts(sessions)
+        print(f"Imported {len(sessions)} workouts")
+    elif command == "export" and len(argv) > 1:
+        directory, fmt = argv[1], argv[2] if len(argv) > 2 else "tcx"
+        os.makedirs(directory, exist_ok=True)
+        for session in manager.profile.workouts:
+            name = f"{session.start_time:%Y%m%d-%H%M%S}-{session.id[:8]}.{fmt}"
+            if isinstance(session.metrics, LazyMetrics):
+                # Read just for this file, so the samples aren't kept on the manager's session
+                session = replace(session, metrics=session.metrics.peek())
+            export_session(session, os.path.join(directory, name))
+        print(f"Exported {len(manager.profile.workouts)} workouts to {directory}")
+    else:
+        print("usage: python -m fitness_tracker.formats import FILE... | export DIRECTORY [gpx|tcx|fit]")
+    manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Timers and counters for the hot paths (saving and loading, goal checks,
+sensor fan-out, Strava requests, page updates).
+
+    @instrumentation.timed("manager.save_data")
+    def save_data(self): ...
+
+    with instrumentation.timer("views.page_update"):
+        page.update()
+
+    instrumentation.count("strava.retries")
+
+Off unless FITNESS_INSTRUMENTATION=1 is set or `enable()` is called; while
+off, a `timed` function costs one flag check and `timer` hands back a
+shared no-op context manager. Each timer is a histogram with fixed
+buckets, so recording is O(1) and memory doesn't grow with the number of
+calls. `snapshot()` returns everything recorded so far; `serve(port)` (or
+FITNESS_METRICS_PORT) exposes it on localhost as `/metrics` in the
+Prometheus text format and `/snapshot` as JSON, and
+
+    python -m fitness_tracker.instrumentation --url http://127.0.0.1:9464
+
+prints a running app's snapshot.
+"""
+import contextlib
+import functools
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+from . import config
+
+# Upper bounds of the histogram buckets in seconds, 1 us to 10 s in 1-2.5-5
+# steps (a sensor fan-out takes microseconds, a save can take seconds); the
+# last bucket is unbounded
+BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+           0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEFAULT_PORT = 9464
+
+enabled = config.INSTRUMENTATION
+
+_NOOP = contextlib.nullcontext()
+_registry_lock = threading.Lock()
+_histograms: Dict[str, "Histogram"] = {}
+_counters: Dict[str, "Counter"] = {}
+_server = None
+
+
+class Histogram:
+    """Count, sum, min, max and bucket counts of observed durations."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the `q` (0-1) quantile, capped at the largest value seen."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else None,
+                "min": self.min,
+                "max": self.max,
+                "p50": self.percentile(0.5),
+                "p95": self.percentile(0.95),
+                "p99": self.percentile(0.99),
+                "buckets": list(self.counts),
+            }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _registry_lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def histogram(name: str) -> Histogram:
+    try:
+        return _histograms[name]
+    except KeyError:
+        with _registry_lock:
+            return _histograms.setdefault(name, Histogram())
+
+
+def counter(name: str) -> Counter:
+    try:
+        return _counters[name]
+    except KeyError:
+        with _registry_lock:
+            return _counters.setdefault(name, Counter())
+
+
+def observe(name: str, seconds: float):
+    if enabled:
+        histogram(name).observe(seconds)
+
+
+def count(name: str, n: int = 1):
+    if enabled:
+        counter(name).inc(n)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        histogram(self.name).observe(time.perf_counter() - self.start)
+        return False
+
+
+def timer(name: str):
+    """Context manager recording how long its block took under `name`."""
+    return _Timer(name) if enabled else _NOOP
+
+
+def timed(name: str):
+    """Decorator recording how long each call took under `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram(name).observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def snapshot() -> Dict:
+    """{"enabled", "counters": {name: value}, "timers": {name: Histogram.snapshot()}}, in seconds."""
+    with _registry_lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+    return {
+        "enabled": enabled,
+        "counters": {name: c.value for name, c in sorted(counters.items())},
+        "timers": {name: h.snapshot() for name, h in sorted(histograms.items())},
+    }
+
+
+def _metric_name(name: str, prefix: str) -> str:
+    return prefix + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def prometheus_text(prefix: str = "fitness_") -> str:
+    """`snapshot()` in the Prometheus text exposition format (timers as histograms in seconds)."""
+    data = snapshot()
+    lines = []
+    for name, value in data["counters"].items():
+        metric = _metric_name(name, prefix) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, stats in data["timers"].items():
+        metric = _metric_name(name, prefix) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), stats["buckets"]):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+        lines += [f"{metric}_sum {stats['sum']!r}", f"{metric}_count {stats['count']}"]
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+    """
+    Turn recording on and serve /metrics and /snapshot from a daemon thread.
+    Returns the ThreadingHTTPServer; `shutdown()` it to stop.
+    """
+    # Imported here so importing this module stays cheap at startup
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+            elif self.path == "/snapshot":
+                body, content_type = json.dumps(snapshot()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    enable()
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
+
+
+def serve_from_config():
+    """Start the endpoint once per process if FITNESS_METRICS_PORT is set."""
+    global _server
+    with _registry_lock:
+        if _server is None and config.METRICS_PORT:
+            _server = serve(config.METRICS_PORT)
+        return _server
+
+
+def format_snapshot(data: Dict) -> str:
+    """A snapshot as a plain-text table, times in milliseconds."""
+    lines = [f"{'timer':<28} {'count':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+    for name, stats in data["timers"].items():
+        values = [stats[key] for key in ("mean", "p50", "p95", "p99", "max")]
+        lines.append(f"{name:<28} {stats['count']:>8} " + " ".join(
+            f"{value * 1000:>9.3f}" if value is not None else f"{'-':>9}" for value in values))
+    if data["counters"]:
+        lines.append("")
+        lines.append(f"{'counter':<28} {'value':>8}")
+        lines += [f"{name:<28} {value:>8}" for name, value in data["counters"].items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    # Only needed when run as a command
+    import argparse
+    from urllib.request import urlopen
+
+    parser = argparse.ArgumentParser(description="Print the metrics of a running app or CLI "
+                                                 "(started with FITNESS_METRICS_PORT set).")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    parser.add_argument("--prometheus", action="store_true", help="print the raw /metrics text instead")
+    args = parser.parse_args(argv)
+
+    base = args.url.rstrip("/")
+    with urlopen(base + ("/metrics" if args.prometheus else "/snapshot"), timeout=10) as response:
+        body = response.read().decode("utf-8")
+    if args.prometheus:
+        print(body, end="")
+    else:
+        print(format_snapshot(json.loads(body)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import math
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Optional
+
+DEFAULT_MAX_HR = 190
+
+# Lower bounds of HR zones 1-5 as a fraction of max HR; anything below zone 1 is "rest".
+ZONE_BOUNDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+ZONE_LABELS = ("Rest", "Zone 1", "Zone 2", "Zone 3", "Zone 4", "Zone 5")
+
+EARTH_RADIUS_M = 6_371_000
+
+
+class RunningStats:
+    """Count, mean, variance, min and max of a stream, updated in O(1) (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._m2 = 0.0  # sum of squared differences from the mean
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def variance(self) -> float:
+        """Population variance."""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class RollingWindow:
+    """
+    The last `seconds` of a timestamped stream.
+
+    Samples sit in a deque used as a ring buffer and a running sum is kept,
+    so each `add` is amortized O(1) and memory is bounded by the window, not
+    the session. `mean` averages the values in the window; for cumulative
+    series (steps, distance) `rate` is the increase per second across it.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._samples = deque()
+        self._sum = 0.0
+
+    def add(self, t: float, value: float):
+        self._samples.append((t, value))
+        self._sum += value
+        while t - self._samples[0][0] > self.seconds:
+            self._sum -= self._samples.popleft()[1]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._sum / len(self._samples) if self._samples else None
+
+    @property
+    def rate(self) -> float:
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, v0), (t1, v1) = self._samples[0], self._samples[-1]
+        return (v1 - v0) / (t1 - t0) if t1 > t0 else 0.0
+
+
+def hr_zone(heart_rate: float, max_hr: float = DEFAULT_MAX_HR) -> int:
+    """Index into ZONE_LABELS for a heart rate."""
+    return bisect_right(ZONE_BOUNDS, heart_rate / max_hr)
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class LiveStats:
+    """
+    Workout statistics updated one sample at a time, in constant time and memory.
+
+    Tracks heart rate (overall and over the last `window` seconds), time in
+    each HR zone, cadence from the cumulative step count and distance, from
+    GPS when the samples have it, otherwise from steps times `stride_m`.
+    `snapshot` is what the live panels show; `summary` gives the finished
+    session's summary without another pass over the samples. Numbers match
+    `WorkoutAnalytics.session_stats` for the same samples: each sample
+    counts for the time until the next one, the last for one second.
+    """
+
+    def __init__(self, max_hr: float = DEFAULT_MAX_HR, window: float = 30.0, stride_m: float = 1.1):
+        self.max_hr = max_hr
+        self.stride_m = stride_m
+        self.hr = RunningStats()
+        self.hr_window = RollingWindow(window)
+        self.steps_window = RollingWindow(window)
+        self.distance_window = RollingWindow(window)
+        self.zone_seconds = [0.0] * len(ZONE_LABELS)
+        self.steps = 0
+        self.distance_m = 0.0
+        self.max_cadence = 0.0
+        self.latest: Dict[str, float] = {}
+
+        self._first_t: Optional[float] = None
+        self._first_steps: Optional[float] = None
+        self._t: Optional[float] = None
+        self._zone: Optional[int] = None
+        self._position = None
+        self._gps = False
+        self._count = 0
+
+    def add(self, sample: dict):
+        t = sample.get("elapsed_seconds", float(self._count))
+        self._count += 1
+        prev_t, self._t = self._t, t
+        dt = t - prev_t if prev_t is not None else 0.0
+        if self._first_t is None:
+            self._first_t = t
+
+        # Time since the previous sample belongs to that sample's zone
+        if self._zone is not None and dt > 0:
+            self.zone_seconds[self._zone] += dt
+        if "heart_rate" in sample:
+            heart_rate = sample["heart_rate"]
+            self.hr.add(heart_rate)
+            self.hr_window.add(t, heart_rate)
+            self._zone = hr_zone(heart_rate, self.max_hr)
+
+        if "steps" in sample:
+            steps = sample["steps"]
+            if self._first_steps is None:
+                self._first_steps = steps
+            else:
+                if dt > 0:
+                    self.max_cadence = max(self.max_cadence, (steps - self.steps) * 60.0 / dt)
+                if not self._gps:
+                    self.distance_m += max(0, steps - self.steps) * self.stride_m
+            self.steps = steps
+            self.steps_window.add(t, steps)
+
+        if "latitude" in sample and "longitude" in sample:
+            position = (sample["latitude"], sample["longitude"])
+            if not self._gps:
+                # GPS takes over from the step estimate from here on
+                self._gps = True
+            elif self._position is not None:
+                self.distance_m += haversine(*self._position, *position)
+            self._position = position
+        self.distance_window.add(t, self.distance_m)
+        self.latest = sample
+
+    @property
+    def elapsed(self) -> float:
+        return self._t - self._first_t if self._t is not None else 0.0
+
+    @property
+    def zone(self) -> Optional[str]:
+        return ZONE_LABELS[self._zone] if self._zone is not None else None
+
+    @property
+    def cadence(self) -> float:
+        """Steps per minute over the rolling window."""
+        return self.steps_window.rate * 60.0
+
+    @property
+    def pace(self) -> Optional[float]:
+        """Seconds per kilometre over the rolling window; None when not moving."""
+        speed = self.distance_window.rate
+        return 1000.0 / speed if speed > 0 else None
+
+    def time_in_zones(self) -> Dict[str, float]:
+        """Seconds in each of ZONE_LABELS, counting the latest sample as one second."""
+        seconds = list(self.zone_seconds)
+        if self._zone is not None:
+            seconds[self._zone] += 1.0
+        return dict(zip(ZONE_LABELS, seconds))
+
+    def snapshot(self) -> Dict:
+        """Current values for the live display."""
+        return {
+            "elapsed_seconds": self.elapsed,
+            "heart_rate": self.latest.get("heart_rate"),
+            "avg_hr": self.hr.mean if self.hr.count else None,
+            "rolling_hr": self.hr_window.mean,
+            "max_hr": self.hr.max,
+            "zone": self.zone,
+            "steps": self.steps,
+            "cadence": self.cadence,
+            "distance_m": self.distance_m,
+            "pace_seconds_per_km": self.pace,
+        }
+
+    def summary(self) -> Dict:
+        """`WorkoutSession.summary` for everything added so far."""
+        active = self._t - self._first_t if self._t is not None else 0.0
+        avg_cadence = (self.steps - self._first_steps) * 60.0 / active if active > 0 and self._first_steps is not None else 0.0
+        return {
+            "total_steps": self.steps,
+            "avg_hr": self.hr.mean if self.hr.count else 0,
+            "max_hr": self.hr.max or 0,
+            "min_hr": self.hr.min or 0,
+            "hr_std": round(self.hr.std, 2),
+            "time_in_zones": self.time_in_zones(),
+            "avg_cadence": round(avg_cadence, 1),
+            "max_cadence": round(self.max_cadence, 1),
+            "distance_m": round(self.distance_m, 1),
+            "avg_pace_seconds_per_km": round(active * 1000.0 / self.distance_m, 1) if self.distance_m > 0 else None,
+        }
+
+
+# Stored sample columns fed back through LiveStats by recompute_summary; "timestamp" holds elapsed seconds
+_SAMPLE_KEYS = (("timestamp", "elapsed_seconds"), ("heart_rate", "heart_rate"), ("steps", "steps"),
+                ("latitude", "latitude"), ("longitude", "longitude"))
+
+
+def recompute_summary(metrics, max_hr: float = DEFAULT_MAX_HR) -> Optional[Dict]:
+    """The summary WorkoutRecorder would produce for these samples; None if there are none."""
+    columns = [(key, metrics[name]) for name, key in _SAMPLE_KEYS if name in metrics and len(metrics[name])]
+    if not any(key != "elapsed_seconds" for key, _ in columns):
+        return None
+    stats = LiveStats(max_hr=max_hr)
+    n = max(len(values) for _, values in columns)
+    for i in range(n):
+        stats.add({key: values[i] for key, values in columns if i < len(values)})
+    return stats.summary()
+
+
+def format_pace(seconds_per_km: Optional[float]) -> str:
+    """Pace as m:ss per km, or "--" when not moving."""
+    if seconds_per_km is None or seconds_per_km > 3600:
+        return "--"
+    mins, secs = divmod(int(round(seconds_per_km)), 60)
+    return f"{mins}:{secs:02d} /km"
@@ -0,0 +1,84 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive lock held across the threads of this process and across processes.
+
+    Threads are serialized by an RLock; other processes by an OS lock on
+    `path` (`fcntl.flock` on POSIX, `msvcrt.locking` on Windows). The lock is
+    re-entrant for the thread holding it, so a storage method that calls
+    another one under the lock doesn't deadlock. The lock file itself is
+    never removed, only locked.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+                else:
+                    # Retries for ~10 s, then raises OSError
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def atomic_write(path: str, write, binary: bool = False):
+    """
+    Replace `path` with whatever `write(f)` writes to a text (or, with
+    `binary`, bytes) file object, so readers (and a crash) only ever see the
+    old or the new contents, never a truncated file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb" if binary else "w") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -1,54 +1,476 @@
 import json
-import os
+import threading
+from contextlib import contextmanager
+from bisect import bisect_left, insort
 from datetime import datetime, date
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+from . import instrumentation
 from .models import UserProfile, Goal, WorkoutSession, GoalType, GoalPeriod
+from .storage import JsonStorage
 
 DATA_FILE = "fitness_data.json"
 
+# Changes between rewrites of the stored rollups (they are also written by save_data and close)
+AGGREGATES_SAVE_EVERY = 100
+
+GOAL_STAT_KEYS = {
+    GoalType.STEPS: "steps",
+    GoalType.CALORIES: "calories",
+    GoalType.DURATION_MINUTES: "duration_minutes",
+}
+
+
+def _build_lod(session: WorkoutSession):
+    # Imported here so NumPy is only loaded once a workout is saved
+    from .timeseries import build_lod
+    build_lod(session)
+
+
+def _empty_stats() -> Dict[str, float]:
+    return {"steps": 0, "calories": 0, "duration_minutes": 0}
+
+
+def _week_key(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class Aggregates:
+    """
+    Per-day and per-ISO-week totals (steps, calories, duration), kept up to
+    date incrementally as workouts are added, edited or deleted so goal
+    checks are dictionary lookups instead of scans over the history.
+    """
+
+    def __init__(self):
+        self.days: Dict[str, Dict[str, float]] = {}   # "2024-01-31" -> stats
+        self.weeks: Dict[str, Dict[str, float]] = {}  # "2024-W05" -> stats
+
+    def add(self, session: WorkoutSession, sign: int = 1):
+        day = session.start_time.date()
+        duration = (session.end_time - session.start_time).total_seconds() / 60 if session.end_time else 0
+        for buckets, key in ((self.days, day.isoformat()), (self.weeks, _week_key(day))):
+            stats = buckets.setdefault(key, _empty_stats())
+            stats["steps"] += sign * session.summary.get("total_steps", 0)
+            stats["calories"] += sign * session.summary.get("calories", 0)
+            stats["duration_minutes"] += sign * duration
+
+    def remove(self, session: WorkoutSession):
+        self.add(session, sign=-1)
+
+    def day(self, day: date) -> Dict[str, float]:
+        return dict(self.days.get(day.isoformat(), _empty_stats()))
+
+    def week(self, day: date) -> Dict[str, float]:
+        return dict(self.weeks.get(_week_key(day), _empty_stats()))
+
+    @classmethod
+    def build(cls, workouts: List[WorkoutSession]) -> "Aggregates":
+        aggregates = cls()
+        for session in workouts:
+            aggregates.add(session)
+        return aggregates
+
+    def to_dict(self, workouts: List[WorkoutSession]):
+        return {
+            # Lets a later load tell whether the rollups still match the stored workouts
+            "workout_count": len(workouts),
+            "last_workout_id": workouts[-1].id if workouts else None,
+            "days": self.days,
+            "weeks": self.weeks
+        }
+
+    @classmethod
+    def from_dict(cls, data, workouts: List[WorkoutSession]) -> Optional["Aggregates"]:
+        """Returns None if `data` was saved for a different set of workouts."""
+        if data.get("workout_count") != len(workouts):
+            return None
+        if data.get("last_workout_id") != (workouts[-1].id if workouts else None):
+            return None
+        aggregates = cls()
+        aggregates.days = data["days"]
+        aggregates.weeks = data["weeks"]
+        return aggregates
+
+
+class TimeIndex:
+    """
+    Workouts sorted by start time, for cursor-based paging without sorting
+    or scanning the whole history, plus lookup by id.
+    """
+
+    def __init__(self, workouts: List[WorkoutSession] = ()):
+        self.keys: List[Tuple[datetime, str]] = sorted((w.start_time, w.id) for w in workouts)
+        self.by_id: Dict[str, WorkoutSession] = {w.id: w for w in workouts}
+
+    def add(self, session: WorkoutSession):
+        insort(self.keys, (session.start_time, session.id))
+        self.by_id[session.id] = session
+
+    def remove(self, session: WorkoutSession):
+        key = (session.start_time, session.id)
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            del self.keys[idx]
+        self.by_id.pop(session.id, None)
+
+    def page(self, limit: int, cursor: Optional[str] = None, activity_type: Optional[str] = None,
+             start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[List[WorkoutSession], Optional[str]]:
+        """Newest first; see FitnessManager.list_workouts."""
+        hi = len(self.keys)
+        if end is not None:
+            hi = bisect_left(self.keys, (end,))
+        if cursor:
+            cursor_time, cursor_id = cursor.split("|", 1)
+            hi = min(hi, bisect_left(self.keys, (datetime.fromisoformat(cursor_time), cursor_id)))
+
+        results = []
+        idx = hi - 1
+        while idx >= 0 and len(results) < limit:
+            start_time, session_id = self.keys[idx]
+            if start is not None and start_time < start:
+                break
+            session = self.by_id[session_id]
+            if activity_type is None or session.activity_type.lower() == activity_type.lower():
+                results.append(session)
+            idx -= 1
+
+        more = idx >= 0 and (start is None or self.keys[idx][0] >= start)
+        next_cursor = None
+        if results and len(results) == limit and more:
+            last = results[-1]
+            next_cursor = f"{last.start_time.isoformat()}|{last.id}"
+        return results, next_cursor
+
+
 class FitnessManager:
-    def __init__(self, username: str = "User"):
+    """
+    Goals, workouts and stats for one user.
+
+    Methods may be called from any thread (the sensor thread, Flet handlers);
+    changes are serialized by `lock`. Listeners are called after the lock is
+    released. When the storage reports that another process wrote in the
+    meantime and the change was merged into its data, the index and
+    aggregates are rebuilt from the merged profile. A write that fails
+    (e.g. a summary value that can't be serialized) leaves the profile as
+    it was and raises. Nothing is read from storage until `profile`,
+    `index` or `aggregates` is first used (or `load_data` is called).
+    """
+
+    def __init__(self, username: str = "User", storage=None):
         self.username = username
-        self.profile = UserProfile(username=username)
-        self.load_data()
+        # Any object with the JsonStorage interface, see storage.py. The default
+        # is the single-user data file whatever the username; per-user storage
+        # comes from users.ProfileRegistry
+        self.storage = storage or JsonStorage(DATA_FILE)
+        self._listeners = []
+        self.lock = threading.RLock()
+        # Nothing is read until the data is first used, so creating a manager
+        # (and starting the app) doesn't wait for a multi-year history to load
+        self._loaded = False
+        self._profile = UserProfile(username=username)
+        self._aggregates = Aggregates()
+        self._index = TimeIndex()
+        self._unsaved_changes = 0  # changes since the rollups were last written
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self.lock:
+                if not self._loaded:
+                    self.load_data()
+
+    @property
+    def profile(self) -> UserProfile:
+        self._ensure_loaded()
+        return self._profile
+
+    @profile.setter
+    def profile(self, profile: UserProfile):
+        with self.lock:
+            self._profile = profile
+            self._rebuild()
+            self._loaded = True
+
+    @property
+    def index(self) -> TimeIndex:
+        self._ensure_loaded()
+        return self._index
+
+    @property
+    def aggregates(self) -> Aggregates:
+        self._ensure_loaded()
+        return self._aggregates
+
+    def add_listener(self, callback):
+        """Call `callback()` whenever goals or workouts change, e.g. to invalidate cached views."""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in list(self._listeners):
+            callback()
 
+    @instrumentation.timed("manager.load_data")
     def load_data(self):
-        if os.path.exists(DATA_FILE):
+        with self.lock:
             try:
-                with open(DATA_FILE, "r") as f:
-                    data = json.load(f)
-                    self.profile = UserProfile.from_dict(data)
+                profile = self.storage.load()
+                if profile is not None:
+                    self._profile = profile
             except (json.JSONDecodeError, KeyError):
                 print("Error loading data, starting fresh.")
+            self._index = TimeIndex(self._profile.workouts)
+            self._load_aggregates()
+            self._loaded = True
 
+    def _rebuild(self):
+        """After the storage merged in other writers' changes."""
+        self._index = TimeIndex(self._profile.workouts)
+        self._aggregates = Aggregates.build(self._profile.workouts)
+        # They may have stored rollups of their own since: mark those stale again
+        self._unsaved_changes = 0
+
+    def _load_aggregates(self):
+        self._unsaved_changes = 0
+        aggregates = None
+        try:
+            data = self.storage.load_aggregates()
+            if data is not None:
+                aggregates = Aggregates.from_dict(data, self._profile.workouts)
+        except (json.JSONDecodeError, KeyError):
+            pass
+        if aggregates is None:
+            # Missing or stale: rebuild once from the history
+            aggregates = Aggregates.build(self._profile.workouts)
+            self._save_aggregates(aggregates)
+        self._aggregates = aggregates
+
+    @contextmanager
+    def _writing(self):
+        """
+        Around a change to the profile and its storage write, under `lock`.
+        If the write fails, the in-memory change is undone and the next use
+        re-reads the profile from storage (which may have merged in other
+        writers' changes before failing), so memory never keeps something
+        that isn't stored, e.g. a session that can't be serialized.
+        """
+        goals, workouts = list(self.profile.goals), list(self.profile.workouts)
+        try:
+            yield
+        except BaseException:
+            self._profile.goals[:] = goals
+            self._profile.workouts[:] = workouts
+            self._loaded = False
+            raise
+
+    def _save_aggregates(self, aggregates: Optional[Aggregates] = None):
+        self.storage.save_aggregates((aggregates or self._aggregates).to_dict(self._profile.workouts))
+        self._unsaved_changes = 0
+
+    def _aggregates_changed(self):
+        """
+        After a change: the stored rollups are rewritten every
+        AGGREGATES_SAVE_EVERY changes rather than after each one, so an
+        append stays O(record). The first change after a rewrite marks them
+        stale, as an edit keeps the workout count and last id they are
+        checked against; a load after a crash then rebuilds them.
+        """
+        if not self._unsaved_changes:
+            self.storage.save_aggregates({})
+        self._unsaved_changes += 1
+        if self._unsaved_changes >= AGGREGATES_SAVE_EVERY:
+            self._save_aggregates()
+
+    @instrumentation.timed("manager.save_data")
     def save_data(self):
-        with open(DATA_FILE, "w") as f:
-            json.dump(self.profile.to_dict(), f, indent=4)
+        with self.lock:
+            self.storage.save(self.profile)
+            self._save_aggregates()
+
+    def close(self):
+        """Write pending rollups and release the storage backend's resources (e.g. the SQLite connection)."""
+        with self.lock:
+            if self._loaded and self._unsaved_changes:
+                self._save_aggregates()
+        if hasattr(self.storage, "close"):
+            self.storage.close()
 
     def add_goal(self, goal: Goal):
-        self.profile.goals.append(goal)
-        self.save_data()
+        with self.lock, self._writing():
+            self.profile.goals.append(goal)
+            if self.storage.append_goal(self.profile, goal):
+                self._rebuild()
+        self._notify()
 
+    @instrumentation.timed("manager.add_workout")
     def add_workout(self, session: WorkoutSession):
-        self.profile.workouts.append(session)
-        self.save_data()
+        _build_lod(session)
+        with self.lock, self._writing():
+            self.profile.workouts.append(session)
+            if self.storage.append_workout(self.profile, session):
+                self._rebuild()
+            else:
+                self.index.add(session)
+                self.aggregates.add(session)
+            self._aggregates_changed()
+        self._notify()
+
+    @instrumentation.timed("manager.add_workouts")
+    def add_workouts(self, sessions: List[WorkoutSession]):
+        """
+        Add several workouts with one storage write (one fsync or one
+        transaction) instead of one each, e.g. for the ingestion server's
+        group commits.
+        """
+        if not sessions:
+            return
+        for session in sessions:
+            _build_lod(session)
+        with self.lock, self._writing():
+            self.profile.workouts.extend(sessions)
+            if hasattr(self.storage, "append_workouts"):
+                merged = self.storage.append_workouts(self.profile, sessions)
+            else:
+                merged = any([self.storage.append_workout(self.profile, session) for session in sessions])
+            if merged:
+                self._rebuild()
+            else:
+                for session in sessions:
+                    self.index.add(session)
+                    self.aggregates.add(session)
+            self._aggregates_changed()
+        self._notify()
+
+    def get_workout(self, session_id: str) -> Optional[WorkoutSession]:
+        return self.index.by_id.get(session_id)
+
+    def list_workouts(self, limit: int = 20, cursor: Optional[str] = None, activity_type: Optional[str] = None,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[List[WorkoutSession], Optional[str]]:
+        """
+        One page of workouts, newest first, optionally filtered by activity
+        type and start <= start_time < end. Pass the returned cursor back in
+        to get the next page; it is None on the last page.
+        """
+        with self.lock:
+            return self.index.page(limit, cursor=cursor, activity_type=activity_type, start=start, end=end)
+
+    @instrumentation.timed("manager.update_workout")
+    def update_workout(self, session: WorkoutSession):
+        """Replace the stored workout with the same id."""
+        _build_lod(session)
+        with self.lock:
+            workout = self.get_workout(session.id)
+            if workout is None:
+                raise KeyError(session.id)
+            with self._writing():
+                for idx, stored in enumerate(self.profile.workouts):
+                    if stored.id == session.id:
+                        self.profile.workouts[idx] = session
+                        break
+                if self.storage.update_workout(self.profile, session):
+                    self._rebuild()
+                else:
+                    self.index.remove(workout)
+                    self.index.add(session)
+                    self.aggregates.remove(workout)
+                    self.aggregates.add(session)
+                self._aggregates_changed()
+        self._notify()
+
+    @instrumentation.timed("manager.update_workouts")
+    def update_workouts(self, sessions: List[WorkoutSession]):
+        """
+        Replace several stored workouts (matched by id) with one storage
+        write; unlike `update_workout` the pyramids are left as they are.
+        """
+        if not sessions:
+            return
+        with self.lock:
+            for session in sessions:
+                if session.id not in self.index.by_id:
+                    raise KeyError(session.id)
+            with self._writing():
+                replaced = {session.id: session for session in sessions}
+                old = []
+                for idx, workout in enumerate(self.profile.workouts):
+                    if workout.id in replaced:
+                        old.append(workout)
+                        self.profile.workouts[idx] = replaced[workout.id]
+                if hasattr(self.storage, "update_workouts"):
+                    merged = self.storage.update_workouts(self.profile, sessions)
+                else:
+                    merged = any([self.storage.update_workout(self.profile, session) for session in sessions])
+                if merged:
+                    self._rebuild()
+                else:
+                    for workout in old:
+                        self.index.remove(workout)
+                        self.aggregates.remove(workout)
+                    for session in sessions:
+                        self.index.add(session)
+                        self.aggregates.add(session)
+                self._aggregates_changed()
+        self._notify()
+
+    @instrumentation.timed("manager.delete_workout")
+    def delete_workout(self, session_id: str):
+        with self.lock:
+            workout = self.get_workout(session_id)
+            if workout is None:
+                raise KeyError(session_id)
+            with self._writing():
+                self.profile.workouts.remove(workout)
+                if self.storage.delete_workout(self.profile, session_id):
+                    self._rebuild()
+                else:
+                    self.index.remove(workout)
+                    self.aggregates.remove(workout)
+                self._aggregates_changed()
+        self._notify()
+
+    def get_series(self, session_id: str, channel: str, start: Optional[float] = None,
+                   end: Optional[float] = None, points: int = 500) -> Dict:
+        """At most `points` chart points of one workout's `channel`, see timeseries.series."""
+        from .timeseries import series
+        session = self.get_workout(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return series(session, channel, start, end, points)
+
+    def apply_retention(self, policy=None, now: Optional[datetime] = None) -> int:
+        """
+        Drop raw samples and fine pyramid levels of old workouts as `policy`
+        (a timeseries.RetentionPolicy) says; returns how many were compacted.
+        """
+        from .timeseries import RetentionPolicy, compact
+        policy = policy or RetentionPolicy()
+        with self.lock:
+            compacted = [session for session in self.profile.workouts if compact(session, policy, now)]
+            # One storage write for all of them
+            self.update_workouts(compacted)
+        return len(compacted)
 
     def get_active_goals(self) -> List[Goal]:
         # Logic to filter active goals could be added here
         return self.profile.goals
 
+    @instrumentation.timed("manager.get_today_stats")
     def get_today_stats(self) -> Dict[str, float]:
-        today = date.today()
-        stats = {
-            "steps": 0,
-            "calories": 0, # Not currently tracked in mock api but good to have structure
-            "duration_minutes": 0
-        }
-        
-        for workout in self.profile.workouts:
-            if workout.start_time.date() == today:
+        with self.lock:
+            return dict(self.aggregates.day(date.today()))
+
+    def get_stats_between(self, start: datetime, end: datetime) -> Dict[str, float]:
+        """Totals for workouts with start <= start_time < end."""
+        # Indexed backends (e.g. SQLiteStorage) answer this without scanning the history
+        if hasattr(self.storage, "stats_between"):
+            return self.storage.stats_between(start, end)
+
+        stats = _empty_stats()
+        with self.lock:
+            workouts = list(self.profile.workouts)
+        for workout in workouts:
+            if start <= workout.start_time < end:
                 stats["steps"] += workout.summary.get("total_steps", 0)
-                # stats["calories"] += workout.summary.get("calories", 0)
+                stats["calories"] += workout.summary.get("calories", 0)
                 
                 if workout.end_time:
                     duration = (workout.end_time - workout.start_time).total_seconds() / 60
@@ -56,25 +478,27 @@ class FitnessManager:
 
         return stats
 
+    @instrumentation.timed("manager.check_goals")
     def check_goals(self) -> List[Dict]:
-        today_stats = self.get_today_stats()
+        today = date.today()
+        with self.lock:
+            stats = {
+                GoalPeriod.DAILY: dict(self.aggregates.day(today)),
+                GoalPeriod.WEEKLY: dict(self.aggregates.week(today)),
+            }
+            goals = list(self.profile.goals)
         results = []
         
-        for goal in self.profile.goals:
-            if goal.period == GoalPeriod.DAILY:
-                current = 0
-                if goal.type == GoalType.STEPS:
-                    current = today_stats["steps"]
-                elif goal.type == GoalType.DURATION_MINUTES:
-                    current = today_stats["duration_minutes"]
-                
-                # Simple percentage calculation
-                progress = min(100, (current / goal.target_value) * 100) if goal.target_value > 0 else 0
-                
-                results.append({
-                    "goal": goal,
-                    "current": current,
-                    "progress": progress,
-                    "achieved": current >= goal.target_value
-                })
+        for goal in goals:
+            current = stats[goal.period][GOAL_STAT_KEYS[goal.type]]
+            
+            # Simple percentage calculation
+            progress = min(100, (current / goal.target_value) * 100) if goal.target_value > 0 else 0
+            
+            results.append({
+                "goal": goal,
+                "current": current,
+                "progress": progress,
+                "achieved": current >= goal.target_value
+            })
         return results
@@ -1,7 +1,10 @@
+import sys
+import uuid
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 from datetime import datetime
 from enum import Enum
+from .columns import MetricColumns
 
 class GoalType(Enum):
     STEPS = "steps"
@@ -12,7 +15,20 @@ class GoalPeriod(Enum):
     DAILY = "daily"
     WEEKLY = "weekly"
 
-@dataclass
+# Enum lookups by value for decoding, a dict hit instead of an Enum() call per record.
+# (Timestamps aren't cached: nearly every one is unique and fromisoformat is already
+# cheaper than a cache miss.)
+_GOAL_TYPES = {t.value: t for t in GoalType}
+_GOAL_PERIODS = {p.value: p for p in GoalPeriod}
+
+
+def intern_keys(data: Dict) -> Dict:
+    """`data` with interned keys, so summaries decoded one by one share a single copy of each key."""
+    return {sys.intern(key): value for key, value in data.items()}
+
+
+# Slotted: no per-instance __dict__, which adds up over tens of thousands of sessions
+@dataclass(slots=True)
 class Goal:
     type: GoalType
     target_value: int
@@ -30,40 +46,61 @@ class Goal:
     @classmethod
     def from_dict(cls, data):
         return cls(
-            type=GoalType(data["type"]),
+            type=_GOAL_TYPES[data["type"]],
             target_value=data["target_value"],
-            period=GoalPeriod(data["period"]),
+            period=_GOAL_PERIODS[data["period"]],
             created_at=datetime.fromisoformat(data["created_at"])
         )
 
-@dataclass
+@dataclass(slots=True)
 class WorkoutSession:
     activity_type: str
     start_time: datetime
     end_time: Optional[datetime] = None
-    metrics: Dict[str, List[float]] = field(default_factory=dict) # e.g., {'heart_rate': [80, 82...], 'steps': [0, 10...]}
+    metrics: Dict[str, List[float]] = field(default_factory=MetricColumns) # e.g., {'heart_rate': [80, 82...], 'steps': [0, 10...]}
     summary: Dict[str, float] = field(default_factory=dict) # e.g., {'total_steps': 1000, 'avg_hr': 120}
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # Level-of-detail pyramid of `metrics` for charts, see timeseries.py
+    lod: Dict[str, List[float]] = field(default_factory=MetricColumns)
 
-    def to_dict(self):
-        return {
+    def __post_init__(self):
+        # Plain lists are packed into typed arrays, see columns.py
+        if not isinstance(self.metrics, MetricColumns):
+            self.metrics = MetricColumns(self.metrics)
+        if not isinstance(self.lod, MetricColumns):
+            self.lod = MetricColumns(self.lod)
+
+    def to_dict(self, include_metrics: bool = True):
+        """`include_metrics=False` leaves out the samples and the pyramid built from them."""
+        data = {
+            "id": self.id,
             "activity_type": self.activity_type,
             "start_time": self.start_time.isoformat(),
             "end_time": self.end_time.isoformat() if self.end_time else None,
-            "metrics": self.metrics,
             "summary": self.summary
         }
+        if include_metrics:
+            data["metrics"] = self.metrics.to_dict()
+            if self.lod:
+                data["lod"] = self.lod.to_dict()
+        return data
 
     @classmethod
     def from_dict(cls, data):
+        # Activity types and summary keys repeat across sessions; JSON decoding gives each
+        # session its own copies (per line for the journal), interning keeps one of each.
         return cls(
-            activity_type=data["activity_type"],
+            activity_type=sys.intern(data["activity_type"]),
             start_time=datetime.fromisoformat(data["start_time"]),
             end_time=datetime.fromisoformat(data["end_time"]) if data.get("end_time") else None,
-            metrics=data.get("metrics", {}),
-            summary=data.get("summary", {})
+            metrics=MetricColumns.from_dict(data.get("metrics", {})),
+            summary=intern_keys(data.get("summary", {})),
+            lod=MetricColumns.from_dict(data.get("lod", {})),
+            # Files written before sessions had ids get a stable one derived from the session itself
+            id=data.get("id") or uuid.uuid5(uuid.NAMESPACE_OID, f"{data['activity_type']}|{data['start_time']}").hex
         )
 
-@dataclass
+@dataclass(slots=True)
 class UserProfile:
     username: str
     goals: List[Goal] = field(default_factory=list)
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from .api import MockSensorAPI
+from .columns import MetricColumns
+from .live_stats import DEFAULT_MAX_HR, LiveStats
+from .models import WorkoutSession
+
+# Sample keys recorded into WorkoutSession.metrics; "timestamp" comes from the sample's elapsed_seconds
+DEFAULT_CHANNELS = ("timestamp", "heart_rate", "steps")
+
+
+class AsyncSensorSource:
+    """
+    Async iterator over sensor samples.
+
+    Drives any MockSensorAPI-compatible sensor (`next_sample()`/`rate_hz`,
+    e.g. `SensorSimulator`) from the event loop with `asyncio.sleep`
+    instead of a thread, so many sources can run in one loop.
+    `realtime=False` yields without waiting between samples.
+    """
+
+    def __init__(self, sensor=None, realtime: bool = True, max_samples: Optional[int] = None):
+        self.sensor = sensor or MockSensorAPI()
+        self.realtime = realtime
+        self.max_samples = max_samples
+        self.count = 0
+        self._stopped = False
+        self._started_at = None
+
+    def stop(self):
+        """End the iteration after the current sample."""
+        self._stopped = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+            self.sensor.reset()
+        if self._stopped or (self.max_samples is not None and self.count >= self.max_samples):
+            raise StopAsyncIteration
+        if getattr(self.sensor, "exhausted", False):
+            raise StopAsyncIteration
+
+        if self.count > 0:
+            if self.realtime:
+                delay = self._started_at + self.count / self.sensor.rate_hz - time.monotonic()
+                await asyncio.sleep(max(0.0, delay))
+                if self._stopped:
+                    raise StopAsyncIteration
+            else:
+                # Still let other tasks run between samples
+                await asyncio.sleep(0)
+
+        self.count += 1
+        return self.sensor.next_sample()
+
+
+class WorkoutRecorder:
+    """
+    Accumulates samples into a WorkoutSession.
+
+    Shared by both front ends: feed it samples with `add_sample`/`add_batch`
+    (e.g. from a `MockSensorAPI` callback, which unlike a subscription never
+    drops one) or let `run` consume an async source, then `finish` builds
+    the session and its summary. `stats` is
+    updated with every sample, so live panels and the summary never have to
+    go back over the recorded samples.
+    """
+
+    def __init__(self, activity_type: str = "Running", channels: Iterable[str] = DEFAULT_CHANNELS,
+                 max_hr: float = DEFAULT_MAX_HR):
+        self.activity_type = activity_type
+        self.channels = tuple(channels)
+        self.metrics = MetricColumns({name: [] for name in self.channels})
+        self.stats = LiveStats(max_hr=max_hr)
+        self.latest: Dict[str, float] = {"heart_rate": 0, "steps": 0, "elapsed_seconds": 0}
+        self.start_time: Optional[datetime] = None
+        self.end_time: Optional[datetime] = None
+
+    def start(self):
+        if self.start_time is None:
+            self.start_time = datetime.now()
+
+    def add_sample(self, data: dict):
+        self.start()
+        for name in self.channels:
+            key = "elapsed_seconds" if name == "timestamp" else name
+            if key in data:
+                self.metrics[name].append(data[key])
+        self.stats.add(data)
+        self.latest = data
+
+    def add_batch(self, batch: List[dict]):
+        for data in batch:
+            self.add_sample(data)
+
+    def summary(self) -> Dict:
+        return self.stats.summary()
+
+    def finish(self, end_time: Optional[datetime] = None) -> WorkoutSession:
+        self.start()
+        self.end_time = end_time or datetime.now()
+        return WorkoutSession(
+            activity_type=self.activity_type,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            metrics=self.metrics,
+            summary=self.summary()
+        )
+
+    async def run(self, source, on_sample: Optional[Callable[[dict], None]] = None) -> WorkoutSession:
+        """Record everything `source` yields (until it stops) and return the finished session."""
+        self.start()
+        async for data in source:
+            self.add_sample(data)
+            if on_sample:
+                on_sample(data)
+        return self.finish()
@@ -0,0 +1,70 @@
+import threading
+import time
+from typing import Dict
+from . import instrumentation
+
+
+class RenderScheduler:
+    """
+    Coalesces UI changes and pushes them to the Flet page at most `fps` times a second.
+
+    Callers (often the sensor thread) record the new attribute values with
+    `set`; a background thread applies them once per frame and sends only
+    the controls whose values actually changed, via `page.update(*controls)`,
+    instead of a full `page.update()` per sample.
+    """
+
+    def __init__(self, page, fps: float = 8):
+        self.page = page
+        self.frame_interval = 1.0 / fps
+        self.frames = 0  # number of flushes that sent something to the page
+
+        self._pending: Dict[object, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = True
+        self._last_flush = 0.0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def set(self, control, **attrs):
+        """Schedule `control.<name> = value` for each keyword; later calls win within a frame."""
+        with self._lock:
+            self._pending.setdefault(control, {}).update(attrs)
+        self._wakeup.set()
+
+    def flush(self):
+        """Apply pending changes now and update the changed controls."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        changed = []
+        for control, attrs in pending.items():
+            dirty = False
+            for name, value in attrs.items():
+                if getattr(control, name, None) != value:
+                    setattr(control, name, value)
+                    dirty = True
+            if dirty:
+                changed.append(control)
+        self._last_flush = time.monotonic()
+        if changed:
+            self.frames += 1
+            with instrumentation.timer("views.render_flush"):
+                self.page.update(*changed)
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._running:
+                return
+            # Hold changes until the next frame slot so bursts collapse into one update
+            delay = self._last_flush + self.frame_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
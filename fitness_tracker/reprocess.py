@@ -0,0 +1,199 @@
+"""
+Recompute the summaries and level-of-detail pyramids of stored workouts,
+e.g. after the summary logic in live_stats.py changed.
+
+    python -m fitness_tracker.reprocess fitness_data.json --workers 4
+    python -m fitness_tracker.reprocess fitness_data.json --workers 1   # single process, for comparison
+
+Sessions are sent to a ProcessPoolExecutor in chunks of `--chunk-size`,
+with at most two chunks per worker in flight, so only a bounded number
+of sample copies exist at any time. Workers get just the raw sample
+columns and send back the new summary and pyramid, which are written
+every `--checkpoint` sessions with one `FitnessManager.update_workouts`
+call. Samples that the storage loads lazily are read for the workers
+without being kept on the manager's sessions, and are not rewritten. After each write the finished session ids are recorded in
+`<path>.reprocess.json`, so an interrupted run picks up where it left off
+(`--restart` starts over); the file is removed once every session is
+done. Sessions without raw samples (e.g. compacted by the retention
+policy) keep their summary. Summary keys that can't be derived from the
+samples, such as calories, are kept as they are.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .columns import LazyMetrics, MetricColumns
+from .live_stats import DEFAULT_MAX_HR, recompute_summary
+from .locking import atomic_write
+from .manager import DATA_FILE, FitnessManager
+from .models import WorkoutSession
+from .storage import STORAGE_KINDS, open_storage
+from .timeseries import build_lod, is_lod_column
+
+def _raw_copy(session: WorkoutSession) -> WorkoutSession:
+    """What a worker needs: the raw sample columns (not the pyramid), as plain picklable arrays."""
+    # Lazy samples are read without being cached on the manager's session, so they don't stay resident
+    samples = session.metrics.peek() if isinstance(session.metrics, LazyMetrics) else session.metrics
+    # is_lod_column: pyramids from before they had their own field are rebuilt, not treated as samples
+    metrics = MetricColumns({name: values for name, values in samples.items() if not is_lod_column(name)})
+    return WorkoutSession(activity_type=session.activity_type, start_time=session.start_time,
+                          end_time=session.end_time, metrics=metrics, summary={}, id=session.id)
+
+
+def process_chunk(sessions: List[WorkoutSession], max_hr: float = DEFAULT_MAX_HR) -> List[Tuple]:
+    """(id, summary, pyramid columns) per session; summary is None for sessions without samples."""
+    results = []
+    for session in sessions:
+        summary = recompute_summary(session.metrics, max_hr)
+        if summary is None:
+            results.append((session.id, None, None))
+            continue
+        build_lod(session)
+        results.append((session.id, summary, dict(session.lod)))
+    return results
+
+
+def _chunks(sessions: Iterable[WorkoutSession], size: int) -> Iterator[List[WorkoutSession]]:
+    chunk = []
+    for session in sessions:
+        chunk.append(_raw_copy(session))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _updated(session: WorkoutSession, summary: Dict, lod: Dict) -> WorkoutSession:
+    # A new object, so the manager can take the old summary out of its aggregates
+    metrics = session.metrics
+    if not isinstance(metrics, LazyMetrics) or metrics.loaded:
+        metrics = MetricColumns({name: values for name, values in metrics.items() if not is_lod_column(name)})
+    # else left unread: storage keeps the samples file as it is (old pyramid columns in it are ignored)
+    return replace(session, summary={**session.summary, **summary}, metrics=metrics, lod=MetricColumns(lod))
+
+
+class Reprocessor:
+    """Runs a reprocess over `manager`'s workouts; see the module docstring."""
+
+    def __init__(self, manager: FitnessManager, state_path: str, workers: Optional[int] = None,
+                 chunk_size: int = 32, checkpoint: int = 500, max_hr: float = DEFAULT_MAX_HR, progress=None):
+        self.manager = manager
+        self.state_path = state_path
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.max_hr = max_hr
+        # progress(done, total) after every chunk
+        self.progress = progress
+        self.done = set()
+        self.updated = 0
+        self.skipped = 0
+
+    def load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.done = set(json.load(f)["done"])
+
+    def run(self) -> Dict:
+        """Process every session not done yet; returns counts and throughput."""
+        with self.manager.lock:
+            todo = [w for w in self.manager.profile.workouts if w.id not in self.done]
+        total, resumed = len(todo) + len(self.done), len(self.done)
+        pending: List[WorkoutSession] = []
+        start = time.perf_counter()
+
+        for results in self._results(_chunks(todo, self.chunk_size)):
+            for session_id, summary, lod in results:
+                if summary is None:
+                    self.skipped += 1
+                    self.done.add(session_id)
+                    continue
+                session = self.manager.get_workout(session_id)
+                if session is not None:
+                    pending.append(_updated(session, summary, lod))
+            if len(pending) >= self.checkpoint:
+                self._write(pending)
+                pending = []
+            if self.progress:
+                self.progress(len(self.done) + len(pending), total)
+        self._write(pending)
+        elapsed = time.perf_counter() - start
+
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        processed = total - resumed
+        return {
+            "sessions": processed,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "resumed_after": resumed,
+            "workers": self.workers,
+            "seconds": elapsed,
+            "sessions_per_second": processed / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _results(self, chunks: Iterator[List[WorkoutSession]]) -> Iterator[List[Tuple]]:
+        if self.workers == 1:
+            # Same code path as the workers, without the pool, for comparing throughput
+            for chunk in chunks:
+                yield process_chunk(chunk, self.max_hr)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = set()
+            for chunk in chunks:
+                in_flight.add(pool.submit(process_chunk, chunk, self.max_hr))
+                # Bounded window: the next chunk is only copied once one comes back
+                if len(in_flight) >= 2 * self.workers:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        yield future.result()
+            for future in in_flight:
+                yield future.result()
+
+    def _write(self, sessions: List[WorkoutSession]):
+        if sessions:
+            self.manager.update_workouts(sessions)
+            self.updated += len(sessions)
+            self.done.update(session.id for session in sessions)
+        # Only after the data is written, so a crash never marks unwritten work as done
+        data = json.dumps({"done": sorted(self.done)})
+        atomic_write(self.state_path, lambda f: f.write(data))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute workout summaries and pyramids in parallel.")
+    parser.add_argument("path", nargs="?", default=DATA_FILE)
+    parser.add_argument("--storage", choices=STORAGE_KINDS, default="json")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count; 1 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=32, help="sessions sent to a worker at a time")
+    parser.add_argument("--checkpoint", type=int, default=500, help="sessions written per storage write")
+    parser.add_argument("--max-hr", type=float, default=DEFAULT_MAX_HR)
+    parser.add_argument("--restart", action="store_true", help="ignore the progress of an interrupted run")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} sessions", end="", file=sys.stderr, flush=True)
+
+    manager = FitnessManager(storage=open_storage(args.storage, args.path))
+    reprocessor = Reprocessor(manager, args.path + ".reprocess.json", workers=args.workers,
+                              chunk_size=args.chunk_size, checkpoint=args.checkpoint, max_hr=args.max_hr,
+                              progress=progress)
+    if not args.restart:
+        reprocessor.load_state()
+    report = reprocessor.run()
+    manager.close()
+    print(file=sys.stderr)
+    if report["resumed_after"]:
+        print(f"Resumed after {report['resumed_after']} sessions done by an earlier run")
+    print(f"{report['sessions']} sessions ({report['updated']} updated, {report['skipped']} without samples) "
+          f"in {report['seconds']:.2f} s with {report['workers']} worker(s): "
+          f"{report['sessions_per_second']:,.1f} sessions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Headless ingestion server: sensor samples and finished workouts from many
+devices over HTTP, with no Flet or rich.
+
+    python -m fitness_tracker.server fitness_data.json --storage journal --port 8765
+
+Endpoints (JSON bodies):
+
+    POST /devices/<device>/samples  {"samples": [{...}, ...], "activity_type": "Running"}
+        Add samples to the device's open recording, started by the first
+        batch. 202 {"buffered": samples so far}.
+    POST /devices/<device>/finish   {"activity_type": "Running"} (optional)
+        Close the recording and store it as a workout. 201 {"id": ...}.
+    POST /workouts                  a WorkoutSession.to_dict(), or a list of them
+        Store finished workouts. 201 {"ids": [...], "already_stored": [...]};
+        workouts whose id is already stored are skipped, so retries are safe.
+    GET  /stats                     counters, for health checks and load tests.
+
+Samples are the same dicts MockSensorAPI produces and are recorded with a
+WorkoutRecorder per device, so summaries match the other front ends.
+Finished workouts go through a GroupCommitter: one writer thread writes
+everything that queued up while the previous write ran with a single
+`FitnessManager.add_workouts` call, so many devices finishing at once
+cost one storage write (one fsync for JournalStorage, one transaction
+for SQLite) instead of one each. 201s are only sent once the workout has
+been written. If the write fails the reply is a 500 (503 if it took
+longer than `commit_timeout`) and a finished recording is reopened, so the
+device can retry `/finish` without losing its samples. Recordings idle for
+`idle_timeout` seconds are finished automatically, and open recordings are
+finished on shutdown.
+"""
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from .codec import get_codec
+from .columns import fits
+from .manager import DATA_FILE, FitnessManager
+from .models import WorkoutSession
+from .recorder import DEFAULT_CHANNELS, WorkoutRecorder
+from .storage import STORAGE_KINDS, open_storage
+from . import instrumentation
+
+DEFAULT_PORT = 8765
+# Everything the simulator can send besides accelerometer axes
+CHANNELS = DEFAULT_CHANNELS + ("cadence", "latitude", "longitude", "power")
+MAX_BODY = 16 * 2**20
+
+_DEVICE_PATH = re.compile(r"^/devices/([A-Za-z0-9_.\-]{1,64})/(samples|finish)$")
+
+
+class GroupCommitter:
+    """
+    Writes finished workouts from a single thread, batching whatever queued
+    up while the previous batch was being written (at most `max_batch`
+    workouts, lingering up to `max_delay` seconds for more).
+    """
+
+    def __init__(self, manager: FitnessManager, max_batch: int = 512, max_delay: float = 0.0):
+        self.manager = manager
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.committed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="group-commit")
+        self._thread.start()
+
+    def submit(self, sessions: List[WorkoutSession]) -> Future:
+        """
+        Queue `sessions`; the future resolves once they have been written, to
+        the ids that were skipped because a workout with that id was already
+        stored (or queued earlier).
+        """
+        future = Future()
+        self._queue.put((sessions, future))
+        return future
+
+    def stop(self):
+        """Write what is queued, then stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            count = len(item[0])
+            deadline = time.monotonic() + self.max_delay
+            while count < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                count += len(item[0])
+            self._commit(batch)
+
+    def _commit(self, batch):
+        # Checked here rather than on submit: this thread is the only one
+        # adding, so a retry queued behind its still-pending original is caught too
+        fresh, skipped, seen = [], [], set()
+        for sessions, _ in batch:
+            skipped.append([])
+            for session in sessions:
+                if session.id in seen or self.manager.get_workout(session.id) is not None:
+                    skipped[-1].append(session.id)
+                else:
+                    seen.add(session.id)
+                    fresh.append(session)
+        try:
+            self.manager.add_workouts(fresh)
+        except Exception as ex:
+            if len(batch) > 1:
+                # Find the submission that failed, so the others still get written
+                for item in batch:
+                    self._commit([item])
+                return
+            batch[0][1].set_exception(ex)
+            return
+        self.batches += 1
+        self.committed += len(fresh)
+        for (_, future), ids in zip(batch, skipped):
+            future.set_result(ids)
+
+
+class _Recording:
+    def __init__(self, activity_type: str):
+        self.recorder = WorkoutRecorder(activity_type=activity_type, channels=CHANNELS)
+        self.lock = threading.Lock()
+        self.samples = 0
+        self.last_seen = time.monotonic()
+
+
+class IngestServer(ThreadingHTTPServer):
+    """HTTP front end for `manager`: `serve_forever()` or `start()`, then `close()` once serving."""
+
+    daemon_threads = True
+    # Many devices connect at once; the default backlog of 5 resets connections
+    request_queue_size = 256
+
+    def __init__(self, manager: FitnessManager, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 idle_timeout: float = 600.0, max_samples: int = 1_000_000, commit_timeout: float = 30.0,
+                 committer: Optional[GroupCommitter] = None):
+        super().__init__((host, port), _Handler)
+        self.manager = manager
+        self.committer = committer or GroupCommitter(manager)
+        self.codec = get_codec()
+        self.idle_timeout = idle_timeout
+        self.max_samples = max_samples
+        self.commit_timeout = commit_timeout
+        self.samples_received = 0
+        self.requests_handled = 0
+        self._recordings: Dict[str, _Recording] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, daemon=True, name="idle-recordings")
+        self._reaper.start()
+
+    def start(self) -> threading.Thread:
+        """`serve_forever` on a daemon thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True, name="ingest-http")
+        thread.start()
+        return thread
+
+    def close(self):
+        """Stop accepting requests, finish open recordings and write everything queued."""
+        self.shutdown()
+        self.server_close()
+        self._closed.set()
+        with self._lock:
+            devices = list(self._recordings)
+        for device in devices:
+            self.finish(device)
+        self.committer.stop()
+
+    def add_samples(self, device: str, samples: List[dict], activity_type: Optional[str] = None) -> int:
+        with self._lock:
+            recording = self._recordings.get(device)
+            if recording is None:
+                recording = self._recordings[device] = _Recording(activity_type or "Running")
+        with recording.lock:
+            if recording.samples + len(samples) > self.max_samples:
+                raise OverflowError(f"recording for {device} is over {self.max_samples} samples")
+            recording.recorder.add_batch(samples)
+            recording.samples += len(samples)
+            recording.last_seen = time.monotonic()
+            buffered = recording.samples
+        with self._lock:
+            self.samples_received += len(samples)
+        instrumentation.count("server.samples", len(samples))
+        return buffered
+
+    def finish(self, device: str, activity_type: Optional[str] = None) -> Optional[Tuple[WorkoutSession, Future]]:
+        """
+        Close the device's recording and queue it for writing; None if it has
+        none open. If the write fails, the recording is reopened (unless the
+        device has started a new one) before the future fails.
+        """
+        with self._lock:
+            recording = self._recordings.pop(device, None)
+        if recording is None:
+            return None
+        with recording.lock:
+            if activity_type:
+                recording.recorder.activity_type = activity_type
+            session = recording.recorder.finish()
+        written = Future()
+
+        def done(future):
+            if future.exception() is not None:
+                with self._lock:
+                    self._recordings.setdefault(device, recording)
+                written.set_exception(future.exception())
+            else:
+                written.set_result(future.result())
+
+        self.committer.submit([session]).add_done_callback(done)
+        return session, written
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests_handled,
+                "samples_received": self.samples_received,
+                "open_recordings": len(self._recordings),
+                "workouts_committed": self.committer.committed,
+                "commit_batches": self.committer.batches,
+            }
+
+    def _reap(self):
+        while not self._closed.wait(min(self.idle_timeout, 5.0)):
+            cutoff = time.monotonic() - self.idle_timeout
+            with self._lock:
+                idle = [device for device, r in self._recordings.items() if r.last_seen < cutoff]
+            for device in idle:
+                self.finish(device)
+
+
+def _valid_sample(sample) -> bool:
+    # Checked up front for the whole batch: a value the typed columns reject
+    # halfway through add_batch would leave the channels different lengths
+    return isinstance(sample, dict) and all(
+        fits("timestamp" if key == "elapsed_seconds" else key, value) for key, value in sample.items()
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so a device streams batches over one connection
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this each reply waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.server.stats())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        server = self.server
+        try:
+            body = self._read_body()
+        except ValueError as ex:
+            self._reply(400, {"error": str(ex)})
+            return
+        if body is None:
+            return
+
+        match = _DEVICE_PATH.match(self.path)
+        try:
+            if match and match.group(2) == "samples":
+                samples = body["samples"]
+                if not isinstance(samples, list) or not all(_valid_sample(s) for s in samples):
+                    raise ValueError("samples must be a list of objects with numeric values "
+                                     "(heart_rate and steps as non-negative integers)")
+                buffered = server.add_samples(match.group(1), samples, body.get("activity_type"))
+                self._reply(202, {"buffered": buffered})
+            elif match:
+                finished = server.finish(match.group(1), body.get("activity_type"))
+                if finished is None:
+                    self._reply(409, {"error": "no open recording"})
+                    return
+                session, future = finished
+                try:
+                    future.result(server.commit_timeout)
+                except FutureTimeoutError:
+                    # Still queued: it is written later, or the recording is reopened if that fails
+                    self._reply(503, {"error": "timed out waiting for the write", "id": session.id})
+                    return
+                self._reply(201, {"id": session.id})
+            elif self.path == "/workouts":
+                sessions = [WorkoutSession.from_dict(data) for data in (body if isinstance(body, list) else [body])]
+                try:
+                    skipped = server.committer.submit(sessions).result(server.commit_timeout)
+                except FutureTimeoutError:
+                    # The ids are kept, so the client can retry without creating duplicates
+                    self._reply(503, {"error": "timed out waiting for the write"})
+                    return
+                self._reply(201, {"ids": [session.id for session in sessions], "already_stored": skipped})
+            else:
+                self._reply(404, {"error": "not found"})
+        except OverflowError as ex:
+            self._reply(413, {"error": str(ex)})
+        except (KeyError, TypeError, ValueError) as ex:
+            self._reply(400, {"error": f"invalid payload: {ex!r}"})
+        except Exception as ex:
+            # A failed storage write, passed on by the GroupCommitter
+            self._reply(500, {"error": f"could not store workout: {ex!r}"})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self._reply(413, {"error": "body too large"})
+            self.close_connection = True
+            return None
+        data = self.rfile.read(length)
+        try:
+            return self.server.codec.loads(data) if data else {}
+        except json.JSONDecodeError as ex:
+            raise ValueError(f"invalid JSON: {ex}") from ex
+
+    def _reply(self, status: int, data):
+        with self.server._lock:
+            self.server.requests_handled += 1
+        body = self.server.codec.dumps(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accept sensor samples and workouts over HTTP.")
+    parser.add_argument("path", nargs="?", default=DATA_FILE)
+    parser.add_argument("--storage", choices=STORAGE_KINDS, default="journal")
+    parser.add_argument("--username", default="User")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=600.0,
+                        help="seconds without samples before a recording is finished (default 600)")
+    args = parser.parse_args(argv)
+
+    manager = FitnessManager(username=args.username, storage=open_storage(args.storage, args.path))
+    server = IngestServer(manager, args.host, args.port, idle_timeout=args.idle_timeout)
+    instrumentation.serve_from_config()
+    print(f"Listening on http://{args.host}:{server.server_address[1]} ({args.storage}: {args.path})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import math
+import random
+import threading
+import time
+from typing import Iterable, Optional
+from .api import MockSensorAPI
+
+ALL_CHANNELS = ("heart_rate", "steps", "cadence", "accelerometer", "gps", "power")
+
+METERS_PER_DEGREE = 111_111
+
+
+class SensorSimulator(MockSensorAPI):
+    """
+    Configurable, deterministic sensor stream for load testing.
+
+    Drop-in replacement for `MockSensorAPI` (same `add_callback`/`subscribe`/
+    `start_stream`/`stop_stream` surface) that samples at `rate_hz` and can
+    emit heart rate, steps, cadence, 3-axis accelerometer, GPS position and
+    power. With `realtime=False` it doesn't sleep at all and replays as fast
+    as the consumers allow; sample timestamps are still spaced 1/rate_hz
+    apart so recordings look the same as a real-time run. The same `seed`
+    always produces the same samples.
+    """
+
+    def __init__(self, rate_hz: float = 100, seed: Optional[int] = None, realtime: bool = True,
+                 max_samples: Optional[int] = None, channels: Iterable[str] = ALL_CHANNELS,
+                 start_position=(51.5007, -0.1246)):
+        super().__init__()
+        unknown = set(channels) - set(ALL_CHANNELS)
+        if unknown:
+            raise ValueError(f"Unknown channels: {sorted(unknown)}")
+        self.rate_hz = rate_hz
+        self.seed = seed
+        self.realtime = realtime
+        self.max_samples = max_samples
+        self.channels = set(channels)
+        self.start_position = start_position
+        self._done = threading.Event()
+        self.reset()
+
+    def start_stream(self):
+        if self._running:
+            return
+        self._done.clear()
+        super().start_stream()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until `max_samples` have been emitted or the stream is stopped."""
+        return self._done.wait(timeout)
+
+    def reset(self):
+        super().reset()
+        self.samples_emitted = 0
+        self._rng = random.Random(self.seed)
+        self._heart_rate = 70.0
+        self._cadence = 0.0        # steps per minute
+        self._step_phase = 0.0     # fractional steps not yet counted
+        self._heading = self._rng.uniform(0, 2 * math.pi)
+        self._lat, self._lon = self.start_position
+
+    def next_sample(self) -> dict:
+        rng = self._rng
+        dt = 1.0 / self.rate_hz
+        elapsed = self.samples_emitted * dt
+
+        # Same random walk as MockSensorAPI, scaled so it drifts at the same speed per second
+        self._heart_rate = max(60.0, min(180.0, self._heart_rate + rng.uniform(-2, 3) * dt))
+        # Cadence ramps up to ~160 spm over the first minute and a half, then wanders
+        drift = rng.gauss(2.0, 5.0) if self._cadence < 160 else rng.gauss(0, 5.0)
+        cadence = self._cadence = max(0.0, min(190.0, self._cadence + drift * dt))
+        self._step_phase += cadence / 60.0 * dt
+        new_steps = int(self._step_phase)
+        self._step_phase -= new_steps
+        self.total_steps += new_steps
+        self.current_heart_rate = int(self._heart_rate)
+
+        data = {
+            "timestamp": self.start_time + elapsed,
+            "elapsed_seconds": elapsed,
+        }
+        if "heart_rate" in self.channels:
+            data["heart_rate"] = self.current_heart_rate
+        if "steps" in self.channels:
+            data["steps"] = self.total_steps
+        if "cadence" in self.channels:
+            data["cadence"] = cadence
+        if "accelerometer" in self.channels:
+            # Vertical bounce at the step frequency plus sensor noise, in g
+            bounce = math.sin(2 * math.pi * (cadence / 60.0) * elapsed)
+            data["accel_x"] = rng.gauss(0, 0.05)
+            data["accel_y"] = rng.gauss(0, 0.05)
+            data["accel_z"] = 1.0 + 0.3 * bounce + rng.gauss(0, 0.05)
+        if "gps" in self.channels:
+            speed = cadence / 60.0 * 1.1  # ~1.1 m per step
+            self._heading += rng.gauss(0, 0.01)
+            self._lat += speed * dt * math.cos(self._heading) / METERS_PER_DEGREE
+            self._lon += speed * dt * math.sin(self._heading) / (METERS_PER_DEGREE * math.cos(math.radians(self._lat)))
+            data["latitude"] = self._lat
+            data["longitude"] = self._lon
+        if "power" in self.channels:
+            data["power"] = max(0.0, 1.2 * cadence + rng.gauss(0, 10))
+
+        self.samples_emitted += 1
+        return data
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_samples is not None and self.samples_emitted >= self.max_samples
+
+    def _generate_data(self):
+        wall_start = time.monotonic()
+        try:
+            while self._running and not self.exhausted:
+                self._emit(self.next_sample())
+
+                if self.realtime:
+                    # Sleep to the next tick rather than a fixed dt, so callback time doesn't cause drift
+                    delay = wall_start + self.samples_emitted / self.rate_hz - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            self._running = False
+            self._done.set()
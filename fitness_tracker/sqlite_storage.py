@@ -0,0 +1,291 @@
+import json
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from .models import UserProfile, Goal, WorkoutSession, GoalType, GoalPeriod, intern_keys
+from .storage import JsonStorage
+from .columns import MetricColumns
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS goals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    target_value INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workouts (
+    id TEXT PRIMARY KEY,
+    activity_type TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_workouts_start_time ON workouts(start_time);
+CREATE TABLE IF NOT EXISTS samples (
+    workout_id TEXT NOT NULL REFERENCES workouts(id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    value,
+    PRIMARY KEY (workout_id, metric, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lod (
+    workout_id TEXT PRIMARY KEY REFERENCES workouts(id) ON DELETE CASCADE,
+    columns TEXT NOT NULL
+);
+"""
+
+
+class SQLiteStorage:
+    """
+    Stores the profile in an SQLite database (stdlib `sqlite3`).
+
+    Workouts, goals and per-sample metrics live in separate tables and
+    `workouts.start_time` is indexed, so date-range queries such as
+    `stats_between` don't have to touch the full history. A workout's
+    pyramid (see timeseries.py) is small and only ever read whole, so it is
+    one encoded `lod` row rather than rows in `samples`. The connection is
+    shared between threads, so every use of it is serialized by `lock`.
+
+    Other processes may write to the same database. The append/update/delete
+    methods return True, as in JsonStorage, when another connection
+    committed since this one last read or wrote; the caller's profile is
+    then reloaded in place so it includes those changes.
+    """
+
+    def __init__(self, path: str = "fitness_data.db"):
+        self.path = path
+        # Views write from the sensor thread and Flet handler threads; other
+        # processes are kept out by SQLite's own locking, waited on for up to `timeout`
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        # Changes whenever another connection commits, see _commit
+        self._data_version = self._current_data_version()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def load(self) -> Optional[UserProfile]:
+        with self.lock, self.conn:
+            # One read transaction, so workouts and their samples come from the same snapshot
+            self.conn.execute("BEGIN")
+            self._data_version = self._current_data_version()
+            row = self.conn.execute("SELECT value FROM profile WHERE key = 'username'").fetchone()
+            if row is None:
+                return None
+            profile = UserProfile(username=row[0])
+            profile.goals = [
+                self._goal_from_row(r)
+                for r in self.conn.execute("SELECT type, target_value, period, created_at FROM goals ORDER BY id")
+            ]
+            profile.workouts = self._query_workouts("1", ())
+            return profile
+
+    def save(self, profile: UserProfile):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM samples")
+            self.conn.execute("DELETE FROM lod")
+            self.conn.execute("DELETE FROM workouts")
+            self.conn.execute("DELETE FROM goals")
+            self._set_username(profile.username)
+            for goal in profile.goals:
+                self._insert_goal(goal)
+            for session in profile.workouts:
+                self._insert_workout(session)
+
+    def append_goal(self, profile: UserProfile, goal: Goal) -> bool:
+        def write():
+            self._set_username(profile.username)
+            self._insert_goal(goal)
+        return self._commit(profile, write)
+
+    def append_workout(self, profile: UserProfile, session: WorkoutSession) -> bool:
+        return self.append_workouts(profile, [session])
+
+    def append_workouts(self, profile: UserProfile, sessions: List[WorkoutSession]) -> bool:
+        """All of `sessions` in one transaction."""
+        def write():
+            self._set_username(profile.username)
+            for session in sessions:
+                self._insert_workout(session)
+        return self._commit(profile, write)
+
+    def update_workout(self, profile: UserProfile, session: WorkoutSession) -> bool:
+        return self.update_workouts(profile, [session])
+
+    def update_workouts(self, profile: UserProfile, sessions: List[WorkoutSession]) -> bool:
+        def write():
+            for session in sessions:
+                self._insert_workout(session)
+        return self._commit(profile, write)
+
+    def delete_workout(self, profile: UserProfile, session_id: str) -> bool:
+        return self._commit(profile, lambda: self.conn.execute("DELETE FROM workouts WHERE id = ?", (session_id,)))
+
+    def _commit(self, profile: UserProfile, write) -> bool:
+        """
+        Run `write()` in one transaction. If another connection committed
+        since this one last looked, `profile` is reloaded afterwards and
+        True is returned.
+        """
+        with self.lock:
+            with self.conn:
+                # IMMEDIATE takes the write lock first, so no other commit can land between the check and the write
+                self.conn.execute("BEGIN IMMEDIATE")
+                version = self._current_data_version()
+                write()
+            merged = version != self._data_version
+            self._data_version = version
+            if merged:
+                latest = self.load()
+                if latest is not None:
+                    profile.goals[:] = latest.goals
+                    profile.workouts[:] = latest.workouts
+            return merged
+
+    def _current_data_version(self) -> int:
+        # Per connection: only commits made by other connections change it
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_aggregates(self) -> Optional[dict]:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM profile WHERE key = 'aggregates'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_aggregates(self, data: dict):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO profile (key, value) VALUES ('aggregates', ?)", (json.dumps(data),))
+
+    def workouts_between(self, start: datetime, end: datetime) -> List[WorkoutSession]:
+        """Workouts with start <= start_time < end, oldest first."""
+        return self._query_workouts("start_time >= ? AND start_time < ?", (start.isoformat(), end.isoformat()))
+
+    def stats_between(self, start: datetime, end: datetime) -> Dict[str, float]:
+        """Same totals as `FitnessManager.get_today_stats`, for start <= start_time < end."""
+        with self.lock:
+            row = self.conn.execute(
+                """
+                SELECT
+                    COALESCE(SUM(json_extract(summary, '$.total_steps')), 0),
+                    COALESCE(SUM(json_extract(summary, '$.calories')), 0),
+                    COALESCE(SUM((julianday(end_time) - julianday(start_time)) * 1440.0), 0)
+                FROM workouts
+                WHERE start_time >= ? AND start_time < ?
+                """,
+                (start.isoformat(), end.isoformat())
+            ).fetchone()
+        return {
+            "steps": row[0],
+            "calories": row[1],
+            "duration_minutes": row[2]
+        }
+
+    def _set_username(self, username: str):
+        self.conn.execute("INSERT OR REPLACE INTO profile (key, value) VALUES ('username', ?)", (username,))
+
+    def _insert_goal(self, goal: Goal):
+        self.conn.execute(
+            "INSERT INTO goals (type, target_value, period, created_at) VALUES (?, ?, ?, ?)",
+            (goal.type.value, goal.target_value, goal.period.value, goal.created_at.isoformat())
+        )
+
+    def _insert_workout(self, session: WorkoutSession):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO workouts (id, activity_type, start_time, end_time, summary) VALUES (?, ?, ?, ?, ?)",
+            (
+                session.id,
+                session.activity_type,
+                session.start_time.isoformat(),
+                session.end_time.isoformat() if session.end_time else None,
+                json.dumps(session.summary)
+            )
+        )
+        self.conn.execute("DELETE FROM samples WHERE workout_id = ?", (session.id,))
+        for metric, values in session.metrics.items():
+            self.conn.executemany(
+                "INSERT INTO samples (workout_id, metric, idx, value) VALUES (?, ?, ?, ?)",
+                ((session.id, metric, i, v) for i, v in enumerate(values))
+            )
+        self.conn.execute("DELETE FROM lod WHERE workout_id = ?", (session.id,))
+        if session.lod:
+            self.conn.execute("INSERT INTO lod (workout_id, columns) VALUES (?, ?)",
+                              (session.id, json.dumps(session.lod.to_dict())))
+
+    def _goal_from_row(self, row) -> Goal:
+        return Goal(
+            type=GoalType(row[0]),
+            target_value=row[1],
+            period=GoalPeriod(row[2]),
+            created_at=datetime.fromisoformat(row[3])
+        )
+
+    def _query_workouts(self, where: str, params: tuple) -> List[WorkoutSession]:
+        with self.lock:
+            return self._query_workouts_locked(where, params)
+
+    def _query_workouts_locked(self, where: str, params: tuple) -> List[WorkoutSession]:
+        sessions = []
+        rows = self.conn.execute(
+            f"SELECT id, activity_type, start_time, end_time, summary FROM workouts WHERE {where} ORDER BY start_time, rowid",
+            params
+        )
+        for row in rows:
+            sessions.append(WorkoutSession(
+                id=row[0],
+                activity_type=sys.intern(row[1]),
+                start_time=datetime.fromisoformat(row[2]),
+                end_time=datetime.fromisoformat(row[3]) if row[3] else None,
+                summary=intern_keys(json.loads(row[4]))
+            ))
+        if not sessions:
+            return sessions
+
+        by_id = {s.id: s for s in sessions}
+        rows = self.conn.execute(
+            f"""
+            SELECT samples.workout_id, samples.metric, samples.value
+            FROM samples JOIN workouts ON workouts.id = samples.workout_id
+            WHERE {where}
+            ORDER BY samples.workout_id, samples.metric, samples.idx
+            """,
+            params
+        )
+        samples = {}
+        for workout_id, metric, value in rows:
+            samples.setdefault(workout_id, {}).setdefault(metric, []).append(value)
+        for workout_id, metrics in samples.items():
+            by_id[workout_id].metrics = MetricColumns(metrics)
+
+        rows = self.conn.execute(
+            f"SELECT lod.workout_id, lod.columns FROM lod JOIN workouts ON workouts.id = lod.workout_id WHERE {where}",
+            params
+        )
+        for workout_id, columns in rows:
+            by_id[workout_id].lod = MetricColumns.from_dict(json.loads(columns))
+        return sessions
+
+
+def migrate_json(json_path: str, db_path: str) -> SQLiteStorage:
+    """One-shot import of a `fitness_data.json` file (UserProfile.to_dict format) into SQLite."""
+    profile = JsonStorage(json_path).load()
+    storage = SQLiteStorage(db_path)
+    if profile is not None:
+        storage.save(profile)
+    return storage
+
+
+if __name__ == "__main__":
+    # python -m fitness_tracker.sqlite_storage fitness_data.json fitness_data.db
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "fitness_data.json"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "fitness_data.db"
+    migrate_json(json_path, db_path).close()
+    print(f"Migrated {json_path} -> {db_path}")
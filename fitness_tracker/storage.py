@@ -0,0 +1,409 @@
+import json
+import os
+from functools import partial
+from typing import List, Optional
+from .models import UserProfile, Goal, WorkoutSession
+from .columns import MetricColumns, LazyMetrics
+from .locking import FileLock, atomic_write
+from .codec import get_codec
+
+
+class JsonStorage:
+    """
+    Stores the whole profile as a single JSON document, rewritten on every save.
+
+    With `split_metrics=True` each session's samples go to their own
+    `<path>.metrics/<session id>.json` file (and its pyramid, see
+    timeseries.py, to `<session id>.lod.json`) and the main document only
+    keeps a reference, so it stays small. With `lazy=True` sessions are
+    loaded with their summaries only and the samples and pyramid are read
+    on first access.
+
+    Safe to share between threads and between processes: every write holds
+    `lock` (see locking.py) and replaces the file atomically. Writes are
+    optimistic: if the file changed since this instance last read or wrote
+    it, the latest version is loaded, the change is replayed on top of it
+    and the caller's profile is updated in place, so concurrent writers
+    merge instead of overwriting each other. The append/update/delete
+    methods return True when that happened.
+
+    Files are encoded with `codec` (see codec.py), by default the one
+    selected in config.JSON_CODEC.
+    """
+
+    def __init__(self, path: str, split_metrics: bool = False, lazy: bool = False, codec=None):
+        self.path = path
+        self.metrics_dir = path + ".metrics"
+        self.aggregates_path = path + ".rollups.json"
+        self.split_metrics = split_metrics
+        self.lazy = lazy
+        self._written_metrics = set()  # session ids known to have an up-to-date metrics file
+        self._stale_metrics = set()    # session ids whose metrics file must be rewritten
+        self.codec = codec or get_codec()
+        self.lock = FileLock(path + ".lock")
+        self.version = 0               # document version last read or written by this instance
+        self._seen = None              # _file_state() as of then
+
+    def load(self) -> Optional[UserProfile]:
+        with self.lock:
+            self._seen = self._file_state()
+            if not os.path.exists(self.path):
+                self.version = 0
+                return None
+            data = self._read_json(self.path)
+            self.version = data.get("version", 0)
+            return self._profile_from_dict(data)
+
+    def save(self, profile: UserProfile):
+        """Overwrite the stored profile with `profile`."""
+        with self.lock:
+            self._write(profile)
+
+    def append_goal(self, profile: UserProfile, goal: Goal) -> bool:
+        return self._commit(profile, lambda p: p.goals.append(goal))
+
+    def append_workout(self, profile: UserProfile, session: WorkoutSession) -> bool:
+        return self._commit(profile, partial(_put_workout, session))
+
+    def append_workouts(self, profile: UserProfile, sessions: List[WorkoutSession]) -> bool:
+        """`append_workout` for several sessions with a single write."""
+        return self._commit(profile, partial(_put_workouts, sessions))
+
+    def update_workout(self, profile: UserProfile, session: WorkoutSession) -> bool:
+        self._forget_metrics(session.id)
+        return self._commit(profile, partial(_put_workout, session))
+
+    def update_workouts(self, profile: UserProfile, sessions: List[WorkoutSession]) -> bool:
+        """`update_workout` for several sessions with a single write."""
+        for session in sessions:
+            self._forget_metrics(session.id)
+        return self._commit(profile, partial(_put_workouts, sessions))
+
+    def delete_workout(self, profile: UserProfile, session_id: str) -> bool:
+        merged = self._commit(profile, partial(_remove_workout, session_id))
+        self._remove_metrics(session_id)
+        return merged
+
+    def load_aggregates(self) -> Optional[dict]:
+        if not os.path.exists(self.aggregates_path):
+            return None
+        return self._read_json(self.aggregates_path)
+
+    def save_aggregates(self, data: dict):
+        with self.lock:
+            self._write_json(self.aggregates_path, data)
+
+    def _file_state(self):
+        """Cheap fingerprint of the data on disk; changes whenever another writer replaces the file."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _commit(self, profile: UserProfile, apply) -> bool:
+        """
+        Write `profile` after `apply(profile)` has been done in memory by the
+        caller. If someone else wrote in the meantime, `apply` is replayed on
+        the latest stored profile instead and `profile` takes its contents.
+        """
+        with self.lock:
+            merged = self._merge_if_changed(profile, apply)
+            self._write(profile)
+            return merged
+
+    def _merge_if_changed(self, profile: UserProfile, apply) -> bool:
+        if self._file_state() == self._seen:
+            return False
+        latest = self.load() or UserProfile(username=profile.username)
+        apply(latest)
+        profile.goals[:] = latest.goals
+        profile.workouts[:] = latest.workouts
+        return True
+
+    def _write(self, profile: UserProfile):
+        self.version += 1
+        data = self._profile_to_dict(profile)
+        data["version"] = self.version
+        self._write_json(self.path, data)
+        self._seen = self._file_state()
+
+    def _forget_metrics(self, session_id: str):
+        """Make the next save rewrite this session's metrics file with the current samples."""
+        self._written_metrics.discard(session_id)
+        self._stale_metrics.add(session_id)
+
+    def _remove_metrics(self, session_id: str):
+        self._written_metrics.discard(session_id)
+        for path in (self._metrics_path(session_id), self._lod_path(session_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _profile_to_dict(self, profile: UserProfile) -> dict:
+        return {
+            "username": profile.username,
+            "goals": [g.to_dict() for g in profile.goals],
+            "workouts": [self._session_to_dict(w) for w in profile.workouts]
+        }
+
+    def _profile_from_dict(self, data: dict) -> UserProfile:
+        profile = UserProfile(username=data["username"])
+        profile.goals = [Goal.from_dict(g) for g in data.get("goals", [])]
+        profile.workouts = [self._session_from_dict(w) for w in data.get("workouts", [])]
+        return profile
+
+    def _session_to_dict(self, session: WorkoutSession) -> dict:
+        if not self.split_metrics:
+            return session.to_dict()
+
+        data = session.to_dict(include_metrics=False)
+        data["metrics_ref"] = session.id
+
+        # Samples never change once a session is recorded, so an existing file is left alone.
+        if session.id in self._written_metrics:
+            return data
+        metrics_path = self._metrics_path(session.id)
+        if session.id in self._stale_metrics or not os.path.exists(metrics_path):
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            # Samples never read from the file are still what it holds, e.g. when only the summary changed
+            if not _unread_from(session.metrics, metrics_path):
+                self._write_json(metrics_path, session.metrics.to_dict())
+            lod_path = self._lod_path(session.id)
+            if session.lod:
+                self._write_json(lod_path, session.lod.to_dict())
+            elif os.path.exists(lod_path):
+                os.remove(lod_path)
+        self._written_metrics.add(session.id)
+        self._stale_metrics.discard(session.id)
+        return data
+
+    def _session_from_dict(self, data: dict) -> WorkoutSession:
+        ref = data.get("metrics_ref")
+        if not self.lazy and ref is None:
+            return WorkoutSession.from_dict(data)
+
+        session = WorkoutSession.from_dict({k: v for k, v in data.items() if k not in ("metrics", "lod")})
+        if ref is not None:
+            if ref not in self._stale_metrics:
+                self._written_metrics.add(ref)
+            sources = (self._metrics_path(ref), self._lod_path(ref))
+            loaders = [partial(self._read_columns, path) for path in sources]
+        else:
+            # Inline samples: the JSON is already parsed, but decoding the columns is deferred
+            sources = (None, None)
+            loaders = (partial(MetricColumns.from_dict, data.get("metrics") or {}),
+                       partial(MetricColumns.from_dict, data.get("lod") or {}))
+        if self.lazy:
+            session.metrics, session.lod = (LazyMetrics(loader, source) for loader, source in zip(loaders, sources))
+        else:
+            session.metrics, session.lod = (loader() for loader in loaders)
+        return session
+
+    def _metrics_path(self, session_id: str) -> str:
+        return os.path.join(self.metrics_dir, f"{session_id}.json")
+
+    def _lod_path(self, session_id: str) -> str:
+        return os.path.join(self.metrics_dir, f"{session_id}.lod.json")
+
+    def _read_columns(self, path: str) -> MetricColumns:
+        if not os.path.exists(path):
+            # Session was deleted later in the journal, or has no pyramid
+            return MetricColumns()
+        return MetricColumns.from_dict(self._read_json(path))
+
+    def _read_json(self, path: str):
+        with open(path, "rb") as f:
+            return self.codec.loads(f.read())
+
+    def _write_json(self, path: str, data):
+        encoded = self.codec.dumps(data)
+        atomic_write(path, lambda f: f.write(encoded), binary=True)
+
+
+class JournalStorage(JsonStorage):
+    """
+    Snapshot + append-only journal.
+
+    Every added goal/workout is written as one JSON line to the journal and
+    fsync'd, so a save costs O(size of the record) instead of O(history).
+    Once the journal holds `compact_every` records it is folded into a new
+    snapshot, which is written to a temp file and atomically renamed.
+    The snapshot is the same format as `JsonStorage`, so existing data
+    files are read as-is. Concurrent writers are handled as in JsonStorage,
+    with the journal's size as part of the change check.
+    """
+
+    def __init__(self, path: str, journal_path: Optional[str] = None, compact_every: int = 100, **kwargs):
+        super().__init__(path, **kwargs)
+        self.journal_path = journal_path or path + ".journal"
+        self.compact_every = compact_every
+        self._seq = 0          # sequence number of the last record written
+        self._pending = 0      # records in the journal since the last compaction
+
+    def load(self) -> Optional[UserProfile]:
+        with self.lock:
+            profile = self._load()
+            self._seen = self._file_state()
+            return profile
+
+    def _load(self) -> Optional[UserProfile]:
+        profile = None
+        snapshot_seq = 0
+        if os.path.exists(self.path):
+            data = self._read_json(self.path)
+            profile = self._profile_from_dict(data)
+            snapshot_seq = data.get("journal_seq", 0)
+        self._seq = snapshot_seq
+        self._pending = 0
+
+        if not os.path.exists(self.journal_path):
+            return profile
+
+        good_offset = 0
+        torn = False
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    record = self.codec.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                if record is None or not line.endswith(b"\n"):
+                    # A torn final line from a crash mid-append; everything before it is intact.
+                    torn = True
+                    break
+                good_offset += len(line)
+                seq = record["seq"]
+                if seq <= snapshot_seq:
+                    # Already folded into the snapshot (crash between rename and truncate).
+                    continue
+                if profile is None:
+                    profile = UserProfile(username=record.get("username", "User"))
+                self._apply(profile, record)
+                self._seq = seq
+                self._pending += 1
+        if torn:
+            # Cut it off so the next append starts on a clean line.
+            os.truncate(self.journal_path, good_offset)
+        return profile
+
+    def _apply(self, profile: UserProfile, record: dict):
+        if record["op"] == "goal":
+            profile.goals.append(Goal.from_dict(record["data"]))
+        elif record["op"] == "workout":
+            profile.workouts.append(self._session_from_dict(record["data"]))
+        elif record["op"] == "update_workout":
+            session = self._session_from_dict(record["data"])
+            profile.workouts = [session if w.id == session.id else w for w in profile.workouts]
+        elif record["op"] == "delete_workout":
+            profile.workouts = [w for w in profile.workouts if w.id != record["data"]["id"]]
+
+    def _file_state(self):
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            journal_size = None
+        return (super()._file_state(), journal_size)
+
+    def _append(self, profile: UserProfile, op: str, make_data, apply) -> bool:
+        return self._append_many(profile, [(op, make_data)], apply)
+
+    def _append_many(self, profile: UserProfile, records, apply) -> bool:
+        """Append one journal record per (op, make_data) pair, with a single fsync for all of them."""
+        with self.lock:
+            # Another process may have appended since we last looked: catch up first so seq stays in order
+            merged = self._merge_if_changed(profile, apply)
+            lines = []
+            for op, make_data in records:
+                self._seq += 1
+                record = {"seq": self._seq, "op": op, "username": profile.username, "data": make_data()}
+                lines.append(self.codec.dumps(record) + b"\n")
+            with open(self.journal_path, "ab") as f:
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending += len(records)
+            if self._pending >= self.compact_every:
+                self.compact(profile)
+            self._seen = self._file_state()
+            return merged
+
+    def append_goal(self, profile: UserProfile, goal: Goal) -> bool:
+        return self._append(profile, "goal", goal.to_dict, lambda p: p.goals.append(goal))
+
+    def append_workout(self, profile: UserProfile, session: WorkoutSession) -> bool:
+        return self._append(profile, "workout", partial(self._session_to_dict, session), partial(_put_workout, session))
+
+    def append_workouts(self, profile: UserProfile, sessions: List[WorkoutSession]) -> bool:
+        records = [("workout", partial(self._session_to_dict, session)) for session in sessions]
+        return self._append_many(profile, records, partial(_put_workouts, sessions))
+
+    def update_workout(self, profile: UserProfile, session: WorkoutSession) -> bool:
+        self._forget_metrics(session.id)
+        return self._append(profile, "update_workout", partial(self._session_to_dict, session), partial(_put_workout, session))
+
+    def update_workouts(self, profile: UserProfile, sessions: List[WorkoutSession]) -> bool:
+        for session in sessions:
+            self._forget_metrics(session.id)
+        records = [("update_workout", partial(self._session_to_dict, session)) for session in sessions]
+        return self._append_many(profile, records, partial(_put_workouts, sessions))
+
+    def delete_workout(self, profile: UserProfile, session_id: str) -> bool:
+        merged = self._append(profile, "delete_workout", lambda: {"id": session_id}, partial(_remove_workout, session_id))
+        self._remove_metrics(session_id)
+        return merged
+
+    def save(self, profile: UserProfile):
+        self.compact(profile)
+
+    def compact(self, profile: UserProfile):
+        """Fold the journal into a fresh snapshot."""
+        with self.lock:
+            data = self._profile_to_dict(profile)
+            data["journal_seq"] = self._seq
+            self._write_json(self.path, data)
+            # The snapshot now covers every journal record, so it is safe to drop them.
+            # If we crash before this, load() skips records with seq <= journal_seq.
+            with open(self.journal_path, "w") as f:
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending = 0
+            self._seen = self._file_state()
+
+
+STORAGE_KINDS = ("json", "journal", "sqlite")
+
+
+def open_storage(kind: str, path: str):
+    """A storage backend by name: "json", "journal" or "sqlite", for the command-line tools."""
+    if kind == "journal":
+        return JournalStorage(path)
+    if kind == "sqlite":
+        # Imported here, sqlite_storage imports this module
+        from .sqlite_storage import SQLiteStorage
+        return SQLiteStorage(path)
+    if kind == "json":
+        return JsonStorage(path)
+    raise ValueError(f"Unknown storage: {kind}")
+
+
+def _put_workout(session: WorkoutSession, profile: UserProfile):
+    """Add `session` to `profile`, replacing the stored workout with the same id."""
+    for idx, workout in enumerate(profile.workouts):
+        if workout.id == session.id:
+            profile.workouts[idx] = session
+            return
+    profile.workouts.append(session)
+
+
+def _put_workouts(sessions: List[WorkoutSession], profile: UserProfile):
+    for session in sessions:
+        _put_workout(session, profile)
+
+
+def _remove_workout(session_id: str, profile: UserProfile):
+    profile.workouts[:] = [w for w in profile.workouts if w.id != session_id]
+
+
+def _unread_from(metrics, path: str) -> bool:
+    """True for lazy samples that haven't been read from `path` yet, i.e. that file holds exactly them."""
+    return isinstance(metrics, LazyMetrics) and not metrics.loaded and metrics.source == path
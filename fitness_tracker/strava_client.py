@@ -1,21 +1,56 @@
+import tempfile
+from typing import Optional
 import requests
+from requests.adapters import HTTPAdapter
+from .formats import write_session
 from .models import WorkoutSession
-from .config import STRAVA_ACCESS_TOKEN
+from . import config, instrumentation
 
 class StravaClient:
     BASE_URL = "https://www.strava.com/api/v3"
 
-    def __init__(self):
-        self.token = STRAVA_ACCESS_TOKEN
+    def __init__(self, token: Optional[str] = None, base_url: str = BASE_URL, pool_size: int = 10):
+        # config looks the token up (in the keyring) on first use and caches it
+        self.token = token or config.STRAVA_ACCESS_TOKEN
+        self.base_url = base_url.rstrip("/")
+        # One pooled session, so uploads reuse keep-alive connections instead of a new TLS handshake each
+        self.http = requests.Session()
+        self.http.headers["Authorization"] = f"Bearer {self.token}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
 
     def upload_activity(self, session: WorkoutSession) -> dict:
         """
         Uploads a workout session to Strava.
         Returns the API response or raises an exception.
         """
-        url = f"{self.BASE_URL}/activities"
-        headers = {"Authorization": f"Bearer {self.token}"}
-        
+        response = self.post_activity(session)
+        response.raise_for_status()
+        return response.json()
+
+    @instrumentation.timed("strava.post_activity")
+    def post_activity(self, session: WorkoutSession) -> requests.Response:
+        """Send the create-activity request and return the response as is, see sync.py."""
+        return self.http.post(f"{self.base_url}/activities", data=self.activity_payload(session), timeout=30)
+
+    @instrumentation.timed("strava.post_upload")
+    def post_upload(self, session: WorkoutSession, data_type: str = "fit") -> requests.Response:
+        """
+        Upload the session as a file with its full sample streams (heart rate,
+        cadence, GPS, ...) instead of just the summary; see formats.py.
+        """
+        with tempfile.TemporaryFile() as f:
+            write_session(session, f, data_type)
+            f.seek(0)
+            return self.http.post(
+                f"{self.base_url}/uploads",
+                data={"data_type": data_type, "name": f"{session.activity_type} Session", "external_id": session.id},
+                files={"file": (f"{session.id}.{data_type}", f)},
+                timeout=60
+            )
+
+    def activity_payload(self, session: WorkoutSession) -> dict:
         # Calculate duration in seconds
         duration = 0
         if session.end_time:
@@ -38,7 +73,4 @@ class StravaClient:
             "trainer": 0,
             "commute": 0
         }
-        
-        response = requests.post(url, headers=headers, data=payload)
-        response.raise_for_status()
-        return response.json()
+        return payload
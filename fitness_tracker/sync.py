@@ -0,0 +1,258 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional
+from .manager import DATA_FILE
+from .models import WorkoutSession
+from . import instrumentation
+
+SYNC_STATE_FILE = DATA_FILE + ".sync.json"
+
+# Strava's default per-application limits: requests per 15 minutes, requests per day
+DEFAULT_LIMITS = (200, 2000)
+WINDOW_SECONDS = 15 * 60
+
+# Outcome of one upload
+UPLOADED = "uploaded"
+SKIPPED = "skipped"    # already uploaded by an earlier sync
+FAILED = "failed"
+DEFERRED = "deferred"  # daily limit reached, left for the next sync
+
+
+class RateLimitExceeded(Exception):
+    """The daily request limit is used up."""
+
+
+class RateLimiter:
+    """
+    Client-side throttle for the Strava API.
+
+    A token bucket refilled at the 15-minute limit's average rate keeps a
+    big sync from burning the whole window in its first seconds. After each
+    response `update` reads Strava's `X-RateLimit-Limit`/`X-RateLimit-Usage`
+    headers ("<15 min>,<daily>"): when the 15-minute window is used up,
+    `acquire` waits until the next quarter hour (when Strava resets it), and
+    when the daily limit is used up it raises RateLimitExceeded until
+    midnight UTC.
+    """
+
+    def __init__(self, limits=DEFAULT_LIMITS, burst: int = 10,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.short_limit, self.daily_limit = limits
+        self.short_usage = 0
+        self.daily_usage = 0
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._usage_day = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request may be sent."""
+        while True:
+            with self._lock:
+                now = self.clock()
+                if self._daily_exhausted(now):
+                    raise RateLimitExceeded(f"Daily limit of {self.daily_limit} requests reached")
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.short_limit / WINDOW_SECONDS)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) * WINDOW_SECONDS / self.short_limit
+            self.sleep(wait)
+
+    def update(self, headers):
+        """Take the limits and current usage from a Strava response's headers."""
+        try:
+            short_limit, daily_limit = (int(v) for v in headers["X-RateLimit-Limit"].split(","))
+            short_usage, daily_usage = (int(v) for v in headers["X-RateLimit-Usage"].split(","))
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            now = self.clock()
+            self.short_limit, self.daily_limit = short_limit, daily_limit
+            self.short_usage, self.daily_usage = short_usage, daily_usage
+            self._usage_day = _utc_day(now)
+            if short_usage >= short_limit:
+                self._block(now, None)
+
+    def block(self, seconds: Optional[float] = None):
+        """Hold all requests for `seconds`, or until the next 15-minute window."""
+        with self._lock:
+            self._block(self.clock(), seconds)
+
+    def _block(self, now: float, seconds: Optional[float]):
+        if seconds is None:
+            seconds = WINDOW_SECONDS - now % WINDOW_SECONDS
+        self._blocked_until = max(self._blocked_until, now + seconds)
+
+    def _daily_exhausted(self, now: float) -> bool:
+        return self._usage_day == _utc_day(now) and self.daily_usage >= self.daily_limit
+
+
+def _utc_day(timestamp: float):
+    return datetime.fromtimestamp(timestamp, timezone.utc).date()
+
+
+class SyncState:
+    """Upload status per workout id, persisted as JSON so uploaded sessions are skipped next time."""
+
+    def __init__(self, path: str = SYNC_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print("Error loading sync state, starting fresh.")
+
+    def get(self, session_id: str) -> Optional[dict]:
+        return self.entries.get(session_id)
+
+    def is_uploaded(self, session_id: str) -> bool:
+        entry = self.entries.get(session_id)
+        return entry is not None and entry["status"] == UPLOADED
+
+    def mark_uploaded(self, session_id: str, remote_id=None):
+        self._set(session_id, {"status": UPLOADED, "remote_id": remote_id})
+
+    def mark_failed(self, session_id: str, error: str, attempts: int):
+        self._set(session_id, {"status": FAILED, "error": error, "attempts": attempts})
+
+    def _set(self, session_id: str, entry: dict):
+        entry["updated_at"] = datetime.now().isoformat()
+        with self._lock:
+            self.entries[session_id] = entry
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+
+
+class SyncEngine:
+    """
+    Uploads workouts to Strava from a pool of worker threads.
+
+    All workers share the client's pooled `requests.Session` and one
+    RateLimiter. Network errors and 5xx responses are retried with
+    exponential backoff (with jitter), 429s wait as long as Strava asks;
+    other 4xx responses fail straight away. Every outcome is recorded in
+    `state`, and sessions it already has as uploaded are skipped. With
+    `file_format` ("fit", "tcx" or "gpx") sessions are sent as files with
+    all their samples rather than as summary-only activities.
+    """
+
+    def __init__(self, client=None, state: Optional[SyncState] = None,
+                 max_workers: int = 4, limiter: Optional[RateLimiter] = None, max_retries: int = 5,
+                 backoff: float = 1.0, max_backoff: float = 60.0, sleep: Callable[[float], None] = time.sleep,
+                 file_format: Optional[str] = None):
+        if client is None:
+            # Imported here so requests is only loaded once something is uploaded
+            from .strava_client import StravaClient
+            client = StravaClient(pool_size=max_workers)
+        self.client = client
+        self.state = state or SyncState()
+        self.limiter = limiter or RateLimiter(sleep=sleep)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.file_format = file_format
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="strava-sync")
+
+    def submit(self, session: WorkoutSession) -> Future:
+        """Queue one upload; the future's result is one of UPLOADED, SKIPPED, FAILED or DEFERRED."""
+        return self._executor.submit(self.upload, session)
+
+    def sync(self, sessions: Iterable[WorkoutSession],
+             on_progress: Optional[Callable[[WorkoutSession, str], None]] = None) -> Dict[str, int]:
+        """Upload every session not uploaded yet and wait; returns the number of each outcome."""
+        futures = [(session, self.submit(session)) for session in sessions]
+        report = {UPLOADED: 0, SKIPPED: 0, FAILED: 0, DEFERRED: 0}
+        for session, future in futures:
+            outcome = future.result()
+            report[outcome] += 1
+            if on_progress:
+                on_progress(session, outcome)
+        return report
+
+    def sync_in_background(self, sessions: Iterable[WorkoutSession],
+                           on_done: Optional[Callable[[Dict[str, int]], None]] = None) -> threading.Thread:
+        """`sync` on a separate thread, for UI event handlers."""
+        def run():
+            report = self.sync(sessions)
+            if on_done:
+                on_done(report)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def upload(self, session: WorkoutSession) -> str:
+        # Not imported at module level: the views import this module at startup
+        import requests
+        if self.state.is_uploaded(session.id):
+            return SKIPPED
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                instrumentation.count("strava.retries")
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                self.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                self.limiter.acquire()
+            except RateLimitExceeded:
+                return DEFERRED
+
+            try:
+                if self.file_format:
+                    response = self.client.post_upload(session, self.file_format)
+                else:
+                    response = self.client.post_activity(session)
+            except requests.RequestException as ex:
+                error = str(ex)
+                continue
+            except ValueError as ex:
+                # The session can't be written in file_format, e.g. GPX without GPS
+                self.state.mark_failed(session.id, str(ex), attempt + 1)
+                return FAILED
+
+            self.limiter.update(response.headers)
+            if response.ok:
+                # The activity exists now: an unreadable body must not lead to a retry, i.e. a duplicate
+                try:
+                    remote_id = response.json().get("id")
+                except (ValueError, AttributeError):
+                    remote_id = None
+                self.state.mark_uploaded(session.id, remote_id)
+                return UPLOADED
+
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code == 429:
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    self.limiter.block(float(retry_after))
+            elif response.status_code < 500:
+                # Bad request, expired token etc.; retrying won't help
+                self.state.mark_failed(session.id, error, attempt + 1)
+                return FAILED
+
+        self.state.mark_failed(session.id, error, self.max_retries + 1)
+        return FAILED
+
+    def close(self):
+        self._executor.shutdown(wait=True)
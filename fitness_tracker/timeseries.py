@@ -0,0 +1,250 @@
+"""
+Level-of-detail pyramids for workout time series.
+
+A session's raw samples can run to hundreds of thousands of points, far
+more than a chart can show. `build_lod` summarizes every sample channel
+into buckets of 1 s, 10 s, 1 min and 10 min, each holding the min, max and
+mean of the samples in it, and can add an LTTB-downsampled copy of each
+channel. The levels are typed columns in the session's `lod` (named
+`lod<seconds>:<channel>:<stat>`), kept apart from the samples in
+`metrics`, so code going over the samples never sees them and storage
+backends can keep them compact (one encoded row per workout in SQLite).
+`series` answers "N points for [t0, t1]" from the coarsest level that
+still has enough detail, and `compact` drops the raw samples and the fine
+levels of old sessions according to a `RetentionPolicy`.
+
+    python -m fitness_tracker.timeseries fitness_data.json --raw-days 90
+    python -m fitness_tracker.timeseries fitness_data.db --storage sqlite
+"""
+import argparse
+import array
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .columns import MetricColumns, timestamps
+from .models import WorkoutSession
+
+# Bucket sizes in seconds, finest first
+LOD_LEVELS = (1, 10, 60, 600)
+RAW = 0        # "level" of the raw samples in `series` results
+LTTB = "lttb"  # ... and of the stored LTTB copy
+
+_LOD_COLUMN = re.compile(r"^(lod\d+|lttb):")
+
+
+def is_lod_column(name: str) -> bool:
+    # Data written before pyramids had their own field kept them in `metrics`
+    return _LOD_COLUMN.match(name) is not None
+
+
+def _column(level: int, *parts: str) -> str:
+    return ":".join((f"lod{level}",) + parts)
+
+
+def sample_channels(session: WorkoutSession) -> List[str]:
+    """Raw sample columns that can be summarized (everything but timestamps and old LOD columns)."""
+    return [name for name in session.metrics if name != "timestamp" and not is_lod_column(name)]
+
+
+def levels(session: WorkoutSession) -> List[int]:
+    """Bucket sizes stored for `session`, finest first."""
+    return sorted(int(name[3:-2]) for name in session.lod if name.startswith("lod") and name.endswith(":t"))
+
+
+def _store(metrics, name: str, values: np.ndarray):
+    column = array.array("d")
+    column.frombytes(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    metrics[name] = column
+
+
+def _reduce(t: np.ndarray, count: np.ndarray, stats: Dict[str, Tuple], size: int):
+    """Merge consecutive points (sorted by t) into `size`-second buckets; stats are (min, max, sum) arrays."""
+    keys = np.floor(t / size)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    reduced = {
+        name: (np.minimum.reduceat(lo, starts), np.maximum.reduceat(hi, starts), np.add.reduceat(total, starts))
+        for name, (lo, hi, total) in stats.items()
+    }
+    return keys[starts] * size, np.add.reduceat(count, starts), reduced
+
+
+def build_lod(session: WorkoutSession, channels: Optional[Iterable[str]] = None,
+              sizes: Iterable[int] = LOD_LEVELS, lttb_points: Optional[int] = None):
+    """
+    (Re)build the pyramid for `session` in place, O(samples).
+
+    Each level is reduced from the previous one rather than from the raw
+    samples, and only stored if it has at most half the points of the
+    previous one (a 1 Hz recording gets no 1 s level). Channels shorter
+    than the longest one (e.g. a GPS fix that started late) are skipped.
+    With `lttb_points`, an LTTB-downsampled copy of each channel is stored
+    too.
+    """
+    metrics = session.metrics
+    if channels is None:
+        channels = sample_channels(session)
+    channels = [name for name in channels if name in metrics and len(metrics[name])]
+    if not channels:
+        return
+    n = max(len(metrics[name]) for name in channels)
+    channels = [name for name in channels if len(metrics[name]) == n]
+    lod = session.lod = MetricColumns()
+
+    raw_t = np.asarray(timestamps(session.metrics, n), dtype=np.float64)
+    raw = {name: np.asarray(metrics[name], dtype=np.float64) for name in channels}
+    t, count = raw_t, np.ones(n)
+    stats = {name: (values, values, values) for name, values in raw.items()}
+    stored = n
+    for size in sorted(sizes):
+        t, count, stats = _reduce(t, count, stats, size)
+        if 2 * len(t) > stored:
+            continue
+        stored = len(t)
+        _store(lod, _column(size, "t"), t)
+        _store(lod, _column(size, "count"), count)
+        for name, (lo, hi, total) in stats.items():
+            _store(lod, _column(size, name, "min"), lo)
+            _store(lod, _column(size, name, "max"), hi)
+            _store(lod, _column(size, name, "mean"), total / count)
+
+    if lttb_points:
+        for name, values in raw.items():
+            idx = lttb(raw_t, values, lttb_points)
+            _store(lod, f"lttb:{name}:t", raw_t[idx])
+            _store(lod, f"lttb:{name}:value", values[idx])
+
+
+def lttb(t: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices of the `points` samples picked by Largest-Triangle-Three-Buckets,
+    which keeps the visual shape (peaks included) of a line far better than
+    taking every k-th sample. First and last samples are always kept.
+    """
+    n = len(values)
+    if points >= n or points < 3:
+        return np.arange(n) if points >= n else np.array([0, n - 1][:max(points, 0)], dtype=np.int64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    picked = np.empty(points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket is the triangle's third corner
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        nxt_hi = max(nxt_hi, nxt_lo + 1)
+        avg_t = t[nxt_lo:nxt_hi].mean()
+        avg_v = values[nxt_lo:nxt_hi].mean()
+        area = np.abs((t[a] - avg_t) * (values[lo:hi] - values[a]) - (t[a] - t[lo:hi]) * (avg_v - values[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def series(session: WorkoutSession, channel: str, start: Optional[float] = None, end: Optional[float] = None,
+           points: int = 500) -> Dict:
+    """
+    At most `points` points of `channel` with start <= t <= end (seconds into
+    the session), for charting.
+
+    Uses the finest stored level (raw samples first) that fits in `points`;
+    if even the coarsest doesn't, it is reduced with LTTB. Returns
+    {"level": bucket seconds (RAW for samples), "t", "min", "max", "mean"}
+    as lists; for raw samples (and LTTB points) min, max and mean are the same.
+    """
+    metrics, lod = session.metrics, session.lod
+    whole = start is None and end is None
+    start = float("-inf") if start is None else start
+    end = float("inf") if end is None else end
+
+    candidates = []
+    if channel in metrics and len(metrics[channel]):
+        values = metrics[channel]
+        candidates.append((RAW, timestamps(session.metrics, len(values)), values, values, values))
+    if whole and f"lttb:{channel}:t" in lod:
+        # Keeps the line's shape better than bucket means
+        values = lod[f"lttb:{channel}:value"]
+        candidates.append((LTTB, lod[f"lttb:{channel}:t"], values, values, values))
+    for size in levels(session):
+        if _column(size, channel, "mean") in lod:
+            candidates.append((size, lod[_column(size, "t")], lod[_column(size, channel, "min")],
+                               lod[_column(size, channel, "max")], lod[_column(size, channel, "mean")]))
+    if not candidates:
+        return {"level": None, "t": [], "min": [], "max": [], "mean": []}
+
+    for level, t, lo, hi, mean in candidates:
+        i, j = bisect_left(t, start), bisect_right(t, end)
+        if j - i <= points:
+            break
+    result = {"level": level, "t": list(t[i:j]), "min": list(lo[i:j]), "max": list(hi[i:j]), "mean": list(mean[i:j])}
+    if j - i > points:
+        idx = lttb(np.asarray(result["t"]), np.asarray(result["mean"]), points)
+        result = {key: value if key == "level" else [value[k] for k in idx] for key, value in result.items()}
+    return result
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    How long each resolution is kept, by session age in days.
+
+    Raw samples are dropped after `raw_days` (None keeps them forever);
+    each level in `level_days` is dropped after its number of days. Levels
+    not listed (by default 1 min and 10 min) and LTTB copies are kept
+    forever, so old sessions can still be charted.
+    """
+    raw_days: Optional[int] = 90
+    level_days: Dict[int, int] = field(default_factory=lambda: {1: 180, 10: 365})
+
+    def dropped(self, age: timedelta) -> Optional[int]:
+        """None if everything is kept at this age, else the largest bucket size dropped (RAW for just the samples)."""
+        if self.raw_days is None or age <= timedelta(days=self.raw_days):
+            return None
+        return max((size for size, days in self.level_days.items() if age > timedelta(days=days)), default=RAW)
+
+
+def compact(session: WorkoutSession, policy: RetentionPolicy, now: Optional[datetime] = None) -> bool:
+    """
+    Drop what `policy` no longer keeps for `session`; False if nothing changed.
+    Raw samples are only dropped when a pyramid level is left to chart from.
+    """
+    now = now or datetime.now()
+    dropped = policy.dropped(now - session.start_time)
+    if dropped is None:
+        return False
+    if not levels(session) and sample_channels(session):
+        # Sessions saved before pyramids existed get one before their samples go
+        build_lod(session)
+    if not any(size > dropped for size in levels(session)):
+        # Too short for a level coarse enough to keep (e.g. a few samples): the samples are all there is
+        return False
+    doomed_lod = [name for name in session.lod if name.startswith("lod") and int(name[3:name.index(":")]) <= dropped]
+    for name in doomed_lod:
+        del session.lod[name]
+    changed = bool(doomed_lod or session.metrics)
+    session.metrics = MetricColumns()
+    return changed
+
+
+def main(argv=None):
+    from .manager import FitnessManager
+    from .storage import STORAGE_KINDS, open_storage
+    from .users import open_profile
+
+    parser = argparse.ArgumentParser(description="Apply the time-series retention policy to a data file.")
+    parser.add_argument("path", nargs="?", help="data file (default: the FITNESS_USER profile, else fitness_data.json)")
+    parser.add_argument("--storage", choices=STORAGE_KINDS, default="json", help="backend of `path`")
+    parser.add_argument("--raw-days", type=int, default=RetentionPolicy.raw_days)
+    args = parser.parse_args(argv)
+
+    # The profile's own backend, so e.g. a journal is replayed rather than overwritten
+    manager = FitnessManager(storage=open_storage(args.storage, args.path)) if args.path else open_profile()
+    compacted = manager.apply_retention(RetentionPolicy(raw_days=args.raw_days))
+    print(f"Compacted {compacted} of {len(manager.profile.workouts)} workouts")
+    manager.close()
+
+
+if __name__ == "__main__":
+    main()
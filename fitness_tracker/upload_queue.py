@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from .manager import DATA_FILE
+from .models import WorkoutSession
+from .sync import SYNC_STATE_FILE, SyncEngine, SyncState, UPLOADED, SKIPPED, FAILED, DEFERRED
+
+UPLOAD_QUEUE_FILE = DATA_FILE + ".outbox"
+
+# Reported to on_result when a failed upload has been rescheduled
+RETRYING = "retrying"
+
+
+@dataclass
+class QueueEntry:
+    session_id: str
+    enqueued_at: float
+    attempts: int = 0
+    next_attempt: float = 0.0
+
+
+class UploadQueue:
+    """
+    Durable outbox of workouts waiting to be uploaded to Strava.
+
+    Every enqueue, reschedule and completion is appended to `path` as an
+    fsync'd JSON line (like `JournalStorage`), so pending uploads survive
+    crashes and restarts and are picked up again by the next `start()`.
+    Once `compact_every` finished records have piled up the file is
+    rewritten with just the pending entries.
+
+    A background thread hands due entries to a SyncEngine, at most
+    `concurrency` at a time. Failed uploads are retried after
+    `retry_delay * 2 ** (attempts - 1)` seconds (capped at
+    `max_retry_delay`) and dropped after `max_attempts`; uploads deferred by
+    Strava's daily limit wait `defer_delay` without using up an attempt.
+    Only session ids are queued, `resolve` (usually
+    `FitnessManager.get_workout`) looks the session up at upload time, so
+    each profile needs its own `path` and sync state (`state_path`), see
+    users.open_upload_queue.
+    """
+
+    def __init__(self, resolve: Callable[[str], Optional[WorkoutSession]], path: str = UPLOAD_QUEUE_FILE,
+                 engine: Optional[SyncEngine] = None, concurrency: int = 2, retry_delay: float = 30.0,
+                 max_retry_delay: float = 3600.0, defer_delay: float = 3600.0, max_attempts: int = 10,
+                 compact_every: int = 100, on_result: Optional[Callable[[WorkoutSession, str], None]] = None,
+                 state_path: str = SYNC_STATE_FILE):
+        self.resolve = resolve
+        self.path = path
+        self.state_path = state_path
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.defer_delay = defer_delay
+        self.max_attempts = max_attempts
+        self.compact_every = compact_every
+        self.on_result = on_result
+
+        self.entries: Dict[str, QueueEntry] = {}  # in enqueue order
+        self.in_flight = set()
+        self.uploaded = 0
+        self.retries = 0
+        self.dropped = 0
+        self._latencies = deque(maxlen=100)  # enqueue-to-upload seconds of recent uploads
+        self._records = 0                     # lines in the file
+        self._engine = engine
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+
+    @property
+    def engine(self) -> SyncEngine:
+        # Created on first use so opening the app doesn't build a Strava client
+        if self._engine is None:
+            # FIT uploads carry every sample, not just the summary
+            self._engine = SyncEngine(state=SyncState(self.state_path), max_workers=self.concurrency, max_retries=2,
+                                      file_format="fit")
+        return self._engine
+
+    @property
+    def depth(self) -> int:
+        return len(self.entries)
+
+    def enqueue(self, session: WorkoutSession) -> bool:
+        """Queue a session for upload; False if it is already queued."""
+        with self._cond:
+            if session.id in self.entries:
+                return False
+            entry = QueueEntry(session.id, time.time())
+            self._write({"op": "enqueue", "id": entry.session_id, "at": entry.enqueued_at})
+            self.entries[entry.session_id] = entry
+            self._cond.notify()
+        return True
+
+    def start(self):
+        """Start draining in the background."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the worker; anything still queued stays on disk for the next start()."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the queue is empty; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.entries:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def metrics(self) -> Dict[str, float]:
+        """Queue depth, age of the oldest pending upload and recent enqueue-to-upload latency, in seconds."""
+        with self._cond:
+            now = time.time()
+            latencies = sorted(self._latencies)
+            oldest = min((e.enqueued_at for e in self.entries.values()), default=now)
+            return {
+                "depth": len(self.entries),
+                "in_flight": len(self.in_flight),
+                "oldest_pending_seconds": now - oldest,
+                "uploaded": self.uploaded,
+                "retries": self.retries,
+                "dropped": self.dropped,
+                "latency_avg_seconds": sum(latencies) / len(latencies) if latencies else 0.0,
+                "latency_p95_seconds": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                "latency_max_seconds": latencies[-1] if latencies else 0.0,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._take_due()
+                if batch is None:
+                    return
+            for entry in batch:
+                self._dispatch(entry)
+
+    def _take_due(self) -> Optional[List[QueueEntry]]:
+        """Wait for entries that are due and a free slot; None once stopped."""
+        while self._running:
+            now = time.time()
+            waiting = [e for e in self.entries.values() if e.session_id not in self.in_flight]
+            free = self.concurrency - len(self.in_flight)
+            due = [e for e in waiting if e.next_attempt <= now]
+            if due and free > 0:
+                batch = due[:free]
+                self.in_flight.update(e.session_id for e in batch)
+                return batch
+            timeout = None
+            if waiting and free > 0:
+                timeout = min(e.next_attempt for e in waiting) - now
+            self._cond.wait(timeout)
+        return None
+
+    def _dispatch(self, entry: QueueEntry):
+        session = self.resolve(entry.session_id)
+        if session is None:
+            # Deleted since it was queued
+            self._finished(entry, None, SKIPPED)
+            return
+        try:
+            future = self.engine.submit(session)
+        except Exception:
+            self._finished(entry, session, FAILED)
+            return
+        future.add_done_callback(lambda f: self._finished(entry, session, FAILED if f.exception() else f.result()))
+
+    def _finished(self, entry: QueueEntry, session: Optional[WorkoutSession], outcome: str):
+        with self._cond:
+            self.in_flight.discard(entry.session_id)
+            now = time.time()
+            if outcome in (UPLOADED, SKIPPED):
+                if outcome == UPLOADED:
+                    self.uploaded += 1
+                    self._latencies.append(now - entry.enqueued_at)
+                self._done(entry)
+            elif outcome == FAILED and entry.attempts + 1 >= self.max_attempts:
+                self.dropped += 1
+                self._done(entry)
+            else:
+                if outcome == DEFERRED:
+                    entry.next_attempt = now + self.defer_delay
+                else:
+                    entry.attempts += 1
+                    entry.next_attempt = now + min(self.max_retry_delay, self.retry_delay * 2 ** (entry.attempts - 1))
+                    self.retries += 1
+                    outcome = RETRYING
+                self._write({"op": "retry", "id": entry.session_id, "attempts": entry.attempts, "next": entry.next_attempt})
+            self._cond.notify_all()
+        if self.on_result and session is not None:
+            self.on_result(session, outcome)
+
+    def _done(self, entry: QueueEntry):
+        del self.entries[entry.session_id]
+        self._write({"op": "done", "id": entry.session_id})
+        if self._records - len(self.entries) >= self.compact_every:
+            self._compact()
+
+    def _write(self, record: dict):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._records += 1
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for e in self.entries.values():
+                record = {"op": "enqueue", "id": e.session_id, "at": e.enqueued_at,
+                          "attempts": e.attempts, "next": e.next_attempt}
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._records = len(self.entries)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        good_offset = 0
+        torn = False
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                if record is None or not line.endswith(b"\n"):
+                    # Torn final line from a crash mid-append
+                    torn = True
+                    break
+                good_offset += len(line)
+                self._records += 1
+                session_id = record["id"]
+                if record["op"] == "enqueue":
+                    self.entries[session_id] = QueueEntry(
+                        session_id, record["at"], record.get("attempts", 0), record.get("next", 0.0))
+                elif record["op"] == "retry" and session_id in self.entries:
+                    self.entries[session_id].attempts = record["attempts"]
+                    self.entries[session_id].next_attempt = record["next"]
+                elif record["op"] == "done":
+                    self.entries.pop(session_id, None)
+        if torn:
+            os.truncate(self.path, good_offset)
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List
+from . import config
+from .manager import DATA_FILE, FitnessManager
+from .storage import JournalStorage, JsonStorage
+
+USERS_DIR = "users"
+REGISTRY_FILE = "registry.json"
+
+
+def journal_storage(directory: str):
+    """Default per-user backend: journaled JSON with samples loaded on demand."""
+    return JournalStorage(os.path.join(directory, DATA_FILE), split_metrics=True, lazy=True)
+
+
+def sqlite_storage(directory: str):
+    from .sqlite_storage import SQLiteStorage
+    return SQLiteStorage(os.path.join(directory, "fitness_data.db"))
+
+
+def user_dir_name(username: str) -> str:
+    """Filesystem-safe, collision-free directory name for a username."""
+    slug = re.sub(r"[^A-Za-z0-9_-]", "_", username)[:40] or "user"
+    return f"{slug}-{hashlib.sha1(username.encode('utf-8')).hexdigest()[:8]}"
+
+
+def open_profile(username: str = "", root: str = USERS_DIR) -> FitnessManager:
+    """
+    The manager the front ends work on: `username` (default `config.USERNAME`)
+    opened through a registry in `root`, or the single-user data file when
+    no user is set.
+    """
+    username = username or config.USERNAME
+    if not username:
+        return FitnessManager()
+    return ProfileRegistry(root).open(username)
+
+
+def open_upload_queue(manager: FitnessManager, username: str = "", root: str = USERS_DIR, **kwargs):
+    """
+    The Strava outbox for `manager` as opened by `open_profile(username,
+    root)`: its queue and sync state files sit next to that user's data, so
+    users never see (and drop) each other's queued workouts.
+    """
+    # Imported here so the CLI doesn't load the sync engine at startup
+    from .sync import SYNC_STATE_FILE
+    from .upload_queue import UPLOAD_QUEUE_FILE, UploadQueue
+    username = username or config.USERNAME
+    if username:
+        directory = ProfileRegistry(root).user_dir(username)
+        kwargs.setdefault("path", os.path.join(directory, UPLOAD_QUEUE_FILE))
+        kwargs.setdefault("state_path", os.path.join(directory, SYNC_STATE_FILE))
+    return UploadQueue(manager.get_workout, **kwargs)
+
+
+class ProfileRegistry:
+    """
+    The users known on this host and where each one's data lives.
+
+    Every user gets a directory under `root` holding their own storage files
+    (built by `storage_factory(directory)`), so profiles never share a data
+    file. The registry itself is a small JSON file in `root`, rewritten
+    atomically when a user is added or removed.
+    """
+
+    def __init__(self, root: str = USERS_DIR, storage_factory: Callable[[str], object] = journal_storage):
+        self.root = root
+        self.storage_factory = storage_factory
+        self.path = os.path.join(root, REGISTRY_FILE)
+        self._lock = threading.Lock()
+        self.users: Dict[str, dict] = {}
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.users = json.load(f)
+
+    def usernames(self) -> List[str]:
+        return sorted(self.users)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self.users
+
+    def register(self, username: str) -> dict:
+        """Add a user (no-op if they already exist) and return their entry."""
+        with self._lock:
+            if username not in self.users:
+                entry = {"dir": user_dir_name(username), "created_at": datetime.now().isoformat()}
+                os.makedirs(os.path.join(self.root, entry["dir"]), exist_ok=True)
+                self.users[username] = entry
+                self._save()
+            return self.users[username]
+
+    def remove(self, username: str):
+        """Forget a user; their directory is left on disk."""
+        with self._lock:
+            if self.users.pop(username, None) is not None:
+                self._save()
+
+    def user_dir(self, username: str) -> str:
+        return os.path.join(self.root, self.register(username)["dir"])
+
+    def storage_for(self, username: str):
+        return self.storage_factory(self.user_dir(username))
+
+    def open(self, username: str) -> FitnessManager:
+        """A manager for `username` backed by their own storage."""
+        return FitnessManager(username=username, storage=self.storage_for(username))
+
+    def import_legacy(self, username: str, path: str = DATA_FILE) -> FitnessManager:
+        """Copy a single-user `fitness_data.json` into `username`'s storage."""
+        profile = JsonStorage(path).load()
+        manager = self.open(username)
+        if profile is not None:
+            profile.username = username
+            manager.profile = profile
+            manager.save_data()
+            manager.load_data()
+        return manager
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.users, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+class ManagerCache:
+    """
+    Loaded FitnessManagers for the most recently used `capacity` users.
+
+    `get` returns the resident manager or loads it from the registry; when
+    the cache is full the least recently used manager is dropped. Every
+    change is already written to storage when it is made, so an evicted user
+    just gets reloaded on their next request.
+
+    Threads that keep using a manager across other requests should take it
+    with `borrow`: a dropped manager is only closed once every borrower has
+    given it back, so eviction can't close a SQLite connection mid-request.
+    """
+
+    def __init__(self, registry: ProfileRegistry, capacity: int = 64):
+        self.registry = registry
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._managers: "OrderedDict[str, FitnessManager]" = OrderedDict()
+        # Borrow counts of lent-out managers, and those dropped while lent out
+        self._borrowers: Dict[FitnessManager, int] = {}
+        self._dropped = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._managers)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._managers
+
+    def get(self, username: str) -> FitnessManager:
+        with self._lock:
+            manager, evicted = self._get_locked(username)
+        self._close(evicted)
+        return manager
+
+    @contextmanager
+    def borrow(self, username: str):
+        """`get` for the length of a `with` block, during which eviction won't close the manager."""
+        with self._lock:
+            manager, evicted = self._get_locked(username)
+            self._borrowers[manager] = self._borrowers.get(manager, 0) + 1
+        self._close(evicted)
+        try:
+            yield manager
+        finally:
+            with self._lock:
+                self._borrowers[manager] -= 1
+                closing = []
+                if not self._borrowers[manager]:
+                    del self._borrowers[manager]
+                    if manager in self._dropped:
+                        self._dropped.discard(manager)
+                        closing.append(manager)
+            self._close(closing)
+
+    def evict(self, username: str):
+        with self._lock:
+            manager = self._managers.pop(username, None)
+            closing = self._release([manager] if manager is not None else [])
+        self._close(closing)
+
+    def clear(self):
+        with self._lock:
+            managers, self._managers = list(self._managers.values()), OrderedDict()
+            closing = self._release(managers)
+        self._close(closing)
+
+    def _get_locked(self, username: str):
+        manager = self._managers.get(username)
+        if manager is not None:
+            self._managers.move_to_end(username)
+            self.hits += 1
+            return manager, []
+        self.misses += 1
+        # Loaded under the lock so two requests for one user can't load it twice
+        manager = self.registry.open(username)
+        self._managers[username] = manager
+        evicted = []
+        while len(self._managers) > self.capacity:
+            evicted.append(self._managers.popitem(last=False)[1])
+            self.evictions += 1
+        return manager, self._release(evicted)
+
+    def _release(self, managers: List[FitnessManager]) -> List[FitnessManager]:
+        """The dropped `managers` nobody has borrowed; the rest close when given back."""
+        closing = []
+        for manager in managers:
+            if manager in self._borrowers:
+                self._dropped.add(manager)
+            else:
+                closing.append(manager)
+        return closing
+
+    @staticmethod
+    def _close(managers: List[FitnessManager]):
+        for manager in managers:
+            manager.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "resident": len(self._managers),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
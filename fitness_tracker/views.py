@@ -1,9 +1,21 @@
 import flet as ft
-from datetime import datetime
-import time
-import threading
+from datetime import date
 from .manager import FitnessManager
-from .models import Goal, GoalType, GoalPeriod, WorkoutSession
+from .models import Goal, GoalType, GoalPeriod
+from .recorder import WorkoutRecorder
+from .api import COALESCE
+from .live_stats import format_pace
+from .render import RenderScheduler
+from . import instrumentation
+from .sync import UPLOADED, FAILED, DEFERRED
+from .upload_queue import RETRYING
+from .users import open_upload_queue
+
+# Navigation bar indexes, see app.py
+DASHBOARD, WORKOUT, HISTORY, GOALS = range(4)
+HISTORY_PAGE_SIZE = 20
+# Points per workout chart; series() picks the pyramid level to match
+CHART_POINTS = 300
 
 class Views:
     def __init__(self, page: ft.Page, manager: FitnessManager, api):
@@ -14,9 +26,47 @@ class Views:
         
         # State for workout
         self.workout_running = False
-        self.workout_data = {"heart_rate": 0, "steps": 0, "elapsed": 0}
-        self.workout_metrics = {"heart_rate": [], "steps": []}
-        self.start_time = None
+        self.recorder = None
+        self.subscription = None
+        
+        # Live values are pushed at a capped frame rate instead of once per sample
+        self.renderer = RenderScheduler(page, fps=8)
+        
+        # Built tab views (with the day they were built for), rebuilt only after
+        # the data they show has changed
+        self._views = {}
+        self._dirty = set()
+        self.manager.add_listener(self._on_data_changed)
+        
+        # Strava uploads go through a durable queue drained in the background;
+        # uploads left over from the last run resume right away. Kept with the
+        # profile app.py opened (config.USERNAME), see users.py
+        self.upload_queue = open_upload_queue(self.manager, on_result=self._show_sync_result)
+        self.upload_queue.start()
+
+    def get_view(self, index: int):
+        """The control for a navigation tab, reusing the last one built if it is still current."""
+        # Today's stats and goal progress change at midnight without any data changing
+        day = date.today() if index == DASHBOARD else None
+        if index not in self._views or index in self._dirty or self._views[index][0] != day:
+            builders = {
+                DASHBOARD: self.get_dashboard,
+                WORKOUT: self.get_workout_view,
+                HISTORY: self.get_history_view,
+                GOALS: self.get_goals_view,
+            }
+            with instrumentation.timer(f"views.{builders[index].__name__}"):
+                self._views[index] = (day, builders[index]())
+            self._dirty.discard(index)
+        return self._views[index][1]
+
+    def _update_page(self):
+        with instrumentation.timer("views.page_update"):
+            self.page.update()
+
+    def _on_data_changed(self):
+        # The workout and goal form views don't show stored data
+        self._dirty.update((DASHBOARD, HISTORY))
 
     def get_dashboard(self):
         stats = self.manager.get_today_stats()
@@ -25,7 +75,7 @@ class Views:
         # Progress Cards
         progress_controls = []
         if not goals_status:
-            progress_controls.append(ft.Text("No goals set for today.", color=ft.colors.GREY))
+            progress_controls.append(ft.Text("No goals set.", color=ft.colors.GREY))
         else:
             for item in goals_status:
                 goal = item["goal"]
@@ -77,6 +127,10 @@ class Views:
         self.timer_text = ft.Text("00:00", size=60, weight=ft.FontWeight.BOLD)
         self.hr_text = ft.Text("--", size=40, color=ft.colors.RED)
         self.steps_text = ft.Text("--", size=40, color=ft.colors.ORANGE)
+        self.avg_hr_text = ft.Text("Avg --", color=ft.colors.GREY)
+        self.zone_text = ft.Text("--", size=20, weight=ft.FontWeight.BOLD)
+        self.cadence_text = ft.Text("-- spm", color=ft.colors.GREY)
+        self.pace_text = ft.Text("--", size=20, weight=ft.FontWeight.BOLD)
         
         self.start_btn = ft.ElevatedButton("Start Workout", on_click=self.start_workout, icon=ft.icons.PLAY_ARROW, height=50)
         self.stop_btn = ft.ElevatedButton("Stop Workout", on_click=self.stop_workout, icon=ft.icons.STOP, height=50, disabled=True, color=ft.colors.ERROR)
@@ -96,14 +150,23 @@ class Views:
                 ft.Column([
                     ft.Icon(ft.icons.FAVORITE, color=ft.colors.RED, size=30),
                     self.hr_text,
-                    ft.Text("BPM")
+                    ft.Text("BPM"),
+                    self.avg_hr_text
                 ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
                 ft.Column([
                     ft.Icon(ft.icons.DIRECTIONS_WALK, color=ft.colors.ORANGE, size=30),
                     self.steps_text,
-                    ft.Text("Steps")
+                    ft.Text("Steps"),
+                    self.cadence_text
                 ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
             ], alignment=ft.MainAxisAlignment.SPACE_EVENLY),
+            ft.Container(height=20),
+            ft.Row([
+                ft.Column([ft.Text("HR Zone", color=ft.colors.GREY), self.zone_text],
+                          horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                ft.Column([ft.Text("Pace", color=ft.colors.GREY), self.pace_text],
+                          horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            ], alignment=ft.MainAxisAlignment.SPACE_EVENLY),
             ft.Container(height=40),
             ft.Row([self.start_btn, self.stop_btn], alignment=ft.MainAxisAlignment.CENTER)
         ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
@@ -112,110 +175,190 @@ class Views:
         self.workout_running = True
         self.start_btn.disabled = True
         self.stop_btn.disabled = False
-        self.start_time = datetime.now()
-        self.workout_metrics = {"heart_rate": [], "steps": []}
+        self.recorder = WorkoutRecorder("Running") # Default for now
+        self.recorder.start()
         
-        self.api.add_callback(self._update_workout_ui)
+        # Every sample is recorded straight from the stream, which never drops one;
+        # the display only needs the latest, from a lossy subscription released in stop_workout
+        self.api.add_callback(self.recorder.add_sample)
+        self.subscription = self.api.subscribe(self._update_workout_ui, interval=0.25, policy=COALESCE)
         self.api.start_stream()
-        self.page.update()
+        self._update_page()
 
     def stop_workout(self, e):
-        self.workout_running = False
         self.api.stop_stream()
-        
-        end_time = datetime.now()
+        self.api.remove_callback(self.recorder.add_sample)
+        if self.subscription:
+            self.subscription.unsubscribe(flush=False)
+            self.subscription = None
+        self.workout_running = False
         
         # Save session
-        session = WorkoutSession(
-            activity_type="Running", # Default for now
-            start_time=self.start_time,
-            end_time=end_time,
-            metrics=self.workout_metrics,
-            summary={
-                "total_steps": self.workout_data["steps"],
-                "avg_hr": sum(self.workout_metrics["heart_rate"]) / len(self.workout_metrics["heart_rate"]) if self.workout_metrics["heart_rate"] else 0
-            }
-        )
+        session = self.recorder.finish()
         self.manager.add_workout(session)
         
         self.start_btn.disabled = False
         self.stop_btn.disabled = True
-        self.timer_text.value = "00:00"
-        self.hr_text.value = "--"
-        self.steps_text.value = "--"
+        # Through the renderer so they win over live values still waiting for the next frame
+        self.renderer.set(self.timer_text, value="00:00")
+        self.renderer.set(self.hr_text, value="--")
+        self.renderer.set(self.steps_text, value="--")
+        self.renderer.set(self.avg_hr_text, value="Avg --")
+        self.renderer.set(self.zone_text, value="--")
+        self.renderer.set(self.cadence_text, value="-- spm")
+        self.renderer.set(self.pace_text, value="--")
         
-        self.page.snack_bar = ft.SnackBar(ft.Text("Workout Saved!"))
+        summary = session.summary
+        self.page.snack_bar = ft.SnackBar(ft.Text(
+            f"Workout Saved! {summary['distance_m'] / 1000:.2f} km, avg HR {summary['avg_hr']:.0f}, "
+            f"avg pace {format_pace(summary['avg_pace_seconds_per_km'])}"
+        ))
         self.page.snack_bar.open = True
-        self.page.update()
+        self._update_page()
 
-    def _update_workout_ui(self, data):
+    def _update_workout_ui(self, batch):
         if not self.workout_running:
             return
-            
-        self.workout_data = data
-        self.workout_metrics["heart_rate"].append(data["heart_rate"])
-        self.workout_metrics["steps"].append(data["steps"])
+        
+        # Only the latest sample is shown
+        data = batch[-1]
         
         elapsed = int(data["elapsed_seconds"])
         mins, secs = divmod(elapsed, 60)
         
-        self.timer_text.value = f"{mins:02d}:{secs:02d}"
-        self.hr_text.value = str(data["heart_rate"])
-        self.steps_text.value = str(data["steps"])
-        self.page.update()
+        self.renderer.set(self.timer_text, value=f"{mins:02d}:{secs:02d}")
+        self.renderer.set(self.hr_text, value=str(data["heart_rate"]))
+        self.renderer.set(self.steps_text, value=str(data["steps"]))
+        
+        # Running stats are updated per sample by the recorder; reading them is O(1)
+        live = self.recorder.stats.snapshot()
+        self.renderer.set(self.avg_hr_text, value=f"Avg {live['avg_hr']:.0f}" if live["avg_hr"] is not None else "Avg --")
+        self.renderer.set(self.zone_text, value=live["zone"] or "--")
+        self.renderer.set(self.cadence_text, value=f"{live['cadence']:.0f} spm")
+        self.renderer.set(self.pace_text, value=format_pace(live["pace_seconds_per_km"]))
 
     def get_history_view(self):
-        workouts = self.manager.profile.workouts
-        items = []
+        # Imported here so NumPy is only loaded once the history is opened
+        from .analytics import WorkoutAnalytics
+        items = ft.ListView(expand=True)
+        cursor = None
         
-        from .strava_client import StravaClient
-        strava = StravaClient()
-
         def upload_to_strava(e):
-            session_idx = e.control.data
-            session = workouts[session_idx]
-            
-            try:
-                strava.upload_activity(session)
-                self.page.snack_bar = ft.SnackBar(ft.Text("Successfully uploaded to Strava!"))
-                self.page.snack_bar.open = True
-                self.page.update()
-            except Exception as ex:
-                self.page.snack_bar = ft.SnackBar(ft.Text(f"Upload failed: {str(ex)}"), bgcolor=ft.colors.ERROR)
-                self.page.snack_bar.open = True
-                self.page.update()
-
-        for idx, w in enumerate(reversed(workouts)): # Newest first
-            # Calculate original index because we are reversing
-            original_idx = len(workouts) - 1 - idx
-            
-            duration = (w.end_time - w.start_time).total_seconds() / 60 if w.end_time else 0
-            items.append(
-                ft.ListTile(
-                    leading=ft.Icon(ft.icons.FITNESS_CENTER),
-                    title=ft.Text(f"{w.activity_type} - {w.start_time.strftime('%Y-%m-%d %H:%M')}"),
-                    subtitle=ft.Text(f"Duration: {duration:.1f}m | Steps: {w.summary.get('total_steps', 0)}"),
-                    trailing=ft.IconButton(
-                        icon=ft.icons.CLOUD_UPLOAD, 
-                        tooltip="Upload to Strava",
-                        on_click=upload_to_strava,
-                        data=original_idx
+            session = self.manager.get_workout(e.control.data)
+            self.upload_queue.enqueue(session)
+            self._show_message("Queued for upload to Strava.")
+
+        def sync_all(e):
+            state = self.upload_queue.engine.state
+            queued = sum(
+                self.upload_queue.enqueue(w)
+                for w in self.manager.profile.workouts
+                if not state.is_uploaded(w.id)
+            )
+            self._show_message(f"Queued {queued} workouts for upload to Strava.")
+
+        items.controls.append(ft.ElevatedButton("Sync all to Strava", icon=ft.icons.CLOUD_SYNC, on_click=sync_all))
+        load_more = ft.TextButton("Load more")
+
+        def add_page(e=None):
+            nonlocal cursor
+            workouts, cursor = self.manager.list_workouts(limit=HISTORY_PAGE_SIZE, cursor=cursor)
+            # Only the page being shown is analysed, not the whole history
+            stats = WorkoutAnalytics(workouts).session_stats()
+
+            if load_more in items.controls:
+                items.controls.remove(load_more)
+            for w, s in zip(workouts, stats): # Newest first
+                duration = (w.end_time - w.start_time).total_seconds() / 60 if w.end_time else 0
+                subtitle = f"Duration: {duration:.1f}m | Steps: {w.summary.get('total_steps', 0)}"
+                if s["max_hr"] is not None:
+                    subtitle += f" | Max HR: {s['max_hr']:.0f}"
+                items.controls.append(
+                    ft.ListTile(
+                        leading=ft.Icon(ft.icons.FITNESS_CENTER),
+                        title=ft.Text(f"{w.activity_type} - {w.start_time.strftime('%Y-%m-%d %H:%M')}"),
+                        subtitle=ft.Text(subtitle),
+                        on_click=lambda e, session_id=w.id: self._show_hr_chart(session_id),
+                        trailing=ft.IconButton(
+                            icon=ft.icons.CLOUD_UPLOAD, 
+                            tooltip="Upload to Strava",
+                            on_click=upload_to_strava,
+                            data=w.id
+                        )
                     )
                 )
+            if cursor:
+                items.controls.append(load_more)
+            if e is not None:
+                items.update()
+
+        load_more.on_click = add_page
+        add_page()
+        return items
+
+    def _show_hr_chart(self, session_id):
+        # A few hundred points from the stored pyramid, however long the workout was
+        data = self.manager.get_series(session_id, "heart_rate", points=CHART_POINTS)
+        if not data["t"]:
+            self._show_message("No heart rate samples for this workout.")
+            return
+        minutes = [t / 60 for t in data["t"]]
+        band = [
+            ft.LineChartData(
+                data_points=[ft.LineChartDataPoint(x, y) for x, y in zip(minutes, data[key])],
+                color=ft.colors.with_opacity(0.3, ft.colors.RED),
+                stroke_width=1,
             )
-            
-        return ft.ListView(controls=items, expand=True)
+            for key in ("min", "max")
+        ] if data["level"] not in (0, "lttb") else []
+        chart = ft.LineChart(
+            data_series=band + [ft.LineChartData(
+                data_points=[ft.LineChartDataPoint(x, y) for x, y in zip(minutes, data["mean"])],
+                color=ft.colors.RED,
+                stroke_width=2,
+            )],
+            left_axis=ft.ChartAxis(labels_size=40),
+            bottom_axis=ft.ChartAxis(title=ft.Text("Minutes"), labels_size=30),
+            expand=True,
+        )
+        self.page.dialog = ft.AlertDialog(
+            title=ft.Text("Heart Rate"),
+            content=ft.Container(chart, width=600, height=300),
+        )
+        self.page.dialog.open = True
+        self._update_page()
+
+    def _show_message(self, text, error=False):
+        self.page.snack_bar = ft.SnackBar(ft.Text(text), bgcolor=ft.colors.ERROR if error else None)
+        self.page.snack_bar.open = True
+        self._update_page()
+
+    def _show_sync_result(self, session, outcome):
+        # Called from the upload queue's threads
+        messages = {
+            UPLOADED: "Successfully uploaded to Strava!",
+            RETRYING: "Upload failed, it will be retried automatically.",
+            DEFERRED: "Strava's daily limit was reached, the upload will resume later.",
+        }
+        if outcome in messages:
+            self._show_message(messages[outcome])
+        elif outcome == FAILED:
+            # A missing state entry must not raise and kill the queue worker
+            error = (self.upload_queue.engine.state.get(session.id) or {}).get("error", "unknown error")
+            self._show_message(f"Upload failed: {error}", error=True)
 
     def get_goals_view(self):
         # Simple goal setting form
         type_dropdown = ft.Dropdown(
             label="Goal Type",
-            options=[
-                ft.dropdown.Option("steps"),
-                ft.dropdown.Option("duration_minutes"),
-            ],
+            options=[ft.dropdown.Option(t.value) for t in GoalType],
             value="steps"
         )
+        period_dropdown = ft.Dropdown(
+            label="Period",
+            options=[ft.dropdown.Option(p.value) for p in GoalPeriod],
+            value="daily"
+        )
         target_field = ft.TextField(label="Target Value", keyboard_type=ft.KeyboardType.NUMBER)
         
         def save_goal(e):
@@ -225,16 +368,17 @@ class Views:
             goal = Goal(
                 type=GoalType(type_dropdown.value),
                 target_value=int(target_field.value),
-                period=GoalPeriod.DAILY
+                period=GoalPeriod(period_dropdown.value)
             )
             self.manager.add_goal(goal)
             self.page.snack_bar = ft.SnackBar(ft.Text("Goal Saved!"))
             self.page.snack_bar.open = True
-            self.page.update()
+            self._update_page()
 
         return ft.Column([
             ft.Text("Set New Goal", size=30, weight=ft.FontWeight.BOLD),
             type_dropdown,
             target_field,
+            period_dropdown,
             ft.ElevatedButton("Save Goal", on_click=save_goal)
         ], padding=20)
@@ -0,0 +1,84 @@
+import unittest
+import time
+import random
+from datetime import datetime, timedelta
+import numpy as np
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.analytics import WorkoutAnalytics, rolling_mean, cadence, time_in_zones, session_arrays
+
+class TestAnalytics(unittest.TestCase):
+    def _session(self, start, hr, steps, timestamps=None):
+        metrics = {"heart_rate": hr, "steps": steps}
+        if timestamps is not None:
+            metrics["timestamp"] = timestamps
+        return WorkoutSession(
+            activity_type="Running",
+            start_time=start,
+            end_time=start + timedelta(seconds=len(hr)),
+            metrics=metrics,
+            summary={"total_steps": steps[-1] if steps else 0}
+        )
+
+    def test_rolling_mean(self):
+        np.testing.assert_allclose(rolling_mean([1, 2, 3, 4, 5], 2), [1, 1.5, 2.5, 3.5, 4.5])
+
+    def test_cadence_and_zones(self):
+        session = self._session(datetime.now(), [100, 140, 180], [0, 2, 6], [0.0, 1.0, 2.0])
+        t, hr, steps = session_arrays(session)
+        np.testing.assert_allclose(cadence(t, steps), [0, 120, 240])
+        zones = time_in_zones(t, hr, max_hr=200)
+        # 100 -> zone 1, 140 -> zone 3, 180 -> zone 5
+        np.testing.assert_allclose(zones, [0, 1, 0, 1, 0, 1])
+
+    def test_session_stats_match_per_session_computation(self):
+        start = datetime(2024, 1, 1, 7, 0)
+        workouts = [
+            self._session(start, [100, 120, 110], [0, 2, 4]),
+            self._session(start + timedelta(days=1), [], []),
+            self._session(start + timedelta(days=8), [150, 160], [10, 13]),
+        ]
+        stats = WorkoutAnalytics(workouts).session_stats()
+
+        self.assertEqual(stats[0]["max_hr"], 120)
+        self.assertEqual(stats[0]["min_hr"], 100)
+        self.assertAlmostEqual(stats[0]["avg_hr"], 110)
+        self.assertAlmostEqual(stats[0]["avg_cadence"], 120)
+        self.assertIsNone(stats[1]["max_hr"])
+        self.assertEqual(stats[2]["max_hr"], 160)
+        self.assertAlmostEqual(stats[2]["avg_cadence"], 180)
+        self.assertAlmostEqual(sum(stats[2]["time_in_zones"].values()), 2)
+
+    def test_weekly_trends_and_personal_bests(self):
+        start = datetime(2024, 1, 1, 7, 0) # a Monday
+        workouts = [
+            self._session(start, [100, 120], [0, 500]),
+            self._session(start + timedelta(days=2), [130, 170], [0, 800]),
+            self._session(start + timedelta(days=7), [90, 95], [0, 100]),
+        ]
+        analytics = WorkoutAnalytics(workouts)
+
+        trends = analytics.weekly_trends()
+        self.assertEqual([t["week"] for t in trends], ["2024-W01", "2024-W02"])
+        self.assertEqual(trends[0]["sessions"], 2)
+        self.assertEqual(trends[0]["total_steps"], 1300)
+        self.assertAlmostEqual(trends[0]["avg_hr"], 130)
+
+        bests = analytics.personal_bests()
+        self.assertIs(bests["most_steps"]["session"], workouts[1])
+        self.assertEqual(bests["highest_max_hr"]["value"], 170)
+
+    def test_large_history_is_fast(self):
+        rng = random.Random(1)
+        start = datetime(2024, 1, 1)
+        workouts = [
+            self._session(start + timedelta(days=i), [rng.randint(60, 180) for _ in range(1000)], list(range(0, 2000, 2)))
+            for i in range(300)
+        ]
+        begin = time.perf_counter()
+        analytics = WorkoutAnalytics(workouts)
+        analytics.session_stats()
+        analytics.weekly_trends()
+        self.assertLess(time.perf_counter() - begin, 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import json
+import threading
+from datetime import datetime
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.columns import MetricColumns, LazyMetrics, timestamps
+
+class TestMetricColumns(unittest.TestCase):
+    def test_typed_columns(self):
+        metrics = MetricColumns({"timestamp": [0.0, 1.0], "heart_rate": [80, 82], "steps": [0, 2], "power": [150.5]})
+        self.assertEqual(metrics["timestamp"].typecode, "d")
+        self.assertEqual(metrics["heart_rate"].typecode, "H")
+        self.assertEqual(metrics["steps"].typecode, "I")
+        self.assertEqual(metrics["power"].typecode, "d")
+
+        metrics.append_sample({"timestamp": 2.0, "heart_rate": 85, "steps": 3})
+        self.assertEqual(list(metrics["heart_rate"]), [80, 82, 85])
+        self.assertEqual(len(metrics["power"]), 1)
+
+    def test_widens_values_that_do_not_fit(self):
+        metrics = MetricColumns({"heart_rate": [80.5, 81.25]})
+        self.assertEqual(metrics["heart_rate"].typecode, "d")
+        self.assertEqual(list(metrics["heart_rate"]), [80.5, 81.25])
+
+    def test_timestamps_fall_back_to_one_hertz(self):
+        metrics = MetricColumns({"timestamp": [0.0, 0.5, 1.0], "heart_rate": [80, 82, 85]})
+        self.assertEqual(list(timestamps(metrics, 3)), [0.0, 0.5, 1.0])
+        self.assertEqual(list(timestamps({"heart_rate": [80, 82]}, 2)), [0, 1])
+        self.assertEqual(list(timestamps(LazyMetrics(lambda: metrics), 4)), [0, 1, 2, 3])
+
+    def test_session_round_trip(self):
+        session = WorkoutSession(
+            activity_type="Running",
+            start_time=datetime.now(),
+            metrics={"heart_rate": [100, 120, 140], "steps": [0, 2, 5]}
+        )
+        encoded = json.loads(json.dumps(session.to_dict()))
+        self.assertEqual(encoded["metrics"]["format"], "columns/v1")
+
+        restored = WorkoutSession.from_dict(encoded)
+        self.assertEqual(list(restored.metrics["heart_rate"]), [100, 120, 140])
+        self.assertEqual(list(restored.metrics["steps"]), [0, 2, 5])
+
+    def test_reads_legacy_lists(self):
+        restored = WorkoutSession.from_dict({
+            "activity_type": "Walking",
+            "start_time": datetime.now().isoformat(),
+            "end_time": None,
+            "metrics": {"heart_rate": [90, 91], "steps": [0, 1]},
+            "summary": {"total_steps": 1}
+        })
+        self.assertIsInstance(restored.metrics, MetricColumns)
+        self.assertEqual(list(restored.metrics["heart_rate"]), [90, 91])
+
+    def test_lazy_columns_are_never_seen_half_loaded(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_loader():
+            started.set()
+            release.wait(10)
+            return {"heart_rate": [90, 91], "steps": [0, 1]}
+
+        metrics = LazyMetrics(slow_loader)
+        first = threading.Thread(target=len, args=(metrics,))
+        first.start()
+        started.wait(10)
+        # A second reader while the first is still loading waits for the whole load
+        seen = []
+        second = threading.Thread(target=lambda: seen.append(metrics.get("heart_rate")))
+        second.start()
+        second.join(0.2)
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(list(seen[0]), [90, 91])
+        self.assertTrue(metrics.loaded)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import unittest
+import os
+import json
+import multiprocessing
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from fitness_tracker.models import Goal, GoalType, GoalPeriod, WorkoutSession
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.sqlite_storage import SQLiteStorage
+from fitness_tracker.storage import JsonStorage, JournalStorage
+
+THREADS = 8
+PROCESSES = 4
+WORKOUTS_EACH = 15
+
+STORAGES = {
+    "json": lambda path: JsonStorage(path, split_metrics=True),
+    "journal": lambda path: JournalStorage(path, compact_every=10, split_metrics=True),
+    "sqlite": lambda path: SQLiteStorage(path + ".db"),
+}
+
+
+def _session(writer, i):
+    start = datetime(2024, 1, 1, 7, 0) + timedelta(minutes=writer * 100 + i)
+    return WorkoutSession(
+        id=f"w{writer}-{i}",
+        activity_type="Running",
+        start_time=start,
+        end_time=start + timedelta(minutes=30),
+        metrics={"heart_rate": [100 + i, 110 + i], "steps": [0, 10]},
+        summary={"total_steps": 10, "calories": 1}
+    )
+
+
+def _write_workouts(kind, path, writer):
+    """Process entry point: a separate manager adding its own workouts to the shared file."""
+    manager = FitnessManager(username="Shared", storage=STORAGES[kind](path))
+    for i in range(WORKOUTS_EACH):
+        manager.add_workout(_session(writer, i))
+    manager.close()
+
+
+class TestConcurrentWriters(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fitness_data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _expected_ids(self, writers):
+        return {f"w{w}-{i}" for w in range(writers) for i in range(WORKOUTS_EACH)}
+
+    def _assert_all_stored(self, kind, writers):
+        reloaded = FitnessManager(username="Shared", storage=STORAGES[kind](self.path))
+        ids = [w.id for w in reloaded.profile.workouts]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), self._expected_ids(writers))
+        self.assertEqual(reloaded.get_stats_between(datetime(2024, 1, 1), datetime(2024, 1, 2))["steps"],
+                         10 * writers * WORKOUTS_EACH)
+        # Samples come back from the metrics files too
+        self.assertEqual(list(reloaded.get_workout("w0-3").metrics["heart_rate"]), [103, 113])
+
+    def test_threads_share_one_manager(self):
+        for kind in STORAGES:
+            with self.subTest(kind=kind):
+                manager = FitnessManager(username="Shared", storage=STORAGES[kind](self.path))
+                threads = [
+                    threading.Thread(target=lambda w=w: [manager.add_workout(_session(w, i)) for i in range(WORKOUTS_EACH)])
+                    for w in range(THREADS)
+                ]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                self.assertEqual(len(manager.index.by_id), THREADS * WORKOUTS_EACH)
+                self._assert_all_stored(kind, THREADS)
+                shutil.rmtree(self.tmpdir)
+                os.makedirs(self.tmpdir)
+
+    def test_processes_merge_instead_of_overwriting(self):
+        # fork keeps the test fast; spawn (Windows, macOS default) works as the worker is importable
+        ctx = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+        for kind in STORAGES:
+            with self.subTest(kind=kind):
+                processes = [ctx.Process(target=_write_workouts, args=(kind, self.path, w)) for w in range(PROCESSES)]
+                for p in processes:
+                    p.start()
+                for p in processes:
+                    p.join(60)
+                    self.assertEqual(p.exitcode, 0)
+                self._assert_all_stored(kind, PROCESSES)
+                shutil.rmtree(self.tmpdir)
+                os.makedirs(self.tmpdir)
+
+    def test_stale_manager_merges_other_writers_changes(self):
+        first = FitnessManager(username="Shared", storage=JsonStorage(self.path))
+        second = FitnessManager(username="Shared", storage=JsonStorage(self.path))
+        first.add_workout(_session(0, 0))
+        first.add_goal(Goal(type=GoalType.STEPS, target_value=5000, period=GoalPeriod.DAILY))
+        second.add_workout(_session(1, 0))
+        second.delete_workout("w0-0")
+
+        # second picked up first's changes before writing its own
+        self.assertEqual([w.id for w in second.profile.workouts], ["w1-0"])
+        self.assertEqual(len(second.profile.goals), 1)
+        self.assertIsNotNone(second.get_workout("w1-0"))
+        self.assertIsNone(second.get_workout("w0-0"))
+
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["version"], 4)
+        reloaded = FitnessManager(username="Shared", storage=JsonStorage(self.path))
+        self.assertEqual([w.id for w in reloaded.profile.workouts], ["w1-0"])
+        self.assertEqual(len(reloaded.profile.goals), 1)
+
+    def test_stale_sqlite_manager_picks_up_other_writers(self):
+        path = self.path + ".db"
+        first = FitnessManager(username="Shared", storage=SQLiteStorage(path))
+        second = FitnessManager(username="Shared", storage=SQLiteStorage(path))
+        second.load_data()
+        first.add_workout(_session(0, 0))
+        second.add_workout(_session(1, 0))
+
+        self.assertEqual(sorted(second.index.by_id), ["w0-0", "w1-0"])
+        day = datetime(2024, 1, 1).date()
+        self.assertEqual(second.aggregates.day(day)["steps"], 20)
+        first.close()
+        second.close()
+
+        # The rollups second saved include first's workout
+        reloaded = FitnessManager(username="Shared", storage=SQLiteStorage(path))
+        self.assertEqual(reloaded.aggregates.day(day)["steps"], 20)
+        reloaded.close()
+
+    def test_failed_write_keeps_previous_file(self):
+        manager = FitnessManager(username="Shared", storage=JsonStorage(self.path))
+        manager.add_workout(_session(0, 0))
+
+        broken = _session(0, 1)
+        broken.summary["calories"] = object()  # not JSON serializable
+        with self.assertRaises(TypeError):
+            manager.add_workout(broken)
+
+        self.assertEqual(os.listdir(self.tmpdir).count("fitness_data.json"), 1)
+        self.assertFalse([name for name in os.listdir(self.tmpdir) if name.endswith(".tmp")])
+        reloaded = FitnessManager(username="Shared", storage=JsonStorage(self.path))
+        self.assertEqual([w.id for w in reloaded.profile.workouts], ["w0-0"])
+
+    def test_failed_write_leaves_manager_usable(self):
+        for kind, factory in STORAGES.items():
+            with self.subTest(kind=kind):
+                manager = FitnessManager(username="Shared", storage=factory(self.path))
+                manager.add_workout(_session(0, 0))
+                broken = _session(0, 1)
+                broken.summary["calories"] = object()
+                with self.assertRaises(TypeError):
+                    manager.add_workout(broken)
+                with self.assertRaises(TypeError):
+                    manager.add_workouts([_session(0, 2), broken])
+                replacement = _session(0, 0)
+                replacement.summary["calories"] = object()
+                with self.assertRaises(TypeError):
+                    manager.update_workout(replacement)
+
+                # The failed changes are gone from memory and later writes work
+                self.assertEqual([w.id for w in manager.profile.workouts], ["w0-0"])
+                self.assertEqual(manager.get_workout("w0-0").summary["calories"], 1)
+                manager.add_workout(_session(0, 3))
+                self.assertEqual(sorted(manager.index.by_id), ["w0-0", "w0-3"])
+                self.assertEqual(manager.get_stats_between(datetime(2024, 1, 1), datetime(2024, 1, 2))["steps"], 20)
+                manager.close()
+
+                reloaded = FitnessManager(username="Shared", storage=factory(self.path))
+                self.assertEqual(sorted(w.id for w in reloaded.profile.workouts), ["w0-0", "w0-3"])
+                reloaded.close()
+                shutil.rmtree(self.tmpdir)
+                os.makedirs(self.tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
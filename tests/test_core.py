@@ -1,21 +1,31 @@
+import json
+import pickle
+import shutil
+import tempfile
 import unittest
 import os
+import subprocess
+import sys
 import time
-from datetime import datetime
-from fitness_tracker.models import Goal, GoalType, GoalPeriod, WorkoutSession
+from dataclasses import replace
+from datetime import datetime, timedelta
+from fitness_tracker.models import Goal, GoalType, GoalPeriod, UserProfile, WorkoutSession
 from fitness_tracker.manager import FitnessManager, DATA_FILE
-from fitness_tracker.api import MockSensorAPI
+from fitness_tracker.api import MockSensorAPI, Subscription, DROP_NEWEST, COALESCE
+from fitness_tracker.storage import JsonStorage, JournalStorage
 
 class TestFitnessTracker(unittest.TestCase):
     def setUp(self):
         # Clean up data file before each test
-        if os.path.exists(DATA_FILE):
-            os.remove(DATA_FILE)
+        for path in (DATA_FILE, DATA_FILE + ".rollups.json", DATA_FILE + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
         self.manager = FitnessManager(username="TestUser")
 
     def tearDown(self):
-        if os.path.exists(DATA_FILE):
-            os.remove(DATA_FILE)
+        for path in (DATA_FILE, DATA_FILE + ".rollups.json", DATA_FILE + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_add_goal(self):
         goal = Goal(type=GoalType.STEPS, target_value=5000, period=GoalPeriod.DAILY)
@@ -64,6 +74,126 @@ class TestFitnessTracker(unittest.TestCase):
         goals_status = self.manager.check_goals()
         self.assertTrue(goals_status[0]["achieved"])
 
+    def test_weekly_and_calorie_goals(self):
+        self.manager.add_goal(Goal(type=GoalType.STEPS, target_value=3000, period=GoalPeriod.WEEKLY))
+        self.manager.add_goal(Goal(type=GoalType.CALORIES, target_value=400, period=GoalPeriod.DAILY))
+
+        now = datetime.now()
+        earlier_this_week = now - timedelta(days=now.weekday()) if now.weekday() > 0 else now
+        self.manager.add_workout(WorkoutSession(
+            activity_type="Running",
+            start_time=earlier_this_week,
+            end_time=earlier_this_week,
+            summary={"total_steps": 2000, "calories": 150}
+        ))
+        self.manager.add_workout(WorkoutSession(
+            activity_type="Running",
+            start_time=now,
+            end_time=now,
+            summary={"total_steps": 1000, "calories": 250}
+        ))
+
+        weekly, calories = self.manager.check_goals()
+        self.assertEqual(weekly["current"], 3000)
+        self.assertTrue(weekly["achieved"])
+        self.assertEqual(calories["current"], 250 if earlier_this_week.date() != now.date() else 400)
+
+    def test_aggregates_follow_edits_and_deletes(self):
+        session = WorkoutSession(
+            activity_type="Running",
+            start_time=datetime.now(),
+            end_time=datetime.now(),
+            summary={"total_steps": 1000}
+        )
+        self.manager.add_workout(session)
+
+        edited = WorkoutSession(
+            activity_type="Running",
+            start_time=session.start_time,
+            end_time=session.end_time,
+            summary={"total_steps": 1500},
+            id=session.id
+        )
+        self.manager.update_workout(edited)
+        self.assertEqual(self.manager.get_today_stats()["steps"], 1500)
+
+        # Rollups are persisted and reused on the next load
+        reloaded = FitnessManager(username="TestUser")
+        self.assertEqual(reloaded.aggregates.days, self.manager.aggregates.days)
+        self.assertEqual(reloaded.get_today_stats()["steps"], 1500)
+
+        reloaded.delete_workout(session.id)
+        self.assertEqual(reloaded.get_today_stats()["steps"], 0)
+        self.assertEqual(len(FitnessManager(username="TestUser").profile.workouts), 0)
+
+    def test_rollups_are_not_rewritten_on_every_change(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "fitness_data.json")
+            manager = FitnessManager(storage=JournalStorage(path))
+            manager.load_data()
+            writes = []
+            save = manager.storage.save_aggregates
+            manager.storage.save_aggregates = lambda data: writes.append(data) or save(data)
+            sessions = [WorkoutSession(activity_type="Running", start_time=datetime.now(), end_time=datetime.now(),
+                                       summary={"total_steps": 100}) for _ in range(5)]
+            for session in sessions:
+                manager.add_workout(session)
+            manager.update_workout(replace(sessions[0], summary={"total_steps": 400}))
+            # Only marked stale once; without a close (e.g. a crash) the next load rebuilds them
+            self.assertEqual(writes, [{}])
+            self.assertEqual(FitnessManager(storage=JournalStorage(path)).get_today_stats()["steps"], 800)
+
+            manager.close()
+            self.assertEqual(len(writes), 2)
+            self.assertEqual(writes[-1]["workout_count"], 5)
+            reloaded = FitnessManager(storage=JournalStorage(path))
+            self.assertEqual(reloaded.storage.load_aggregates(), writes[-1])
+            self.assertEqual(reloaded.get_today_stats()["steps"], 800)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_paginated_history(self):
+        base = datetime(2024, 1, 1, 8, 0)
+        # Added out of order; pages still come back newest first
+        for i in (3, 0, 4, 1, 2):
+            self.manager.add_workout(WorkoutSession(
+                activity_type="Cycling" if i % 2 else "Running",
+                start_time=base + timedelta(days=i),
+                end_time=base + timedelta(days=i, hours=1)
+            ))
+
+        page, cursor = self.manager.list_workouts(limit=2)
+        self.assertEqual([w.start_time.day for w in page], [5, 4])
+        page, cursor = self.manager.list_workouts(limit=2, cursor=cursor)
+        self.assertEqual([w.start_time.day for w in page], [3, 2])
+        page, cursor = self.manager.list_workouts(limit=2, cursor=cursor)
+        self.assertEqual([w.start_time.day for w in page], [1])
+        self.assertIsNone(cursor)
+
+        page, _ = self.manager.list_workouts(activity_type="running")
+        self.assertEqual([w.start_time.day for w in page], [5, 3, 1])
+        page, _ = self.manager.list_workouts(start=base + timedelta(days=1), end=base + timedelta(days=3))
+        self.assertEqual([w.start_time.day for w in page], [3, 2])
+
+        # The index follows deletes and is rebuilt on load
+        newest = self.manager.list_workouts(limit=1)[0][0]
+        self.manager.delete_workout(newest.id)
+        self.assertIsNone(self.manager.get_workout(newest.id))
+        reloaded = FitnessManager(username="TestUser")
+        page, _ = reloaded.list_workouts()
+        self.assertEqual([w.start_time.day for w in page], [4, 3, 2, 1])
+        self.assertIs(reloaded.get_workout(page[0].id), page[0])
+
+    def test_listeners_are_notified(self):
+        calls = []
+        self.manager.add_listener(lambda: calls.append(1))
+        self.manager.add_goal(Goal(type=GoalType.STEPS, target_value=100, period=GoalPeriod.DAILY))
+        session = WorkoutSession(activity_type="Running", start_time=datetime.now(), end_time=datetime.now())
+        self.manager.add_workout(session)
+        self.manager.delete_workout(session.id)
+        self.assertEqual(len(calls), 3)
+
     def test_mock_api(self):
         api = MockSensorAPI()
         data_received = []
@@ -79,5 +209,108 @@ class TestFitnessTracker(unittest.TestCase):
         self.assertTrue(len(data_received) >= 2)
         self.assertTrue(data_received[0]["heart_rate"] > 0)
 
+class TestSubscriptions(unittest.TestCase):
+    def test_batches_by_size(self):
+        batches = []
+        sub = Subscription(batches.append, batch_size=4, interval=10)
+        for i in range(10):
+            sub.push({"i": i})
+        sub.unsubscribe()
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual([s["i"] for b in batches for s in b], list(range(10)))
+
+    def test_batches_by_interval(self):
+        batches = []
+        sub = Subscription(batches.append, batch_size=100, interval=0.05)
+        sub.push({"i": 0})
+        time.sleep(0.3)
+        self.assertEqual(batches, [[{"i": 0}]])
+        sub.unsubscribe()
+
+    def test_slow_consumer_does_not_block_producer(self):
+        for policy, expected_last in ((DROP_NEWEST, 7), (COALESCE, 999)):
+            received = []
+
+            def slow(batch):
+                received.extend(batch)
+                time.sleep(0.2)
+
+            sub = Subscription(slow, batch_size=100, interval=10, capacity=8, policy=policy)
+            start = time.perf_counter()
+            for i in range(1000):
+                sub.push({"i": i})
+            self.assertLess(time.perf_counter() - start, 0.2)
+            self.assertGreater(sub.dropped, 900)
+            sub.unsubscribe()
+            self.assertEqual(received[-1]["i"], expected_last)
+
+    def test_unsubscribe_stops_delivery(self):
+        api = MockSensorAPI()
+        received = []
+        sub = api.subscribe(received.extend, interval=0.05)
+        sub.unsubscribe()
+        self.assertEqual(api._subscriptions, [])
+        api._emit({"heart_rate": 80})
+        time.sleep(0.1)
+        self.assertEqual(received, [])
+
+class TestStartup(unittest.TestCase):
+    def tearDown(self):
+        for path in (DATA_FILE, DATA_FILE + ".rollups.json", DATA_FILE + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_data_loaded_on_first_use(self):
+        FitnessManager().add_workout(WorkoutSession(activity_type="Running", start_time=datetime.now(),
+                                                    end_time=datetime.now(), summary={"total_steps": 100}))
+        storage = JsonStorage(DATA_FILE)
+        loads = []
+        load = storage.load
+        storage.load = lambda: loads.append(1) or load()
+
+        manager = FitnessManager(storage=storage)
+        self.assertEqual(loads, [])
+        self.assertEqual(manager.get_today_stats()["steps"], 100)
+        self.assertEqual(len(manager.profile.workouts), 1)
+        self.assertEqual(loads, [1])
+
+    def test_heavy_modules_not_imported_at_startup(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for module, deferred in (("fitness_tracker.app", ("numpy", "requests", "keyring")),
+                                 ("fitness_tracker.cli", ("numpy", "requests", "keyring")),
+                                 ("fitness_tracker.strava_client", ("keyring",))):
+            code = f"import sys, {module}; print(' '.join(m for m in {deferred!r} if m in sys.modules))"
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root, check=True)
+            self.assertEqual(result.stdout.strip(), "", module)
+
+
+class TestCompactModels(unittest.TestCase):
+    def test_models_have_no_instance_dict(self):
+        goal = Goal(type=GoalType.STEPS, target_value=5000, period=GoalPeriod.DAILY)
+        session = WorkoutSession(activity_type="Running", start_time=datetime.now())
+        for obj in (goal, session, UserProfile(username="TestUser")):
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj).__name__)
+        with self.assertRaises(AttributeError):
+            session.note = "typo'd field"
+
+    def test_decoding_interns_repeated_strings(self):
+        original = WorkoutSession(activity_type="Running", start_time=datetime.now(), end_time=datetime.now(),
+                                  metrics={"heart_rate": [100, 110]}, summary={"total_steps": 10, "avg_hr": 105})
+        # Separate documents, as in the journal, so the decoder can't share strings itself
+        first, second = (WorkoutSession.from_dict(json.loads(json.dumps(original.to_dict()))) for _ in range(2))
+        self.assertIs(first.activity_type, second.activity_type)
+        for a, b in zip(first.summary, second.summary):
+            self.assertIs(a, b)
+        for a, b in zip(first.metrics, second.metrics):
+            self.assertIs(a, b)
+        self.assertEqual(first.to_dict(), original.to_dict())
+
+    def test_sessions_survive_pickling(self):
+        session = WorkoutSession(activity_type="Running", start_time=datetime.now(),
+                                 metrics={"heart_rate": [100, 110]}, summary={"total_steps": 10})
+        self.assertEqual(pickle.loads(pickle.dumps(session)), session)
+        self.assertEqual(replace(session, summary={}).metrics, session.metrics)
+
+
 if __name__ == '__main__':
     unittest.main()
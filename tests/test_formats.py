@@ -0,0 +1,153 @@
+import unittest
+import os
+import io
+import struct
+import tempfile
+import shutil
+from datetime import datetime, timedelta
+from fitness_tracker import users
+from fitness_tracker.live_stats import LiveStats
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.storage import JsonStorage
+from fitness_tracker.formats import (
+    export_session, import_session, import_files, iter_fit, iter_samples,
+    gpx_chunks, fit_chunks, fit_crc, main
+)
+
+
+class TestFileFormats(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        n = 600
+        self.session = WorkoutSession(
+            activity_type="Cycling",
+            start_time=datetime(2024, 3, 1, 7, 30),
+            end_time=datetime(2024, 3, 1, 7, 40),
+            metrics={
+                "timestamp": [float(i) for i in range(n)],
+                "heart_rate": [100 + i % 50 for i in range(n)],
+                "steps": [i * 2 for i in range(n)],
+                "cadence": [80.0 + i % 10 for i in range(n)],
+                "latitude": [51.5 + i * 1e-5 for i in range(n)],
+                "longitude": [-0.12 - i * 1e-5 for i in range(n)],
+                "power": [200.0 + i % 30 for i in range(n)],
+            },
+            summary={"total_steps": 1198}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _roundtrip(self, fmt):
+        path = os.path.join(self.tmpdir, f"ride.{fmt}")
+        export_session(self.session, path)
+        return import_session(path)
+
+    def test_roundtrip_all_formats(self):
+        for fmt in ("gpx", "tcx", "fit"):
+            with self.subTest(fmt=fmt):
+                imported = self._roundtrip(fmt)
+                self.assertEqual(imported.activity_type, "Cycling")
+                self.assertEqual(imported.start_time, self.session.start_time)
+                self.assertEqual(imported.end_time, self.session.start_time + timedelta(seconds=599))
+                for name in ("heart_rate", "steps"):
+                    self.assertEqual(list(imported.metrics[name]), list(self.session.metrics[name]))
+                self.assertEqual(list(imported.metrics["timestamp"]), list(self.session.metrics["timestamp"]))
+                for name in ("latitude", "longitude"):
+                    for a, b in zip(imported.metrics[name], self.session.metrics[name]):
+                        self.assertAlmostEqual(a, b, places=6)
+                self.assertEqual(round(imported.metrics["power"][5]), 205)
+                self.assertEqual(imported.summary["total_steps"], 1198)
+
+    def test_exporters_are_incremental(self):
+        # Trackpoints come out in chunks rather than as one document
+        self.assertGreater(len(list(gpx_chunks(self.session))), 3)
+        self.assertEqual(len(list(iter_samples(self.session))), 600)
+
+    def test_fit_header_and_crc(self):
+        data = b"".join(fit_chunks(self.session))
+        self.assertEqual(data[8:12], b".FIT")
+        header_size, data_size = data[0], struct.unpack("<I", data[4:8])[0]
+        self.assertEqual(len(data), header_size + data_size + 2)
+        self.assertEqual(fit_crc(data[:12]), struct.unpack("<H", data[12:14])[0])
+        # The CRC over a file including its trailing CRC is zero
+        self.assertEqual(fit_crc(data), 0)
+        # Readable from a file object too
+        self.assertEqual(len(list(iter_fit(io.BytesIO(data)))), 600)
+
+    def test_sessions_without_gps_or_timestamps(self):
+        legacy = WorkoutSession(
+            activity_type="Walking",
+            start_time=datetime(2024, 3, 2, 9, 0),
+            end_time=datetime(2024, 3, 2, 9, 1),
+            metrics={"heart_rate": [90, 91, 92], "steps": [0, 2, 4]}
+        )
+        with self.assertRaises(ValueError):
+            export_session(legacy, os.path.join(self.tmpdir, "walk.gpx"))
+        for fmt in ("tcx", "fit"):
+            path = os.path.join(self.tmpdir, f"walk.{fmt}")
+            export_session(legacy, path)
+            imported = import_session(path)
+            self.assertEqual(imported.activity_type, "Walking")
+            # Sampled at 1 Hz when there is no timestamp column
+            self.assertEqual(list(imported.metrics["timestamp"]), [0.0, 1.0, 2.0])
+            self.assertEqual(list(imported.metrics["steps"]), [0, 2, 4])
+            self.assertNotIn("latitude", imported.metrics)
+
+    def test_bulk_import_skips_bad_files(self):
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.tmpdir, f"ride{i}.fit")
+            export_session(self.session, path)
+            paths.append(path)
+        bad = os.path.join(self.tmpdir, "broken.tcx")
+        with open(bad, "w") as f:
+            f.write("<TrainingCenterDatabase><Activities>")
+        paths.insert(1, bad)
+
+        errors = []
+        sessions = import_files(paths, on_error=lambda path, ex: errors.append(path))
+        self.assertEqual(len(list(sessions)), 3)
+        self.assertEqual(errors, [bad])
+
+    def test_imported_summary_matches_recorded_workouts(self):
+        imported = self._roundtrip("fit")
+        self.assertEqual(imported.summary.keys(), LiveStats().summary().keys())
+        self.assertEqual(imported.summary["max_hr"], 149)
+        self.assertGreater(imported.summary["distance_m"], 0)
+
+    def test_command_line_import_writes_once(self):
+        paths = []
+        for fmt in ("gpx", "tcx", "fit"):
+            paths.append(os.path.join(self.tmpdir, f"ride.{fmt}"))
+            export_session(self.session, paths[-1])
+        manager = FitnessManager(storage=JsonStorage(os.path.join(self.tmpdir, "fitness_data.json")))
+        batches = []
+        manager.add_workout = lambda session: batches.append([session])
+        manager.add_workouts = batches.append
+        open_profile, users.open_profile = users.open_profile, lambda: manager
+        try:
+            main(["import"] + paths)
+        finally:
+            users.open_profile = open_profile
+        self.assertEqual([len(batch) for batch in batches], [3])
+
+    def test_command_line_export_leaves_samples_unloaded(self):
+        path = os.path.join(self.tmpdir, "fitness_data.json")
+        storage = lambda: JsonStorage(path, split_metrics=True, lazy=True)
+        FitnessManager(storage=storage()).add_workout(self.session)
+        manager = FitnessManager(storage=storage())
+        open_profile, users.open_profile = users.open_profile, lambda: manager
+        try:
+            main(["export", os.path.join(self.tmpdir, "out")])
+        finally:
+            users.open_profile = open_profile
+
+        exported = os.path.join(self.tmpdir, "out", os.listdir(os.path.join(self.tmpdir, "out"))[0])
+        self.assertEqual(len(import_session(exported).metrics["heart_rate"]), 600)
+        self.assertFalse(manager.profile.workouts[0].metrics.loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from fitness_tracker import instrumentation
+from fitness_tracker.api import MockSensorAPI
+from fitness_tracker.instrumentation import Histogram
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.storage import JsonStorage
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        instrumentation.enable()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(1, 2, 5))
+        for value in (0.5, 1.5, 1.5, 3, 100):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        stats = histogram.snapshot()
+        self.assertEqual((stats["count"], stats["min"], stats["max"]), (5, 0.5, 100))
+        self.assertAlmostEqual(stats["mean"], 21.3)
+        self.assertEqual(stats["p50"], 2)
+        self.assertEqual(stats["p99"], 100)
+
+    def test_disabled_records_nothing(self):
+        instrumentation.disable()
+
+        @instrumentation.timed("test.fn")
+        def fn(x):
+            return x * 2
+
+        self.assertEqual(fn(2), 4)
+        with instrumentation.timer("test.block"):
+            pass
+        instrumentation.count("test.counter")
+        self.assertEqual(instrumentation.snapshot(), {"enabled": False, "counters": {}, "timers": {}})
+
+    def test_timed_and_counted(self):
+        @instrumentation.timed("test.fn")
+        def fn():
+            raise ValueError
+
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                fn()
+        with instrumentation.timer("test.block"):
+            pass
+        instrumentation.count("test.counter", 2)
+        data = instrumentation.snapshot()
+        self.assertEqual(data["timers"]["test.fn"]["count"], 3)
+        self.assertEqual(data["timers"]["test.block"]["count"], 1)
+        self.assertEqual(data["counters"], {"test.counter": 2})
+
+    def test_hot_paths_are_wired(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            manager = FitnessManager(storage=JsonStorage(os.path.join(tmpdir, "fitness_data.json")))
+            manager.save_data()
+            manager.check_goals()
+            api = MockSensorAPI()
+            api._emit(api.next_sample())
+        finally:
+            shutil.rmtree(tmpdir)
+        timers = instrumentation.snapshot()["timers"]
+        for name in ("manager.load_data", "manager.save_data", "manager.check_goals", "sensor.emit"):
+            self.assertEqual(timers[name]["count"], 1, name)
+
+    def test_prometheus_text(self):
+        instrumentation.observe("manager.save_data", 0.003)
+        instrumentation.count("strava.retries")
+        text = instrumentation.prometheus_text()
+        self.assertIn("# TYPE fitness_strava_retries_total counter\nfitness_strava_retries_total 1\n", text)
+        self.assertIn("# TYPE fitness_manager_save_data_seconds histogram", text)
+        self.assertIn('fitness_manager_save_data_seconds_bucket{le="0.0025"} 0', text)
+        self.assertIn('fitness_manager_save_data_seconds_bucket{le="0.005"} 1', text)
+        self.assertIn('fitness_manager_save_data_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn("fitness_manager_save_data_seconds_count 1", text)
+
+    def test_http_endpoint(self):
+        instrumentation.disable()
+        server = instrumentation.serve(port=0)
+        try:
+            self.assertTrue(instrumentation.enabled)
+            instrumentation.observe("views.page_update", 0.01)
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            with urlopen(base + "/metrics") as response:
+                self.assertIn("fitness_views_page_update_seconds_count 1", response.read().decode())
+            with urlopen(base + "/snapshot") as response:
+                self.assertEqual(json.load(response)["timers"]["views.page_update"]["count"], 1)
+            with self.assertRaises(HTTPError):
+                urlopen(base + "/other")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import statistics
+from fitness_tracker.analytics import WorkoutAnalytics
+from fitness_tracker.live_stats import (
+    LiveStats, RollingWindow, RunningStats, ZONE_LABELS, format_pace, haversine, hr_zone
+)
+from fitness_tracker.recorder import WorkoutRecorder
+from fitness_tracker.simulator import SensorSimulator
+
+class TestRunningStats(unittest.TestCase):
+    def test_matches_two_pass_statistics(self):
+        values = [72, 95.5, 130, 151, 149.25, 160, 88]
+        stats = RunningStats()
+        for v in values:
+            stats.add(v)
+        self.assertEqual(stats.count, len(values))
+        self.assertAlmostEqual(stats.mean, statistics.fmean(values))
+        self.assertAlmostEqual(stats.std, statistics.pstdev(values))
+        self.assertEqual((stats.min, stats.max), (72, 160))
+
+    def test_empty(self):
+        stats = RunningStats()
+        self.assertEqual((stats.count, stats.variance, stats.min), (0, 0.0, None))
+
+class TestRollingWindow(unittest.TestCase):
+    def test_keeps_only_last_seconds(self):
+        window = RollingWindow(seconds=2)
+        for t in range(10):
+            window.add(float(t), t * 10.0)
+        self.assertEqual(len(window), 3)  # t = 7, 8, 9
+        self.assertEqual(window.mean, 80.0)
+        self.assertEqual(window.rate, 10.0)
+
+    def test_memory_bounded_by_window(self):
+        window = RollingWindow(seconds=5)
+        for i in range(100_000):
+            window.add(i / 100, 1.0)
+        self.assertLessEqual(len(window), 501)
+
+class TestLiveStats(unittest.TestCase):
+    def _recording(self, samples=3000, **kwargs):
+        recorder = WorkoutRecorder(**kwargs)
+        sim = SensorSimulator(rate_hz=10, seed=7, realtime=False, channels=("heart_rate", "steps", "gps"))
+        recorder.add_batch([sim.next_sample() for _ in range(samples)])
+        return recorder
+
+    def test_summary_matches_batch_analytics(self):
+        recorder = self._recording()
+        session = recorder.finish()
+        expected = WorkoutAnalytics([session]).session_stats()[0]
+
+        summary = session.summary
+        self.assertAlmostEqual(summary["avg_hr"], expected["avg_hr"])
+        self.assertEqual(summary["max_hr"], expected["max_hr"])
+        self.assertEqual(summary["min_hr"], expected["min_hr"])
+        for label in ZONE_LABELS:
+            self.assertAlmostEqual(summary["time_in_zones"][label], expected["time_in_zones"][label], places=6)
+        self.assertAlmostEqual(summary["avg_cadence"], expected["avg_cadence"], places=1)
+        self.assertAlmostEqual(summary["max_cadence"], expected["max_cadence"], places=1)
+
+    def test_snapshot_tracks_live_values(self):
+        recorder = self._recording()
+        snap = recorder.stats.snapshot()
+        self.assertEqual(snap["heart_rate"], recorder.latest["heart_rate"])
+        self.assertEqual(snap["steps"], recorder.latest["steps"])
+        self.assertIn(snap["zone"], ZONE_LABELS)
+        self.assertGreater(snap["cadence"], 100)
+        self.assertGreater(snap["distance_m"], 0)
+        # ~1.1 m per step at the simulated cadence: roughly 3 to 6 min/km
+        self.assertTrue(180 < snap["pace_seconds_per_km"] < 360)
+        # Rolling windows only hold the last 30 s of 10 Hz samples
+        self.assertLessEqual(len(recorder.stats.hr_window), 301)
+
+    def test_distance_from_steps_without_gps(self):
+        stats = LiveStats(stride_m=1.0)
+        for t in range(11):
+            stats.add({"elapsed_seconds": float(t), "heart_rate": 120, "steps": 3 * t})
+        self.assertEqual(stats.distance_m, 30.0)
+        self.assertEqual(stats.cadence, 180.0)
+        self.assertAlmostEqual(stats.pace, 1000 / 3)
+        self.assertEqual(stats.summary()["avg_pace_seconds_per_km"], 333.3)
+
+    def test_helpers(self):
+        self.assertEqual([hr_zone(hr) for hr in (80, 95, 114, 133, 152, 171, 200)], [0, 1, 2, 3, 4, 5, 5])
+        self.assertAlmostEqual(haversine(51.5, -0.12, 51.5 + 1 / 60, -0.12), 1853, delta=2)
+        self.assertEqual(format_pace(330.4), "5:30 /km")
+        self.assertEqual(format_pace(None), "--")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import asyncio
+import threading
+import time
+from fitness_tracker.api import MockSensorAPI
+from fitness_tracker.simulator import SensorSimulator
+from fitness_tracker.recorder import AsyncSensorSource, WorkoutRecorder
+
+class TestWorkoutRecorder(unittest.TestCase):
+    def test_add_batch_and_finish(self):
+        recorder = WorkoutRecorder("Walking")
+        recorder.add_batch([
+            {"elapsed_seconds": 0.0, "heart_rate": 100, "steps": 1},
+            {"elapsed_seconds": 1.0, "heart_rate": 110, "steps": 3},
+        ])
+        session = recorder.finish()
+        self.assertEqual(session.activity_type, "Walking")
+        self.assertEqual(list(session.metrics["timestamp"]), [0.0, 1.0])
+        self.assertEqual(session.summary["total_steps"], 3)
+        self.assertEqual(session.summary["avg_hr"], 105)
+        self.assertEqual(session.summary["max_hr"], 110)
+        self.assertEqual(session.summary["time_in_zones"]["Zone 1"], 2.0)
+        self.assertLessEqual(session.start_time, session.end_time)
+
+    def test_run_consumes_async_source(self):
+        source = AsyncSensorSource(SensorSimulator(rate_hz=100, seed=1), realtime=False, max_samples=250)
+        session = asyncio.run(WorkoutRecorder().run(source))
+        self.assertEqual(len(session.metrics["heart_rate"]), 250)
+        self.assertEqual(session.summary["total_steps"], session.metrics["steps"][-1])
+
+    def test_concurrent_sources_share_one_loop(self):
+        async def main():
+            sources = [AsyncSensorSource(SensorSimulator(rate_hz=50, seed=i), max_samples=10) for i in range(20)]
+            return await asyncio.gather(*(WorkoutRecorder().run(s) for s in sources))
+
+        threads_before = threading.active_count()
+        start = time.perf_counter()
+        sessions = asyncio.run(main())
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual([len(s.metrics["heart_rate"]) for s in sessions], [10] * 20)
+        # 10 samples at 50 Hz take ~0.18 s; all twenty ran side by side, without extra threads
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(threading.active_count(), threads_before)
+
+    def test_stop_ends_recording(self):
+        source = AsyncSensorSource(MockSensorAPI())
+
+        async def main():
+            asyncio.get_running_loop().call_later(0.1, source.stop)
+            return await WorkoutRecorder().run(source)
+
+        session = asyncio.run(main())
+        self.assertEqual(len(session.metrics["heart_rate"]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
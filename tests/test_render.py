@@ -0,0 +1,59 @@
+import unittest
+import time
+import threading
+from fitness_tracker.render import RenderScheduler
+
+class FakeControl:
+    def __init__(self):
+        self.value = None
+
+class FakePage:
+    def __init__(self):
+        self.updates = []
+        self.lock = threading.Lock()
+
+    def update(self, *controls):
+        with self.lock:
+            self.updates.append(controls)
+
+class TestRenderScheduler(unittest.TestCase):
+    def test_coalesces_bursts_into_capped_frames(self):
+        page = FakePage()
+        renderer = RenderScheduler(page, fps=10)
+        text = FakeControl()
+
+        start = time.perf_counter()
+        while time.perf_counter() - start < 0.5:
+            renderer.set(text, value=str(time.perf_counter()))
+            time.sleep(0.001)
+        time.sleep(0.2)
+        renderer.stop()
+
+        # ~5 frames for half a second at 10 fps, not hundreds of updates
+        self.assertLessEqual(len(page.updates), 8)
+        self.assertGreaterEqual(len(page.updates), 3)
+        self.assertTrue(all(controls == (text,) for controls in page.updates))
+
+    def test_only_changed_controls_are_sent(self):
+        page = FakePage()
+        renderer = RenderScheduler(page, fps=10)
+        hr, steps = FakeControl(), FakeControl()
+        hr.value = "80"
+
+        renderer.set(hr, value="80")
+        renderer.set(steps, value="12")
+        renderer.flush()
+        self.assertEqual(page.updates, [(steps,)])
+
+        renderer.set(hr, value="81")
+        renderer.set(hr, value="82")
+        renderer.flush()
+        self.assertEqual(hr.value, "82")
+        self.assertEqual(page.updates[-1], (hr,))
+
+        renderer.flush()
+        self.assertEqual(len(page.updates), 2)
+        renderer.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.recorder import WorkoutRecorder
+from fitness_tracker.reprocess import Reprocessor, recompute_summary
+from fitness_tracker.storage import JsonStorage, JournalStorage
+from fitness_tracker.timeseries import levels
+
+
+def _samples(n, offset=0):
+    return [{"elapsed_seconds": float(i), "heart_rate": 100 + (i + offset) % 50, "steps": i * 2} for i in range(n)]
+
+
+def _stale_session(n, offset=0):
+    """A session whose summary predates the current summary logic."""
+    recorder = WorkoutRecorder()
+    recorder.add_batch(_samples(n, offset))
+    session = recorder.finish()
+    session.summary = {"total_steps": 1, "avg_hr": 0, "calories": 42}
+    return session
+
+
+class TestReprocess(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fitness_data.json")
+        self.state_path = self.path + ".reprocess.json"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_summary_matches_recorder(self):
+        recorder = WorkoutRecorder()
+        recorder.add_batch(_samples(300))
+        self.assertEqual(recompute_summary(recorder.metrics), recorder.summary())
+        self.assertIsNone(recompute_summary({}))
+
+    def test_recomputes_stale_summaries(self):
+        for workers, storage in ((1, JsonStorage), (2, JournalStorage)):
+            with self.subTest(workers=workers, storage=storage.__name__):
+                manager = FitnessManager(storage=storage(self.path))
+                sessions = [_stale_session(200 + i, offset=i) for i in range(6)]
+                manager.add_workouts(sessions)
+                bare = WorkoutSession(activity_type="Yoga", start_time=datetime.now() - timedelta(hours=1),
+                                      end_time=datetime.now(), summary={"total_steps": 5})
+                manager.add_workout(bare)
+
+                report = Reprocessor(manager, self.state_path, workers=workers, chunk_size=2, checkpoint=3).run()
+                self.assertEqual((report["sessions"], report["updated"], report["skipped"]), (7, 6, 1))
+                self.assertFalse(os.path.exists(self.state_path))
+
+                reloaded = FitnessManager(storage=storage(self.path))
+                for i, session in enumerate(sessions):
+                    stored = reloaded.get_workout(session.id)
+                    expected = recompute_summary(session.metrics)
+                    self.assertEqual(stored.summary, {**expected, "calories": 42})
+                    self.assertTrue(levels(stored))
+                    self.assertEqual(len(stored.metrics["heart_rate"]), 200 + i)
+                self.assertEqual(reloaded.get_workout(bare.id).summary, {"total_steps": 5})
+                expected_steps = sum((199 + i) * 2 for i in range(6)) + 5
+                self.assertEqual(reloaded.get_today_stats()["steps"], expected_steps)
+                for name in os.listdir(self.tmpdir):
+                    os.remove(os.path.join(self.tmpdir, name))
+
+    def test_lazy_samples_do_not_stay_resident(self):
+        for storage in (JsonStorage, JournalStorage):
+            with self.subTest(storage=storage.__name__):
+                sessions = [_stale_session(100 + i, offset=i) for i in range(6)]
+                FitnessManager(storage=storage(self.path, split_metrics=True)).add_workouts(sessions)
+                manager = FitnessManager(storage=storage(self.path, split_metrics=True, lazy=True))
+                resident = []
+
+                def progress(done, total):
+                    resident.append(sum(w.metrics.loaded for w in manager.profile.workouts))
+
+                report = Reprocessor(manager, self.state_path, workers=1, chunk_size=2, checkpoint=2,
+                                     progress=progress).run()
+                self.assertEqual(report["updated"], 6)
+                self.assertEqual(max(resident), 0)
+                self.assertFalse(any(w.metrics.loaded for w in manager.profile.workouts))
+
+                reloaded = FitnessManager(storage=storage(self.path, split_metrics=True, lazy=True))
+                for i, session in enumerate(sessions):
+                    stored = reloaded.get_workout(session.id)
+                    self.assertEqual(stored.summary["total_steps"], (99 + i) * 2)
+                    self.assertEqual(list(stored.metrics["heart_rate"]), list(session.metrics["heart_rate"]))
+                    self.assertTrue(levels(stored))
+                shutil.rmtree(self.tmpdir)
+                os.makedirs(self.tmpdir)
+
+    def test_resumes_after_interruption(self):
+        manager = FitnessManager(storage=JsonStorage(self.path))
+        manager.add_workouts([_stale_session(100, offset=i) for i in range(6)])
+
+        def interrupt(done, total):
+            if done >= 4:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            Reprocessor(manager, self.state_path, workers=1, chunk_size=2, checkpoint=2, progress=interrupt).run()
+        self.assertTrue(os.path.exists(self.state_path))
+
+        manager = FitnessManager(storage=JsonStorage(self.path))
+        self.assertEqual(sum(w.summary["total_steps"] == 198 for w in manager.profile.workouts), 4)
+        reprocessor = Reprocessor(manager, self.state_path, workers=1, chunk_size=2, checkpoint=2)
+        reprocessor.load_state()
+        report = reprocessor.run()
+        self.assertEqual((report["resumed_after"], report["sessions"]), (4, 2))
+        self.assertEqual({w.summary["total_steps"] for w in manager.profile.workouts}, {198})
+        self.assertFalse(os.path.exists(self.state_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.server import GroupCommitter, IngestServer
+from fitness_tracker.simulator import SensorSimulator
+from fitness_tracker.sqlite_storage import SQLiteStorage
+from fitness_tracker.storage import JsonStorage, JournalStorage
+
+
+def _session(steps):
+    return WorkoutSession(activity_type="Running", start_time=datetime.now(), end_time=datetime.now(),
+                          metrics={"heart_rate": [100, 110], "steps": [0, steps]}, summary={"total_steps": steps})
+
+
+class TestAddWorkouts(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_batch_is_stored_by_every_backend(self):
+        factories = {
+            "json": lambda: JsonStorage(os.path.join(self.tmpdir, "data.json")),
+            "journal": lambda: JournalStorage(os.path.join(self.tmpdir, "journal.json")),
+            "sqlite": lambda: SQLiteStorage(os.path.join(self.tmpdir, "data.db")),
+        }
+        for name, factory in factories.items():
+            with self.subTest(storage=name):
+                manager = FitnessManager(storage=factory())
+                manager.add_workouts([_session(100), _session(200), _session(300)])
+                self.assertEqual(manager.get_today_stats()["steps"], 600)
+                manager.close()
+
+                reloaded = FitnessManager(storage=factory())
+                self.assertEqual(sorted(w.summary["total_steps"] for w in reloaded.profile.workouts), [100, 200, 300])
+                reloaded.close()
+
+    def test_journal_batch_is_one_append(self):
+        path = os.path.join(self.tmpdir, "data.json")
+        manager = FitnessManager(storage=JournalStorage(path))
+        manager.add_workouts([_session(i) for i in range(5)])
+        with open(path + ".journal") as f:
+            self.assertEqual([json.loads(line)["seq"] for line in f], [1, 2, 3, 4, 5])
+
+
+class TestIngestServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fitness_data.json")
+        self.manager = FitnessManager(storage=JournalStorage(self.path))
+        self.server = IngestServer(self.manager, port=0)
+        self.server.start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _post(self, path, data, conn=None):
+        conn = conn or http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        conn.request("POST", path, body=json.dumps(data).encode(), headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_devices_stream_concurrently(self):
+        devices, batches, batch_size = 8, 5, 50
+        results = {}
+
+        def device(i):
+            api = SensorSimulator(rate_hz=10, seed=i, realtime=False, channels=("heart_rate", "steps", "gps"))
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+            for _ in range(batches):
+                status, _ = self._post(f"/devices/d{i}/samples", {"samples": [api.next_sample() for _ in range(batch_size)]}, conn)
+                self.assertEqual(status, 202)
+            results[i] = self._post(f"/devices/d{i}/finish", {"activity_type": "Walking"}, conn)
+            conn.close()
+
+        threads = [threading.Thread(target=device, args=(i,)) for i in range(devices)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual({status for status, _ in results.values()}, {201})
+        self.assertEqual(len(self.manager.profile.workouts), devices)
+        for status, body in results.values():
+            session = self.manager.get_workout(body["id"])
+            self.assertEqual(session.activity_type, "Walking")
+            self.assertEqual(len(session.metrics["heart_rate"]), batches * batch_size)
+            self.assertEqual(len(session.metrics["latitude"]), batches * batch_size)
+            self.assertGreater(session.summary["distance_m"], 0)
+        stats = self.server.stats()
+        self.assertEqual(stats["samples_received"], devices * batches * batch_size)
+        self.assertEqual(stats["workouts_committed"], devices)
+        self.assertLessEqual(stats["commit_batches"], devices)
+
+        reloaded = FitnessManager(storage=JournalStorage(self.path))
+        self.assertEqual(len(reloaded.profile.workouts), devices)
+
+    def test_finished_workouts_and_errors(self):
+        status, body = self._post("/workouts", [_session(10).to_dict(), _session(20).to_dict()])
+        self.assertEqual(status, 201)
+        self.assertEqual(len(body["ids"]), 2)
+        self.assertEqual(self.manager.get_today_stats()["steps"], 30)
+
+        self.assertEqual(self._post("/devices/nobody/finish", {})[0], 409)
+        self.assertEqual(self._post("/devices/d1/samples", {"samples": [{"heart_rate": "high"}]})[0], 400)
+        self.assertEqual(self._post("/devices/d1/samples", {"samples": 5})[0], 400)
+        self.assertEqual(self._post("/workouts", {"activity_type": "Running"})[0], 400)
+        self.assertEqual(self._post("/elsewhere", {})[0], 404)
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        conn.request("POST", "/workouts", body=b"{not json", headers={"Content-Type": "application/json"})
+        self.assertEqual(conn.getresponse().status, 400)
+
+    def test_rejected_batch_leaves_recording_untouched(self):
+        good = [{"elapsed_seconds": i, "heart_rate": 90 + i, "steps": i} for i in range(2)]
+        self.assertEqual(self._post("/devices/d1/samples", {"samples": good})[0], 202)
+        for bad in ({"heart_rate": 72.5}, {"heart_rate": -1}, {"steps": 2 ** 40}):
+            batch = [{"elapsed_seconds": 2, "heart_rate": 92, "steps": 2}, {"elapsed_seconds": 3, "steps": 3, **bad}]
+            self.assertEqual(self._post("/devices/d1/samples", {"samples": batch})[0], 400)
+        status, body = self._post("/devices/d1/finish", {})
+        self.assertEqual(status, 201)
+        metrics = self.manager.get_workout(body["id"]).metrics
+        self.assertEqual({name: len(metrics[name]) for name in ("timestamp", "heart_rate", "steps")},
+                         {"timestamp": 2, "heart_rate": 2, "steps": 2})
+
+    def test_failed_commit_reopens_recording(self):
+        samples = [{"elapsed_seconds": i, "heart_rate": 90 + i, "steps": i} for i in range(4)]
+        append_workouts = self.manager.storage.append_workouts
+
+        def disk_full(profile, sessions):
+            raise OSError("disk full")
+
+        self.manager.storage.append_workouts = disk_full
+        self._post("/devices/d1/samples", {"samples": samples[:3]})
+        self.assertEqual(self._post("/devices/d1/finish", {})[0], 500)
+        self.assertEqual(self._post("/workouts", _session(10).to_dict())[0], 500)
+        self.assertEqual(self.server.stats()["open_recordings"], 1)
+
+        # The device keeps streaming and retries
+        self.manager.storage.append_workouts = append_workouts
+        self._post("/devices/d1/samples", {"samples": samples[3:]})
+        status, body = self._post("/devices/d1/finish", {})
+        self.assertEqual(status, 201)
+        self.assertEqual(list(self.manager.get_workout(body["id"]).metrics["heart_rate"]), [90, 91, 92, 93])
+        self.assertEqual(len(self.manager.profile.workouts), 1)
+
+    def test_retried_workouts_are_not_duplicated(self):
+        self.server.commit_timeout = 0.2
+        payload = [_session(10).to_dict(), _session(20).to_dict()]
+        # Hold the manager so the write can't finish in time
+        with self.manager.lock:
+            self.assertEqual(self._post("/workouts", payload)[0], 503)
+        status, body = self._post("/workouts", payload)
+        self.assertEqual(status, 201)
+        self.assertEqual(body["already_stored"], [data["id"] for data in payload])
+        self.assertEqual(len(self.manager.profile.workouts), 2)
+        self.assertEqual(self.manager.get_today_stats()["steps"], 30)
+
+    def test_open_recordings_are_finished_on_close(self):
+        self._post("/devices/d1/samples", {"samples": [{"elapsed_seconds": 0, "heart_rate": 90, "steps": 0}]})
+        self.server.close()
+        self.server = IngestServer(self.manager, port=0)
+        self.server.start()
+        reloaded = FitnessManager(storage=JournalStorage(self.path))
+        self.assertEqual(len(reloaded.profile.workouts), 1)
+
+
+class TestGroupCommitter(unittest.TestCase):
+    def test_queued_workouts_share_one_write(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            manager = FitnessManager(storage=JsonStorage(os.path.join(tmpdir, "data.json")))
+            committer = GroupCommitter(manager)
+            # Hold the manager so everything queues up behind the first write
+            with manager.lock:
+                futures = [committer.submit([_session(i)]) for i in range(10)]
+            for future in futures:
+                future.result(10)
+            committer.stop()
+            self.assertEqual(committer.committed, 10)
+            self.assertLessEqual(committer.batches, 2)
+            self.assertEqual(len(manager.profile.workouts), 10)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_bad_submission_does_not_fail_the_batch(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            manager = FitnessManager(storage=JsonStorage(os.path.join(tmpdir, "data.json")))
+            committer = GroupCommitter(manager)
+            broken = _session(5)
+            broken.summary["calories"] = object()
+            with manager.lock:
+                futures = [committer.submit([_session(1)]), committer.submit([broken]), committer.submit([_session(2)])]
+            self.assertEqual(futures[0].result(10), [])
+            self.assertRaises(TypeError, futures[1].result, 10)
+            self.assertEqual(futures[2].result(10), [])
+            committer.stop()
+            self.assertEqual(manager.get_today_stats()["steps"], 3)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestHeadless(unittest.TestCase):
+    def test_no_ui_imports(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = "import sys, fitness_tracker.server; print(' '.join(m for m in ('flet', 'rich') if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root, check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import time
+from fitness_tracker.simulator import SensorSimulator
+
+class TestSensorSimulator(unittest.TestCase):
+    def _run(self, **kwargs):
+        api = SensorSimulator(realtime=False, **kwargs)
+        received = []
+        api.add_callback(received.append)
+        api.start_stream()
+        self.assertTrue(api.wait(timeout=10))
+        api.stop_stream()
+        return received
+
+    def test_replay_is_fast_and_evenly_spaced(self):
+        start = time.perf_counter()
+        samples = self._run(rate_hz=500, seed=1, max_samples=5000)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(len(samples), 5000)
+        self.assertAlmostEqual(samples[1]["elapsed_seconds"] - samples[0]["elapsed_seconds"], 1 / 500)
+        self.assertAlmostEqual(samples[-1]["elapsed_seconds"], 4999 / 500)
+
+    def test_seed_is_deterministic(self):
+        first = self._run(rate_hz=100, seed=7, max_samples=500)
+        second = self._run(rate_hz=100, seed=7, max_samples=500)
+        strip = lambda samples: [{k: v for k, v in s.items() if k != "timestamp"} for s in samples]
+        self.assertEqual(strip(first), strip(second))
+
+    def test_channels(self):
+        sample = self._run(rate_hz=50, seed=1, max_samples=1, channels=("heart_rate", "gps"))[0]
+        self.assertIn("heart_rate", sample)
+        self.assertIn("latitude", sample)
+        self.assertNotIn("accel_z", sample)
+        self.assertNotIn("power", sample)
+
+        sample = self._run(rate_hz=50, seed=1, max_samples=1)[0]
+        for key in ("heart_rate", "steps", "cadence", "accel_x", "accel_y", "accel_z", "latitude", "longitude", "power"):
+            self.assertIn(key, sample)
+
+        with self.assertRaises(ValueError):
+            SensorSimulator(channels=("heart_rate", "altitude"))
+
+    def test_realtime_rate(self):
+        api = SensorSimulator(rate_hz=200, seed=1)
+        received = []
+        sub = api.subscribe(received.extend, interval=0.05)
+        api.start_stream()
+        time.sleep(0.5)
+        api.stop_stream()
+        sub.unsubscribe()
+        self.assertTrue(70 <= len(received) <= 130, len(received))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,286 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from datetime import datetime, timedelta
+from fitness_tracker.models import Goal, GoalType, GoalPeriod, WorkoutSession
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.storage import JsonStorage, JournalStorage
+from fitness_tracker.sqlite_storage import SQLiteStorage, migrate_json
+from fitness_tracker.codec import get_codec, StdlibCodec
+
+class TestJournalStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fitness_data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _session(self, steps):
+        return WorkoutSession(
+            activity_type="Running",
+            start_time=datetime.now(),
+            end_time=datetime.now(),
+            metrics={"heart_rate": [100, 110], "steps": [0, steps]},
+            summary={"total_steps": steps}
+        )
+
+    def test_append_does_not_rewrite_snapshot(self):
+        manager = FitnessManager(username="TestUser", storage=JournalStorage(self.path))
+        manager.add_workout(self._session(100))
+        manager.add_goal(Goal(type=GoalType.STEPS, target_value=5000, period=GoalPeriod.DAILY))
+
+        self.assertFalse(os.path.exists(self.path))
+        with open(self.path + ".journal") as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        reloaded = FitnessManager(username="TestUser", storage=JournalStorage(self.path))
+        self.assertEqual(len(reloaded.profile.workouts), 1)
+        self.assertEqual(len(reloaded.profile.goals), 1)
+        self.assertEqual(list(reloaded.profile.workouts[0].metrics["steps"]), [0, 100])
+
+    def test_compaction(self):
+        manager = FitnessManager(username="TestUser", storage=JournalStorage(self.path, compact_every=3))
+        for i in range(4):
+            manager.add_workout(self._session(i))
+
+        # Three records were compacted into the snapshot, one remains in the journal
+        with open(self.path) as f:
+            self.assertEqual(len(json.load(f)["workouts"]), 3)
+        with open(self.path + ".journal") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        reloaded = FitnessManager(username="TestUser", storage=JournalStorage(self.path))
+        self.assertEqual([w.summary["total_steps"] for w in reloaded.profile.workouts], [0, 1, 2, 3])
+
+    def test_recovers_from_torn_and_stale_journal(self):
+        storage = JournalStorage(self.path, compact_every=2)
+        manager = FitnessManager(username="TestUser", storage=storage)
+        manager.add_workout(self._session(1))
+        journal_line = open(self.path + ".journal").read()
+        manager.add_workout(self._session(2))
+
+        # Simulate a crash after the snapshot rename but before the journal was truncated,
+        # followed by a torn write of a new record.
+        with open(self.path + ".journal", "w") as f:
+            f.write(journal_line)
+            f.write('{"seq": 3, "op": "work')
+
+        reloaded = FitnessManager(username="TestUser", storage=JournalStorage(self.path))
+        self.assertEqual([w.summary["total_steps"] for w in reloaded.profile.workouts], [1, 2])
+
+        # The torn tail is discarded so new appends are readable
+        reloaded.add_workout(self._session(3))
+        again = FitnessManager(username="TestUser", storage=JournalStorage(self.path))
+        self.assertEqual([w.summary["total_steps"] for w in again.profile.workouts], [1, 2, 3])
+
+    def test_update_and_delete_are_journaled(self):
+        manager = FitnessManager(username="TestUser", storage=JournalStorage(self.path, split_metrics=True))
+        first = self._session(1)
+        second = self._session(2)
+        manager.add_workout(first)
+        manager.add_workout(second)
+        manager.update_workout(WorkoutSession(
+            activity_type="Walking",
+            start_time=first.start_time,
+            end_time=first.end_time,
+            metrics={"steps": [0, 7]},
+            summary={"total_steps": 7},
+            id=first.id
+        ))
+        manager.delete_workout(second.id)
+
+        reloaded = FitnessManager(username="TestUser", storage=JournalStorage(self.path, split_metrics=True))
+        self.assertEqual([w.summary["total_steps"] for w in reloaded.profile.workouts], [7])
+        self.assertEqual(list(reloaded.profile.workouts[0].metrics["steps"]), [0, 7])
+        self.assertFalse(os.path.exists(os.path.join(self.path + ".metrics", second.id + ".json")))
+
+    def test_reads_existing_json_file(self):
+        manager = FitnessManager(username="TestUser", storage=JsonStorage(self.path))
+        manager.add_workout(self._session(500))
+
+        reloaded = FitnessManager(username="TestUser", storage=JournalStorage(self.path))
+        self.assertEqual(reloaded.profile.workouts[0].summary["total_steps"], 500)
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "fitness_data.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip_and_date_range_stats(self):
+        storage = SQLiteStorage(self.db_path)
+        manager = FitnessManager(username="TestUser", storage=storage)
+        now = datetime.now()
+        manager.add_goal(Goal(type=GoalType.STEPS, target_value=5000, period=GoalPeriod.DAILY))
+        manager.add_workout(WorkoutSession(
+            activity_type="Running",
+            start_time=now - timedelta(days=3),
+            end_time=now - timedelta(days=3) + timedelta(minutes=30),
+            summary={"total_steps": 4000}
+        ))
+        manager.add_workout(WorkoutSession(
+            activity_type="Walking",
+            start_time=now,
+            end_time=now + timedelta(minutes=15),
+            metrics={"heart_rate": [90, 95, 100], "steps": [0, 2, 3]},
+            summary={"total_steps": 1000}
+        ))
+
+        stats = manager.get_today_stats()
+        self.assertEqual(stats["steps"], 1000)
+        self.assertAlmostEqual(stats["duration_minutes"], 15, places=3)
+
+        week = manager.get_stats_between(now - timedelta(days=7), now + timedelta(days=1))
+        self.assertEqual(week["steps"], 5000)
+
+        storage.close()
+        reloaded = FitnessManager(username="TestUser", storage=SQLiteStorage(self.db_path))
+        self.assertEqual(len(reloaded.profile.goals), 1)
+        self.assertEqual([w.activity_type for w in reloaded.profile.workouts], ["Running", "Walking"])
+        self.assertEqual(list(reloaded.profile.workouts[1].metrics["heart_rate"]), [90, 95, 100])
+
+    def test_query_uses_start_time_index(self):
+        storage = SQLiteStorage(self.db_path)
+        plan = storage.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM workouts WHERE start_time >= ? AND start_time < ?", ("a", "b")
+        ).fetchall()
+        self.assertIn("idx_workouts_start_time", " ".join(str(row) for row in plan))
+        storage.close()
+
+    def test_migrate_json(self):
+        json_path = os.path.join(self.tmpdir, "fitness_data.json")
+        manager = FitnessManager(username="TestUser", storage=JsonStorage(json_path))
+        manager.add_workout(WorkoutSession(
+            activity_type="Running",
+            start_time=datetime.now(),
+            end_time=datetime.now(),
+            metrics={"heart_rate": [120]},
+            summary={"total_steps": 700}
+        ))
+
+        storage = migrate_json(json_path, self.db_path)
+        profile = storage.load()
+        self.assertEqual(profile.username, "TestUser")
+        self.assertEqual(profile.workouts[0].id, manager.profile.workouts[0].id)
+        self.assertEqual(profile.workouts[0].summary["total_steps"], 700)
+        storage.close()
+
+class TestLazyLoading(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fitness_data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _add_session(self, storage):
+        manager = FitnessManager(username="TestUser", storage=storage)
+        manager.add_workout(WorkoutSession(
+            activity_type="Running",
+            start_time=datetime.now(),
+            end_time=datetime.now(),
+            metrics={"heart_rate": [100, 120], "steps": [0, 4]},
+            summary={"total_steps": 4}
+        ))
+        return manager.profile.workouts[0]
+
+    def test_split_metrics_are_loaded_on_first_access(self):
+        session = self._add_session(JsonStorage(self.path, split_metrics=True))
+        with open(self.path) as f:
+            self.assertNotIn("metrics", json.load(f)["workouts"][0])
+        self.assertTrue(os.path.exists(os.path.join(self.path + ".metrics", session.id + ".json")))
+
+        manager = FitnessManager(username="TestUser", storage=JsonStorage(self.path, split_metrics=True, lazy=True))
+        metrics = manager.profile.workouts[0].metrics
+        self.assertFalse(metrics.loaded)
+        self.assertEqual(manager.get_today_stats()["steps"], 4)
+        self.assertFalse(metrics.loaded)
+
+        self.assertEqual(list(metrics["heart_rate"]), [100, 120])
+        self.assertTrue(metrics.loaded)
+
+    def test_resave_keeps_unloaded_metrics(self):
+        self._add_session(JsonStorage(self.path, split_metrics=True))
+        storage = JsonStorage(self.path, split_metrics=True, lazy=True)
+        manager = FitnessManager(username="TestUser", storage=storage)
+        manager.add_goal(Goal(type=GoalType.STEPS, target_value=100, period=GoalPeriod.DAILY))
+        self.assertFalse(manager.profile.workouts[0].metrics.loaded)
+
+        # A plain JsonStorage still follows the metrics references
+        reloaded = FitnessManager(username="TestUser", storage=JsonStorage(self.path))
+        self.assertEqual(list(reloaded.profile.workouts[0].metrics["steps"]), [0, 4])
+
+    def test_lazy_inline_metrics(self):
+        self._add_session(JsonStorage(self.path))
+        manager = FitnessManager(username="TestUser", storage=JsonStorage(self.path, lazy=True))
+        metrics = manager.profile.workouts[0].metrics
+        self.assertFalse(metrics.loaded)
+        self.assertEqual(list(metrics["steps"]), [0, 4])
+
+class TestCodecs(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fitness_data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _profile_manager(self, storage):
+        manager = FitnessManager(username="TestUser", storage=storage)
+        manager.add_goal(Goal(type=GoalType.CALORIES, target_value=500, period=GoalPeriod.WEEKLY))
+        manager.add_workout(WorkoutSession(
+            activity_type="Cycling",
+            start_time=datetime(2024, 3, 1, 8, 0, 0, 250000),
+            end_time=datetime(2024, 3, 1, 9, 0),
+            metrics={"heart_rate": [100, 120, 140], "steps": [0, 5, 9]},
+            summary={"total_steps": 9, "avg_hr": 120.0}
+        ))
+        return manager
+
+    def test_codecs_round_trip_and_interoperate(self):
+        for name in ("json", "orjson", "msgspec"):
+            with self.subTest(codec=name):
+                manager = self._profile_manager(JsonStorage(self.path, codec=get_codec(name)))
+                # Whatever wrote the file, the stdlib codec reads it back
+                reloaded = FitnessManager(username="TestUser", storage=JsonStorage(self.path, codec=StdlibCodec()))
+                self.assertEqual(reloaded.profile.goals, manager.profile.goals)
+                saved, loaded = manager.profile.workouts[0], reloaded.profile.workouts[0]
+                self.assertEqual(loaded.start_time, saved.start_time)
+                self.assertEqual(list(loaded.metrics["heart_rate"]), [100, 120, 140])
+                self.assertEqual(loaded.summary, saved.summary)
+                with open(self.path) as f:
+                    self.assertNotIn("\n", f.read())
+                os.remove(self.path)
+
+    def test_reads_indented_legacy_file(self):
+        manager = self._profile_manager(JsonStorage(self.path))
+        with open(self.path, "w") as f:
+            json.dump(manager.profile.to_dict(), f, indent=4)
+        reloaded = FitnessManager(username="TestUser", storage=JsonStorage(self.path))
+        self.assertEqual(reloaded.profile.workouts[0].summary["total_steps"], 9)
+        self.assertEqual(reloaded.profile.goals[0].type, GoalType.CALORIES)
+
+    def test_journal_with_default_codec(self):
+        storage = JournalStorage(self.path)
+        self._profile_manager(storage)
+        with open(self.path + ".journal", "rb") as f:
+            lines = f.read().splitlines()
+        self.assertEqual([json.loads(line)["op"] for line in lines], ["goal", "workout"])
+
+        with open(self.path + ".journal", "ab") as f:
+            f.write(b'{"seq": 3, "op": "work')  # torn by a crash
+        reloaded = FitnessManager(username="TestUser", storage=JournalStorage(self.path))
+        self.assertEqual(len(reloaded.profile.workouts), 1)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec("yaml")
+        self.assertIn(get_codec("auto").name, ("orjson", "msgspec", "json"))
+
+if __name__ == '__main__':
+    unittest.main()
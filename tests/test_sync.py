@@ -0,0 +1,331 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.strava_client import StravaClient
+from fitness_tracker.sync import (
+    SyncEngine, SyncState, RateLimiter, RateLimitExceeded,
+    UPLOADED, SKIPPED, FAILED, DEFERRED, WINDOW_SECONDS
+)
+from fitness_tracker.upload_queue import UploadQueue, RETRYING
+
+
+class StubStrava(ThreadingHTTPServer):
+    """
+    Local stand-in for POST /activities; `responses` is a queue of (status, headers) to send before
+    succeeding, where a "body" header replaces the JSON body.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.responses = []
+        self.requests = []
+        self.paths = []
+        self.usage = "1,1"
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("latin-1")
+        server = self.server
+        with server.lock:
+            server.requests.append((self.headers["Authorization"], parse_qs(body)))
+            server.paths.append(self.path)
+            status, headers = server.responses.pop(0) if server.responses else (201, {})
+            activity_id = len(server.requests)
+        payload = headers.pop("body", json.dumps({"id": activity_id})).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-RateLimit-Limit", "200,2000")
+        self.send_header("X-RateLimit-Usage", headers.pop("usage", server.usage))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSyncEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.server = StubStrava()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        # Waits only move a fake clock forward
+        self.now = 1_700_000_100.0
+        self.sleeps = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def _engine(self, **kwargs):
+        return SyncEngine(
+            client=StravaClient(token="test-token", base_url=self.server.url),
+            state=SyncState(os.path.join(self.tmpdir, "sync.json")),
+            limiter=RateLimiter(burst=100, clock=lambda: self.now, sleep=self._sleep),
+            backoff=0.5,
+            sleep=self._sleep,
+            **kwargs
+        )
+
+    def _sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def _sessions(self, count):
+        base = datetime(2024, 1, 1, 8, 0)
+        return [
+            WorkoutSession(
+                activity_type="Cycling",
+                start_time=base + timedelta(days=i),
+                end_time=base + timedelta(days=i, minutes=45),
+                summary={"total_steps": 0}
+            )
+            for i in range(count)
+        ]
+
+    def test_uploads_concurrently_and_skips_on_next_sync(self):
+        engine = self._engine(max_workers=4)
+        sessions = self._sessions(12)
+        report = engine.sync(sessions)
+        self.assertEqual(report[UPLOADED], 12)
+        self.assertEqual(len(self.server.requests), 12)
+        token, form = self.server.requests[0]
+        self.assertEqual(token, "Bearer test-token")
+        self.assertEqual(form["type"], ["Ride"])
+        engine.close()
+
+        # A new engine reads the persisted state and doesn't upload anything again
+        engine = self._engine()
+        report = engine.sync(sessions)
+        self.assertEqual(report[SKIPPED], 12)
+        self.assertEqual(len(self.server.requests), 12)
+        engine.close()
+
+    def test_retries_server_errors_with_backoff(self):
+        self.server.responses = [(500, {}), (503, {})]
+        engine = self._engine(max_workers=1)
+        session = self._sessions(1)[0]
+        self.assertEqual(engine.upload(session), UPLOADED)
+        self.assertEqual(len(self.server.requests), 3)
+        # Exponential with jitter: 0.5 * [0.5, 1], then 1.0 * [0.5, 1]
+        self.assertTrue(0.25 <= self.sleeps[0] <= 0.5)
+        self.assertTrue(0.5 <= self.sleeps[1] <= 1.0)
+        self.assertEqual(engine.state.get(session.id)["remote_id"], 3)
+        engine.close()
+
+    def test_client_errors_are_not_retried(self):
+        self.server.responses = [(401, {})]
+        engine = self._engine(max_workers=1)
+        session = self._sessions(1)[0]
+        self.assertEqual(engine.upload(session), FAILED)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertIn("HTTP 401", engine.state.get(session.id)["error"])
+        self.assertFalse(engine.state.is_uploaded(session.id))
+
+        # Failed sessions are retried by the next sync
+        self.assertEqual(engine.upload(session), UPLOADED)
+        engine.close()
+
+    def test_unreadable_success_body_is_not_retried(self):
+        self.server.responses = [(201, {"body": "<html>Created</html>"})]
+        engine = self._engine(max_workers=1)
+        session = self._sessions(1)[0]
+        self.assertEqual(engine.upload(session), UPLOADED)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(engine.state.is_uploaded(session.id))
+        self.assertIsNone(engine.state.get(session.id)["remote_id"])
+        # Not uploaded a second time by the next sync
+        self.assertEqual(engine.upload(session), SKIPPED)
+        engine.close()
+
+    def test_rate_limited_requests_wait(self):
+        self.server.responses = [(429, {"Retry-After": "7"})]
+        engine = self._engine(max_workers=1)
+        self.assertEqual(engine.upload(self._sessions(1)[0]), UPLOADED)
+        # The limiter waited out Retry-After before the retry went through
+        self.assertAlmostEqual(sum(self.sleeps), 7, places=3)
+        engine.close()
+
+    def test_file_uploads_send_full_streams(self):
+        engine = self._engine(file_format="fit")
+        session = self._sessions(1)[0]
+        session.metrics = {"timestamp": [0, 1, 2], "heart_rate": [100, 110, 120]}
+        self.assertEqual(engine.upload(session), UPLOADED)
+        self.assertEqual(self.server.paths, ["/uploads"])
+        engine.close()
+
+        # GPX needs GPS samples; that's a permanent failure, not a retry
+        engine = self._engine(file_format="gpx")
+        other = self._sessions(2)[1]
+        self.assertEqual(engine.upload(other), FAILED)
+        self.assertIn("GPS", engine.state.get(other.id)["error"])
+        engine.close()
+
+    def test_daily_limit_defers_remaining_uploads(self):
+        self.server.usage = "5,2000"
+        engine = self._engine(max_workers=1)
+        report = engine.sync(self._sessions(3))
+        self.assertEqual(report[UPLOADED], 1)
+        self.assertEqual(report[DEFERRED], 2)
+        self.assertEqual(len(self.server.requests), 1)
+        engine.close()
+
+
+class TestUploadQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "outbox")
+        self.server = StubStrava()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = datetime(2024, 1, 1, 8, 0)
+        self.sessions = {
+            w.id: w for w in (
+                WorkoutSession(activity_type="Running", start_time=base + timedelta(days=i),
+                               end_time=base + timedelta(days=i, minutes=30))
+                for i in range(5)
+            )
+        }
+        self.results = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def _queue(self, **kwargs):
+        # Retries are left to the queue so they show up in its metrics
+        engine = SyncEngine(
+            client=StravaClient(token="test-token", base_url=self.server.url),
+            state=SyncState(os.path.join(self.tmpdir, "sync.json")),
+            max_workers=2,
+            max_retries=0
+        )
+        return UploadQueue(self.sessions.get, path=self.path, engine=engine,
+                           on_result=lambda s, outcome: self.results.append(outcome), **kwargs)
+
+    def test_pending_uploads_survive_restart(self):
+        queue = self._queue()
+        for session in self.sessions.values():
+            self.assertTrue(queue.enqueue(session))
+        self.assertFalse(queue.enqueue(next(iter(self.sessions.values()))))
+        self.assertEqual(queue.depth, 5)
+        self.assertEqual(len(self.server.requests), 0)
+
+        # Never started: a new process picks the queue up from disk and drains it
+        queue = self._queue()
+        self.assertEqual(queue.depth, 5)
+        queue.start()
+        self.assertTrue(queue.join(timeout=10))
+        queue.stop()
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.results, [UPLOADED] * 5)
+
+        metrics = queue.metrics()
+        self.assertEqual(metrics["depth"], 0)
+        self.assertEqual(metrics["uploaded"], 5)
+        self.assertGreater(metrics["latency_max_seconds"], 0)
+        self.assertEqual(self._queue().depth, 0)
+
+    def test_failed_uploads_are_retried_with_backoff(self):
+        self.server.responses = [(503, {}), (503, {})]
+        queue = self._queue(concurrency=1, retry_delay=0.05)
+        queue.enqueue(next(iter(self.sessions.values())))
+        queue.start()
+        self.assertTrue(queue.join(timeout=10))
+        queue.stop()
+        self.assertEqual(self.results, [RETRYING, RETRYING, UPLOADED])
+        self.assertEqual(queue.metrics()["retries"], 2)
+
+    def test_gives_up_after_max_attempts(self):
+        self.server.responses = [(400, {})] * 3
+        queue = self._queue(retry_delay=0.01, max_attempts=3)
+        queue.enqueue(next(iter(self.sessions.values())))
+        queue.start()
+        self.assertTrue(queue.join(timeout=10))
+        queue.stop()
+        self.assertEqual(self.results, [RETRYING, RETRYING, FAILED])
+        self.assertEqual(queue.metrics()["dropped"], 1)
+
+    def test_compacts_and_recovers_from_torn_tail(self):
+        queue = self._queue(compact_every=2)
+        for session in self.sessions.values():
+            queue.enqueue(session)
+        # Forget two sessions: they are skipped and finished without an upload
+        for session_id in list(self.sessions)[:2]:
+            del self.sessions[session_id]
+        queue.concurrency = 1
+        queue.start()
+        self.assertTrue(queue.join(timeout=10))
+        queue.stop()
+        self.assertEqual(len(self.server.requests), 3)
+        with open(self.path) as f:
+            self.assertLess(len(f.readlines()), 10)
+
+        with open(self.path, "a") as f:
+            f.write('{"op":"enqueue","id":"abc","at":1.0}\n{"op":"enq')
+        queue = self._queue()
+        self.assertEqual(list(queue.entries), ["abc"])
+        queue.enqueue(next(iter(self.sessions.values())))
+        self.assertEqual(self._queue().depth, 2)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.now = 1_700_000_100.0
+        self.sleeps = []
+
+    def _sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def _limiter(self, **kwargs):
+        return RateLimiter(clock=lambda: self.now, sleep=self._sleep, **kwargs)
+
+    def test_token_bucket_spreads_requests_over_the_window(self):
+        limiter = self._limiter(limits=(90, 1000), burst=2)
+        for _ in range(4):
+            limiter.acquire()
+        # Two from the burst, then one every 900 / 90 = 10 seconds
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertAlmostEqual(sum(self.sleeps), 20.0)
+
+    def test_exhausted_window_waits_for_next_quarter_hour(self):
+        limiter = self._limiter()
+        limiter.update({"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "200,300"})
+        limiter.acquire()
+        self.assertAlmostEqual(self.sleeps[0], WINDOW_SECONDS - 1_700_000_100.0 % WINDOW_SECONDS)
+        self.assertEqual(self.now % WINDOW_SECONDS, 0)
+
+    def test_exhausted_day_raises(self):
+        limiter = self._limiter()
+        limiter.update({"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "10,2000"})
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire()
+        # Usage counts reset at midnight UTC
+        self.now += 24 * 3600
+        limiter.acquire()
+
+    def test_ignores_missing_headers(self):
+        limiter = self._limiter()
+        limiter.update({})
+        self.assertEqual(limiter.short_limit, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+from fitness_tracker.manager import FitnessManager
+from fitness_tracker.models import WorkoutSession
+from fitness_tracker.storage import JsonStorage, JournalStorage
+from fitness_tracker.sqlite_storage import SQLiteStorage
+from fitness_tracker.timeseries import (
+    LTTB, RAW, RetentionPolicy, build_lod, compact, levels, lttb, main, sample_channels, series
+)
+
+class TestPyramid(unittest.TestCase):
+    def _session(self, seconds=7200, rate_hz=4, start=None):
+        n = seconds * rate_hz
+        t = np.arange(n) / rate_hz
+        return WorkoutSession(
+            activity_type="Running",
+            start_time=start or datetime(2024, 5, 1, 7, 0),
+            end_time=(start or datetime(2024, 5, 1, 7, 0)) + timedelta(seconds=seconds),
+            metrics={
+                "timestamp": t.tolist(),
+                "heart_rate": (120 + 30 * np.sin(t / 300)).astype(int).tolist(),
+                "steps": (t * 2.5).astype(int).tolist(),
+            },
+            summary={"total_steps": int(seconds * 2.5)}
+        )
+
+    def test_levels_summarize_buckets(self):
+        session = self._session()
+        build_lod(session)
+        self.assertEqual(levels(session), [1, 10, 60, 600])
+        self.assertEqual(sample_channels(session), ["heart_rate", "steps"])
+
+        # The samples themselves are left alone
+        self.assertEqual(sorted(session.metrics), ["heart_rate", "steps", "timestamp"])
+        m = session.lod
+        self.assertEqual(len(m["lod60:t"]), 120)
+        hr = np.asarray(session.metrics["heart_rate"], dtype=float)
+        self.assertEqual(m["lod60:heart_rate:min"][5], hr[5 * 240:6 * 240].min())
+        self.assertEqual(m["lod60:heart_rate:max"][5], hr[5 * 240:6 * 240].max())
+        self.assertAlmostEqual(m["lod600:heart_rate:mean"][1], hr[2400:4800].mean())
+        self.assertEqual(sum(m["lod600:count"]), len(hr))
+
+    def test_1hz_recording_skips_redundant_level(self):
+        session = self._session(seconds=3600, rate_hz=1)
+        build_lod(session)
+        self.assertEqual(levels(session), [10, 60, 600])
+
+    def test_series_picks_level_for_point_budget(self):
+        session = self._session()
+        build_lod(session)
+
+        whole = series(session, "heart_rate", points=500)
+        self.assertEqual(whole["level"], 60)
+        self.assertEqual(len(whole["t"]), 120)
+
+        # Zoomed in far enough the raw samples fit
+        zoom = series(session, "heart_rate", start=600, end=660, points=500)
+        self.assertEqual(zoom["level"], RAW)
+        self.assertEqual(zoom["t"][0], 600)
+        self.assertEqual(zoom["t"][-1], 660)
+
+        tiny = series(session, "heart_rate", points=5)
+        self.assertEqual(len(tiny["t"]), 5)
+        for key in ("min", "max", "mean"):
+            self.assertEqual(len(tiny[key]), 5)
+
+    def test_lttb_keeps_peaks(self):
+        t = np.arange(10_000, dtype=float)
+        values = np.zeros(10_000)
+        values[4321] = 100
+        idx = lttb(t, values, 50)
+        self.assertEqual(len(idx), 50)
+        self.assertEqual((idx[0], idx[-1]), (0, 9999))
+        self.assertIn(4321, idx)
+        self.assertTrue(np.all(np.diff(idx) > 0))
+
+    def test_stored_lttb_used_for_whole_session(self):
+        session = self._session()
+        build_lod(session, lttb_points=200)
+        result = series(session, "heart_rate", points=200)
+        self.assertEqual(result["level"], LTTB)
+        self.assertEqual(len(result["t"]), 200)
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fitness_data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _session(self, start):
+        t = np.arange(3600 * 2) / 2
+        return WorkoutSession(
+            activity_type="Running",
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            metrics={"timestamp": t.tolist(), "heart_rate": [130] * len(t)},
+            summary={"total_steps": 100}
+        )
+
+    def test_policy(self):
+        policy = RetentionPolicy(raw_days=30, level_days={1: 60, 10: 90})
+        self.assertIsNone(policy.dropped(timedelta(days=10)))
+        self.assertEqual(policy.dropped(timedelta(days=40)), RAW)
+        self.assertEqual(policy.dropped(timedelta(days=70)), 1)
+        self.assertEqual(policy.dropped(timedelta(days=400)), 10)
+
+    def test_compact_keeps_coarse_levels(self):
+        now = datetime(2025, 1, 1)
+        session = self._session(now - timedelta(days=200))
+        build_lod(session)
+        self.assertTrue(compact(session, RetentionPolicy(), now))
+        self.assertEqual(levels(session), [10, 60, 600])
+        self.assertNotIn("heart_rate", session.metrics)
+        self.assertEqual(series(session, "heart_rate", points=1000)["level"], 10)
+        # Nothing left to drop
+        self.assertFalse(compact(session, RetentionPolicy(), now))
+
+    def test_compact_keeps_samples_of_short_sessions(self):
+        now = datetime(2025, 1, 1)
+        start = now - timedelta(days=400)
+        session = WorkoutSession(activity_type="Running", start_time=start, end_time=start + timedelta(seconds=1),
+                                 metrics={"timestamp": [0.0], "heart_rate": [130]})
+        build_lod(session)
+        self.assertEqual(levels(session), [])
+        self.assertFalse(compact(session, RetentionPolicy(), now))
+        self.assertEqual(list(session.metrics["heart_rate"]), [130])
+
+        # Only fine levels, all of which the policy drops at this age
+        session = WorkoutSession(activity_type="Running", start_time=start, end_time=start + timedelta(seconds=2),
+                                 metrics={"timestamp": [0.0, 0.5, 1.0, 1.5], "heart_rate": [130, 131, 132, 133]})
+        build_lod(session)
+        self.assertEqual(levels(session), [1, 10])
+        self.assertFalse(compact(session, RetentionPolicy(), now))
+        self.assertEqual(len(session.metrics["heart_rate"]), 4)
+
+    def test_manager_builds_on_save_and_applies_retention(self):
+        now = datetime.now()
+        factories = (
+            lambda: JsonStorage(self.path, split_metrics=True, lazy=True),
+            lambda: JournalStorage(self.path),
+            lambda: SQLiteStorage(os.path.join(self.tmpdir, "fitness.db")),
+        )
+        for factory in factories:
+            storage = factory()
+            with self.subTest(storage=type(storage).__name__):
+                manager = FitnessManager(username="Test", storage=storage)
+                old = self._session(now - timedelta(days=400))
+                recent = self._session(now - timedelta(days=1))
+                manager.add_workout(old)
+                manager.add_workout(recent)
+                self.assertEqual(levels(old), [1, 10, 60, 600])
+
+                self.assertEqual(manager.apply_retention(), 1)
+                self.assertEqual(manager.get_series(recent.id, "heart_rate", points=10_000)["level"], RAW)
+                manager.close()
+
+                reloaded = FitnessManager(username="Test", storage=factory())
+                self.assertEqual(levels(reloaded.get_workout(old.id)), [60, 600])
+                self.assertNotIn("heart_rate", reloaded.get_workout(old.id).metrics)
+                self.assertEqual(reloaded.get_series(old.id, "heart_rate")["mean"], [130.0] * 60)
+                self.assertIn("heart_rate", reloaded.get_workout(recent.id).metrics)
+                reloaded.close()
+                shutil.rmtree(self.tmpdir)
+                os.makedirs(self.tmpdir)
+
+    def test_command_line_uses_the_given_backend(self):
+        now = datetime.now()
+        db_path = os.path.join(self.tmpdir, "fitness.db")
+        for kind, path, factory in (("journal", self.path, lambda: JournalStorage(self.path)),
+                                    ("sqlite", db_path, lambda: SQLiteStorage(db_path))):
+            with self.subTest(storage=kind):
+                manager = FitnessManager(storage=factory())
+                old, recent = self._session(now - timedelta(days=400)), self._session(now - timedelta(days=1))
+                manager.add_workouts([old, recent])
+                manager.close()
+
+                main([path, "--storage", kind])
+                reloaded = FitnessManager(storage=factory())
+                self.assertEqual(len(reloaded.profile.workouts), 2)
+                self.assertNotIn("heart_rate", reloaded.get_workout(old.id).metrics)
+                self.assertIn("heart_rate", reloaded.get_workout(recent.id).metrics)
+                reloaded.close()
+
+    def test_pyramid_is_stored_apart_from_samples(self):
+        session = self._session(datetime.now())
+        db_path = os.path.join(self.tmpdir, "fitness.db")
+        factories = (
+            lambda: SQLiteStorage(db_path),
+            lambda: JsonStorage(self.path, split_metrics=True, lazy=True),
+        )
+        for factory in factories:
+            manager = FitnessManager(username="Test", storage=factory())
+            with self.subTest(storage=type(manager.storage).__name__):
+                manager.add_workout(session)
+                manager.close()
+                stored = FitnessManager(username="Test", storage=factory()).get_workout(session.id)
+                self.assertEqual(sorted(stored.metrics), ["heart_rate", "timestamp"])
+                self.assertEqual(levels(stored), [1, 10, 60, 600])
+                self.assertEqual(stored.lod, session.lod)
+
+        # SQLite: one encoded row for the whole pyramid, not one per value
+        storage = SQLiteStorage(db_path)
+        self.assertEqual(storage.conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0], 2 * 7200)
+        self.assertEqual(storage.conn.execute("SELECT COUNT(*) FROM lod").fetchone()[0], 1)
+        storage.close()
+        self.assertTrue(os.path.exists(os.path.join(self.path + ".metrics", f"{session.id}.lod.json")))
+
+    def test_retention_is_one_write(self):
+        now = datetime.now()
+        manager = FitnessManager(username="Test", storage=JsonStorage(self.path))
+        manager.add_workouts([self._session(now - timedelta(days=400 + i)) for i in range(3)])
+        writes, notified = [], []
+        write = manager.storage._write
+        manager.storage._write = lambda profile: writes.append(1) or write(profile)
+        manager.add_listener(lambda: notified.append(1))
+
+        self.assertEqual(manager.apply_retention(), 3)
+        self.assertEqual((len(writes), len(notified)), (1, 1))
+        reloaded = FitnessManager(username="Test", storage=JsonStorage(self.path))
+        self.assertTrue(all("heart_rate" not in w.metrics for w in reloaded.profile.workouts))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import os
+import tempfile
+import shutil
+from datetime import datetime
+from fitness_tracker.models import Goal, GoalType, GoalPeriod, WorkoutSession
+from fitness_tracker.storage import JsonStorage
+from fitness_tracker.users import (
+    ProfileRegistry, ManagerCache, open_profile, open_upload_queue, user_dir_name, sqlite_storage
+)
+
+
+class TestMultiUser(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, "users")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _workout(self, steps):
+        return WorkoutSession(
+            activity_type="Running",
+            start_time=datetime.now(),
+            end_time=datetime.now(),
+            metrics={"heart_rate": [100, 110]},
+            summary={"total_steps": steps}
+        )
+
+    def test_users_have_separate_storage(self):
+        registry = ProfileRegistry(self.root)
+        alice = registry.open("alice")
+        bob = registry.open("bob")
+        alice.add_workout(self._workout(1000))
+        bob.add_goal(Goal(type=GoalType.STEPS, target_value=5000, period=GoalPeriod.DAILY))
+
+        registry = ProfileRegistry(self.root)
+        self.assertEqual(registry.usernames(), ["alice", "bob"])
+        alice = registry.open("alice")
+        bob = registry.open("bob")
+        self.assertEqual(alice.profile.username, "alice")
+        self.assertEqual(len(alice.profile.workouts), 1)
+        self.assertEqual(len(alice.profile.goals), 0)
+        self.assertEqual(len(bob.profile.workouts), 0)
+        self.assertEqual(bob.get_today_stats()["steps"], 0)
+        self.assertEqual(alice.get_today_stats()["steps"], 1000)
+
+    def test_front_ends_open_the_users_own_storage(self):
+        open_profile("alice", root=self.root).add_workout(self._workout(300))
+        self.assertEqual(ProfileRegistry(self.root).usernames(), ["alice"])
+        self.assertEqual(open_profile("alice", root=self.root).get_today_stats()["steps"], 300)
+        self.assertEqual(open_profile("bob", root=self.root).get_today_stats()["steps"], 0)
+
+    def test_upload_queues_are_kept_per_user(self):
+        alice, bob = open_profile("alice", root=self.root), open_profile("bob", root=self.root)
+        workout = self._workout(100)
+        alice.add_workout(workout)
+        queue = open_upload_queue(alice, "alice", root=self.root)
+        queue.enqueue(workout)
+
+        registry = ProfileRegistry(self.root)
+        self.assertEqual(os.path.dirname(queue.path), registry.user_dir("alice"))
+        self.assertEqual(os.path.dirname(queue.state_path), registry.user_dir("alice"))
+        # bob's queue doesn't pick up (and drop) alice's pending upload
+        self.assertEqual(open_upload_queue(bob, "bob", root=self.root).depth, 0)
+        self.assertEqual(open_upload_queue(alice, "alice", root=self.root).depth, 1)
+
+    def test_directory_names_are_safe_and_distinct(self):
+        self.assertNotIn("/", user_dir_name("../../etc"))
+        self.assertNotIn(".", user_dir_name("../../etc"))
+        self.assertNotEqual(user_dir_name("Alice"), user_dir_name("alice"))
+        self.assertNotEqual(user_dir_name("a/b"), user_dir_name("a_b"))
+
+        registry = ProfileRegistry(self.root)
+        path = registry.user_dir("../escape")
+        self.assertEqual(os.path.dirname(path), self.root)
+
+    def test_cache_evicts_least_recently_used(self):
+        registry = ProfileRegistry(self.root)
+        cache = ManagerCache(registry, capacity=2)
+        cache.get("alice").add_workout(self._workout(10))
+        cache.get("bob")
+        cache.get("alice")              # alice is now the most recent
+        cache.get("carol")              # evicts bob
+        self.assertIn("alice", cache)
+        self.assertNotIn("bob", cache)
+        self.assertEqual(len(cache), 2)
+
+        cache.get("dave")               # evicts alice
+        self.assertNotIn("alice", cache)
+        # Reloaded from storage with nothing lost
+        self.assertEqual(cache.get("alice").get_today_stats()["steps"], 10)
+        self.assertEqual(cache.stats()["evictions"], 3)
+        self.assertEqual(cache.stats()["hits"], 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_sqlite_backend_and_legacy_import(self):
+        legacy = os.path.join(self.tmpdir, "fitness_data.json")
+        storage = JsonStorage(legacy)
+        from fitness_tracker.manager import FitnessManager
+        old = FitnessManager(username="User", storage=storage)
+        old.add_workout(self._workout(500))
+
+        registry = ProfileRegistry(self.root, storage_factory=sqlite_storage)
+        manager = registry.import_legacy("erin", legacy)
+        self.assertEqual(manager.profile.username, "erin")
+        manager.close()
+
+        cache = ManagerCache(ProfileRegistry(self.root, storage_factory=sqlite_storage), capacity=1)
+        erin = cache.get("erin")
+        self.assertEqual(len(erin.profile.workouts), 1)
+        self.assertEqual(list(erin.profile.workouts[0].metrics["heart_rate"]), [100, 110])
+        cache.get("frank")              # closes erin's connection
+        self.assertNotIn("erin", cache)
+        cache.clear()
+
+    def test_borrowed_manager_survives_eviction(self):
+        import sqlite3
+        cache = ManagerCache(ProfileRegistry(self.root, storage_factory=sqlite_storage), capacity=1)
+        with cache.borrow("erin") as erin:
+            with cache.borrow("erin") as again:
+                self.assertIs(again, erin)
+            cache.get("frank")          # evicts erin while she's still borrowed
+            self.assertNotIn("erin", cache)
+            erin.add_workout(self._workout(100))
+            self.assertEqual(len(erin.storage.load().workouts), 1)
+
+        # Closed once given back; the next request reloads from storage
+        with self.assertRaises(sqlite3.ProgrammingError):
+            erin.storage.load()
+        self.assertEqual(cache.get("erin").get_today_stats()["steps"], 100)
+        cache.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()